@@ -0,0 +1,240 @@
+import sys
+from datetime import date
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from history import departement_from_code_postal, extract_id
+
+
+# =========================
+# Agrégats par agence (mis à jour incrémentalement)
+# =========================
+# Les indicateurs par agence (stock, prix/m² médian face au marché local,
+# rotation des annonces) ne sont pas recalculés sur tout l'historique : chaque
+# crawl met à jour des agrégats additionnables, par partition (département,
+# la clé de répartition des shards) :
+# - compteurs par (agence, département) : stock, entrées, sorties, jours en
+#   ligne cumulés des annonces sorties ;
+# - sketch du prix/m² du stock par (agence, département) : histogramme à
+#   classes logarithmiques (erreur relative SKETCH_ACCURACY sur les quantiles),
+#   que l'on fusionne en additionnant les effectifs.
+# Un crawl n'apporte que le delta des partitions qu'il couvre (calculé contre
+# les annonces en stock de ces partitions) : les autres restent inchangées.
+# L'onglet 🏢 Agences du tableau de bord ne lit que ces agrégats.
+
+AGGREGATES_PATH = "agences_agregats.npz"
+COUNTERS = ["stock", "entrees", "sorties", "jours_sortis"]
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+SANS_AGENCE = ""  # annonces sans agence : comptées dans le marché local seulement
+KEYS = ["agence", "departement"]
+
+
+def sketch_buckets(valeurs: np.ndarray) -> np.ndarray:
+    """Classe du sketch de chaque prix/m² (-1 si manquant ou nul)."""
+    valeurs = np.asarray(valeurs, dtype=float)
+    valides = np.isfinite(valeurs) & (valeurs > 0)
+    classes = np.ceil(np.log(np.where(valides, np.maximum(valeurs, 1.0), 1.0)) / np.log(GAMMA))
+    return np.where(valides, classes, -1).astype(np.int64)
+
+
+def bucket_values(classes: np.ndarray) -> np.ndarray:
+    """Valeur représentative d'une classe (erreur relative ≤ SKETCH_ACCURACY sur toute la classe)."""
+    return 2 * GAMMA ** np.asarray(classes, dtype=float) / (GAMMA + 1)
+
+
+def sketch_median(sketch: pd.DataFrame, par: str) -> pd.Series:
+    """Médiane de chaque groupe d'un sketch (colonnes `par`, bucket, n)."""
+    sketch = sketch[sketch["n"] > 0].sort_values([par, "bucket"])
+    groupes = sketch.groupby(par)["n"]
+    atteint = sketch[groupes.cumsum() >= groupes.transform("sum") / 2].drop_duplicates(par)
+    return pd.Series(bucket_values(atteint["bucket"].to_numpy()), index=atteint[par].to_numpy())
+
+
+def _listings(snapshot: pd.DataFrame) -> pd.DataFrame:
+    """Annonces d'un relevé indexées par identifiant : agence, département, classe du prix/m²."""
+    snap = snapshot.assign(id_annonce=extract_id(snapshot["lien"])).dropna(subset=["id_annonce"])
+    snap = snap.drop_duplicates("id_annonce")
+    if "departement" in snap:
+        departements = snap["departement"].astype("string")
+    else:
+        departements = departement_from_code_postal(snap["code_postal"])
+    return pd.DataFrame({
+        "agence": snap["agence"].fillna(SANS_AGENCE).astype(str).to_numpy(),
+        "departement": departements.fillna("").to_numpy(dtype=str),
+        "bucket": sketch_buckets(snap["prix_m2"].to_numpy(dtype=float)),
+    }, index=pd.Index(snap["id_annonce"].astype(str).to_numpy(), name="id_annonce"))
+
+
+def _count(annonces: pd.DataFrame, par_classe: bool = False) -> pd.Series:
+    """Effectifs par (agence, département), ou par (agence, département, classe) pour le sketch."""
+    if par_classe:
+        annonces = annonces[annonces["bucket"] >= 0]
+        return annonces.groupby(KEYS + ["bucket"]).size()
+    return annonces.groupby(KEYS).size()
+
+
+def _empty_index(noms: list) -> pd.MultiIndex:
+    return pd.MultiIndex.from_arrays([[] for _ in noms], names=noms)
+
+
+class AgencyAggregates:
+    """
+    Agrégats par agence et leur état de mise à jour.
+
+    Paramètres:
+    - counters : COUNTERS par (agence, département).
+    - sketches : effectifs du stock par (agence, département, classe de prix/m²).
+    - active : annonces en stock (agence, département, classe, premier relevé),
+      nécessaires pour calculer le delta du crawl suivant.
+    - partitions : date du dernier relevé de chaque département.
+    """
+
+    def __init__(self, counters=None, sketches=None, active=None, partitions=None):
+        self.counters = counters if counters is not None else pd.DataFrame(
+            {col: pd.Series(dtype=np.int64) for col in COUNTERS}, index=_empty_index(KEYS))
+        self.sketches = sketches if sketches is not None else pd.Series(
+            dtype=np.int64, index=_empty_index(KEYS + ["bucket"]))
+        self.active = active if active is not None else pd.DataFrame(
+            {"agence": pd.Series(dtype=str), "departement": pd.Series(dtype=str),
+             "bucket": pd.Series(dtype=np.int64), "debut": pd.Series(dtype=str)},
+            index=pd.Index([], dtype=str, name="id_annonce"))
+        self.partitions = partitions if partitions is not None else pd.Series(dtype=str)
+
+    def _add(self, compteurs: pd.DataFrame, sketches: pd.Series):
+        self.counters = self.counters.add(compteurs, fill_value=0).astype(np.int64)
+        sketches = self.sketches.add(sketches, fill_value=0).astype(np.int64)
+        self.sketches = sketches[sketches != 0]
+
+    def update(self, snapshot: pd.DataFrame, jour: str) -> dict:
+        """
+        Intègre un relevé (ou la partie d'un crawl partitionné) : seules ses partitions sont mises à jour.
+
+        Paramètres:
+        - snapshot : DataFrame nettoyé (issu de clean.py).
+        - jour : date du relevé au format ISO (YYYY-MM-DD).
+
+        Retourne:
+        - résumé de la mise à jour (partitions, entrées, sorties, stock).
+        """
+        snap = _listings(snapshot)
+        partitions = snap["departement"].unique()
+        # Stock des partitions relevées (et annonces ayant changé de partition)
+        touches = self.active["departement"].isin(partitions).to_numpy() | self.active.index.isin(snap.index)
+        anciens = self.active[touches]
+        sortis = anciens[~anciens.index.isin(snap.index)]
+        nouveaux = snap[~snap.index.isin(self.active.index)]
+        jours = (pd.Timestamp(jour) - pd.to_datetime(sortis["debut"])).dt.days
+
+        compteurs = pd.DataFrame({
+            "stock": _count(snap).sub(_count(anciens), fill_value=0),
+            "entrees": _count(nouveaux),
+            "sorties": _count(sortis),
+            "jours_sortis": jours.groupby([sortis["agence"], sortis["departement"]]).sum(),
+        }).fillna(0)
+        self._add(compteurs.reindex(columns=COUNTERS), _count(snap, True).sub(_count(anciens, True), fill_value=0))
+
+        snap["debut"] = anciens["debut"].reindex(snap.index).fillna(jour)
+        self.active = pd.concat([self.active[~touches], snap])
+        self.partitions = pd.concat([self.partitions.drop(partitions, errors="ignore"),
+                                     pd.Series(jour, index=partitions, dtype=str)]).sort_index()
+        return {"partitions": len(partitions), "entrees": len(nouveaux), "sorties": len(sortis), "stock": len(self.active)}
+
+    def merge(self, other: "AgencyAggregates") -> "AgencyAggregates":
+        """Fusionne les agrégats de partitions disjointes (par exemple tenus séparément par shard)."""
+        fusion = AgencyAggregates(self.counters, self.sketches, pd.concat([self.active, other.active]),
+                                  other.partitions.combine_first(self.partitions))
+        fusion._add(other.counters, other.sketches)
+        return fusion
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Indicateurs par agence, calculés à partir des seuls agrégats.
+
+        Retourne:
+        - DataFrame indexé par agence : stock, entrées, sorties, prix/m² médian, médiane
+          locale (départements de l'agence, pondérés par son stock dans chacun), écart à
+          la médiane locale, durée moyenne en ligne des annonces sorties et rotation.
+        """
+        compteurs = self.counters.groupby(level="agence").sum().drop(SANS_AGENCE, errors="ignore")
+        sketch = self.sketches.rename("n").reset_index()
+
+        mediane = sketch_median(sketch.groupby(["agence", "bucket"], as_index=False)["n"].sum(), "agence")
+        marche = sketch.groupby(["departement", "bucket"])["n"].sum()
+        marche = (marche / marche.groupby(level="departement").transform("sum")).rename("part").reset_index()
+        poids = sketch.groupby(KEYS)["n"].sum()
+        poids = (poids / poids.groupby(level="agence").transform("sum")).rename("poids").reset_index()
+        melange = poids.merge(marche, on="departement")
+        melange["n"] = melange["poids"] * melange["part"]
+        locale = sketch_median(melange.groupby(["agence", "bucket"], as_index=False)["n"].sum(), "agence")
+
+        resume = compteurs.assign(prix_m2_median=mediane, prix_m2_local=locale)
+        resume["ecart"] = resume["prix_m2_median"] / resume["prix_m2_local"] - 1
+        resume["jours_en_ligne"] = resume["jours_sortis"] / resume["sorties"].where(resume["sorties"] > 0)
+        resume["rotation"] = resume["sorties"] / (resume["stock"] + resume["sorties"]).where(lambda n: n > 0)
+        return resume.drop(columns="jours_sortis").sort_values("stock", ascending=False)
+
+    # --- Persistance ---
+    def save(self, path):
+        compteurs, sketches, active = self.counters.reset_index(), self.sketches.rename("n").reset_index(), self.active
+        np.savez_compressed(
+            path,
+            counter_keys=compteurs[KEYS].to_numpy(dtype=str), counters=compteurs[COUNTERS].to_numpy(np.int64),
+            sketch_keys=sketches[KEYS].to_numpy(dtype=str), sketch_buckets=sketches["bucket"].to_numpy(np.int64),
+            sketch_counts=sketches["n"].to_numpy(np.int64),
+            active_ids=active.index.to_numpy(dtype=str), active_keys=active[KEYS].to_numpy(dtype=str),
+            active_buckets=active["bucket"].to_numpy(np.int64), active_debut=active["debut"].to_numpy(dtype=str),
+            partitions=self.partitions.index.to_numpy(dtype=str), partition_dates=self.partitions.to_numpy(dtype=str),
+        )
+
+    @classmethod
+    def load(cls, source, with_active: bool = True) -> "AgencyAggregates":
+        """
+        Charge des agrégats enregistrés par save() (chemin ou contenu brut du fichier).
+
+        Paramètres:
+        - with_active : False pour ne lire que les agrégats (tableau de bord) ; le
+          stock détaillé, lu à la demande dans le fichier, n'est alors pas chargé.
+        """
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        with np.load(source, allow_pickle=False) as f:
+            compteurs = pd.DataFrame(f["counters"].reshape(-1, len(COUNTERS)), columns=COUNTERS,
+                                     index=pd.MultiIndex.from_arrays(f["counter_keys"].reshape(-1, 2).T.tolist(), names=KEYS))
+            cles = f["sketch_keys"].reshape(-1, 2).T.tolist()
+            sketches = pd.Series(f["sketch_counts"], index=pd.MultiIndex.from_arrays(
+                cles + [f["sketch_buckets"]], names=KEYS + ["bucket"]))
+            partitions = pd.Series(f["partition_dates"], index=f["partitions"], dtype=str)
+            active = None
+            if with_active:
+                cles = f["active_keys"].reshape(-1, 2)
+                active = pd.DataFrame(
+                    {"agence": cles[:, 0], "departement": cles[:, 1], "bucket": f["active_buckets"], "debut": f["active_debut"]},
+                    index=pd.Index(f["active_ids"], name="id_annonce"),
+                )
+        return cls(compteurs, sketches, active, partitions)
+
+
+# =========================
+# Main
+# =========================
+def main():
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python agencies.py <cleaned_csv_file> <aggregates_npz_file> [YYYY-MM-DD]")
+        sys.exit(1)
+    input_file, aggregates_file = sys.argv[1:3]
+    jour = sys.argv[3] if len(sys.argv) == 4 else date.today().isoformat()
+
+    snapshot = pd.read_csv(input_file, dtype={"code_postal": str, "departement": str})
+    agregats = AgencyAggregates.load(aggregates_file) if Path(aggregates_file).exists() else AgencyAggregates()
+    resume = agregats.update(snapshot, jour)
+    agregats.save(aggregates_file)
+    print(f"✅ Agrégats des agences mis à jour ({jour}) : {resume['partitions']} départements, "
+          f"{resume['entrees']} entrées, {resume['sorties']} sorties, {resume['stock']} annonces en stock.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
 import streamlit as st
 import pandas as pd
-import requests
 from os import getenv
 from dotenv import load_dotenv
 from io import StringIO
-import plotly.express as px
+from pathlib import Path
+import ast
 import json
-import requests
+import base64
+import tempfile
+import numpy as np
+from urllib.parse import urlencode
+import streamlit.components.v1 as components
+from agencies import AGGREGATES_PATH, AgencyAggregates
+from crossfilter import build_payload, pack_selection, render_html, write_payload
+from dataset import OPTION_COLUMNS, Dataset, expand
+from export import EXPORT_FORMATS, write_export
+from query import ResultCache, filters_key
+from runner import PipelineRunner
+from service import EXCLUDED_COLUMNS, filters_params
+from search import SearchIndex, index_path
+from thumbnails import ThumbnailCache
+from profiling import finish_rerun, render_debug_panel, stage, start_rerun, track_memory
 
 # =========================
 # Configuration générale
@@ -14,8 +28,53 @@ import requests
 load_dotenv()
 GITHUB_TOKEN = getenv("GITHUB_TOKEN")
 REPO = "cedric-mc/analyse-marche"
+DEBUG = getenv("DASHBOARD_DEBUG") == "1"  # ou ?debug=1 dans l'URL pour afficher l'onglet de debug
 CSV_PATH = "annonces_propres.csv"
 CSV_URL = f"https://raw.githubusercontent.com/{REPO}/main/{CSV_PATH}"
+SEARCH_INDEX_PATH = index_path(CSV_PATH).name  # index plein texte produit par clean.py
+SEARCH_INDEX_URL = f"https://raw.githubusercontent.com/{REPO}/main/{SEARCH_INDEX_PATH}"
+DATA_DIR = getenv("DATA_DIR")  # dossier local contenant les CSV, à lire à la place de ceux publiés sur GitHub
+CACHE_TTL = 3600  # secondes avant de recharger le CSV (mis à jour par le workflow)
+ROLLUPS_PATH = "historique_agregats.csv"
+ROLLUPS_URL = f"https://raw.githubusercontent.com/{REPO}/main/{ROLLUPS_PATH}"
+AGENCIES_PATH = AGGREGATES_PATH  # agrégats par agence tenus par agencies.py
+AGENCIES_URL = f"https://raw.githubusercontent.com/{REPO}/main/{AGENCIES_PATH}"
+# Miniatures de la galerie : servies par Streamlit depuis src/static (server.enableStaticServing)
+THUMBNAILS_DIR = Path(__file__).parent / "static" / "thumbs"
+THUMBNAILS_URL = "app/static/thumbs"
+THUMBNAIL_WAIT = 2.0  # secondes d'attente au plus pour les miniatures de la page affichée
+GALLERY_SIZE = 5  # photos affichées par annonce
+SERVICE_URL = getenv("SERVICE_URL")  # service.py déployé : les exports y sont téléchargés en flux
+EXPORT_DIR = Path(tempfile.gettempdir()) / "analyse_marche_exports"
+# Exécution locale du pipeline : désactivée sauf LOCAL_PIPELINE=1 (elle exige en plus un token
+# GitHub pouvant déclencher main.yml) ; fichiers installés dans DATA_DIR, sinon à la racine du dépôt
+LOCAL_PIPELINE = getenv("LOCAL_PIPELINE") == "1"
+LOCAL_DATA_DIR = Path(DATA_DIR) if DATA_DIR else Path(__file__).resolve().parent.parent
+PIPELINE_REFRESH = 1.0  # secondes entre deux rafraîchissements de la progression
+CROSSFILTER_DIR = Path(__file__).parent / "static" / "crossfilter"
+CROSSFILTER_URL = "app/static/crossfilter"
+CROSSFILTER_HEIGHT = 1000  # pixels réservés au composant d'exploration interactive
+
+# --- Palette de couleurs cohérente avec DPE/GES
+DPE_COLORS = {
+    "A": "#16a34a",  # Vert foncé
+    "B": "#65a30d",
+    "C": "#ca8a04",
+    "D": "#f59e0b",
+    "E": "#f97316",
+    "F": "#dc2626",
+    "G": "#991b1b"
+}
+
+GES_COLORS = {
+    "A": "#0ea5e9",  # bleu clair
+    "B": "#38bdf8",
+    "C": "#22d3ee",
+    "D": "#a855f7",
+    "E": "#d946ef",
+    "F": "#f43f5e",
+    "G": "#7f1d1d",  # rouge foncé
+}
 
 st.set_page_config(
     page_title="🏠 Analyse Immo LDF",
@@ -104,8 +163,8 @@ def apply_custom_css():
         box-shadow: 0 6px 14px rgba(0,0,0,0.06);
         padding: 15px;
     }
-    /* Styles des onglets */
-    [role="tab"] {
+    /* Styles des onglets (boutons radio du routeur d'onglets, présentés en onglets) */
+    .st-key-active_tab label[data-baseweb="radio"] {
         background-color: #e9ecef;
         color: #2E4057;
         border-radius: 8px 8px 0 0;
@@ -113,16 +172,13 @@ def apply_custom_css():
         margin-right: 4px;
         font-weight: 600;
     }
-    [role="tab"][aria-selected="true"] {
+    .st-key-active_tab label[data-baseweb="radio"] > div:first-child {
+        display: none;
+    }
+    .st-key-active_tab label[data-baseweb="radio"]:has(input:checked) {
         background-color: #3b82f6;
         color: white;
     }
-    [role="tabpanel"] {
-        background-color: white;
-        border-radius: 0 0 12px 12px;
-        padding: 20px;
-        box-shadow: 0 6px 14px rgba(0,0,0,0.06);
-    }
     /* Styles des boutons */
     button {
         background-color: #3b82f6;
@@ -140,22 +196,164 @@ def apply_custom_css():
     """, unsafe_allow_html=True)
 
 
-# @st.cache_data
-def load_data() -> pd.DataFrame:
+def github_get(url: str):
+    """Télécharge un fichier publié sur GitHub (requests n'est importé qu'au premier téléchargement)."""
+    import requests
+    return requests.get(url, headers={"Authorization": f"token {GITHUB_TOKEN}"})
+
+
+def can_dispatch(token: str) -> bool:
+    """Vérifie auprès de GitHub que le token peut déclencher le workflow du dépôt (droit d'écriture)."""
+    if not token:
+        return False
+    import requests
+    try:
+        resp = requests.get(
+            f"https://api.github.com/repos/{REPO}",
+            headers={"Accept": "application/vnd.github+json", "Authorization": f"Bearer {token}"},
+            timeout=15,
+        )
+    except requests.RequestException:
+        return False
+    return resp.status_code == 200 and resp.json().get("permissions", {}).get("push", False)
+
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner="Chargement des annonces...")
+def load_data() -> Dataset:
     """
-    Charge les données depuis le fichier CSV hébergé sur GitHub.
+    Charge les annonces (CSV hébergé sur GitHub, ou dans DATA_DIR) une seule
+    fois par processus : le jeu de données et ses index sont partagés par
+    toutes les sessions et ne doivent pas être modifiés.
 
     Retourne:
-    - DataFrame contenant les données des annonces.
+    - Dataset contenant les annonces et les index des filtres.
     """
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    response = requests.get(CSV_URL, headers=headers)
+    if DATA_DIR:
+        return Dataset.from_csv((Path(DATA_DIR) / CSV_PATH).read_bytes(), load_search_index())
+    response = github_get(CSV_URL)
+    if response.status_code != 200:
+        # Une exception n'est pas mise en cache : le chargement sera retenté au prochain rerun
+        raise RuntimeError(f"Impossible de charger le fichier CSV ({response.status_code})")
+    return Dataset.from_csv(response.content, load_search_index())
+
+
+def load_search_index() -> SearchIndex | None:
+    """
+    Charge l'index plein texte publié à côté du CSV.
+
+    Retourne:
+    - SearchIndex, ou None s'il est absent (il sera alors construit à la première recherche).
+    """
+    if DATA_DIR:
+        path = Path(DATA_DIR) / SEARCH_INDEX_PATH
+        return SearchIndex.load(path) if path.exists() else None
+    response = github_get(SEARCH_INDEX_URL)
+    return SearchIndex.load(response.content) if response.status_code == 200 else None
+
+
+@st.cache_resource
+def pipeline_runner() -> PipelineRunner:
+    """File des exécutions locales du pipeline, partagée par toutes les sessions."""
+    # Après le remplacement, l'ancien jeu n'est plus servi : inutile de le garder en mémoire
+    return PipelineRunner(LOCAL_DATA_DIR, on_swap=load_data.clear)
+
+
+def current_dataset() -> Dataset:
+    """
+    Jeu de l'exécution locale lancée par cette session s'il y en a un, sinon le
+    dernier promu pour toutes les sessions, sinon celui publié (load_data).
+    """
+    job = st.session_state.get("pipeline_job")
+    if job is not None and job.dataset is not None:
+        return job.dataset
+    dataset = pipeline_runner().dataset if LOCAL_PIPELINE else None
+    return dataset if dataset is not None else load_data()
+
+
+@st.cache_resource
+def result_cache() -> ResultCache:
+    """Cache LRU des résultats de filtres, partagé par toutes les sessions (vidé à chaque nouvelle version du CSV)."""
+    return ResultCache()
+
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def load_rollups() -> pd.DataFrame:
+    """
+    Charge les agrégats quotidiens de l'historique (médiane du prix/m² par ville et département),
+    partagés par toutes les sessions.
+
+    Retourne:
+    - DataFrame des agrégats (vide si l'historique n'a pas encore été produit).
+    """
+    if DATA_DIR:
+        path = Path(DATA_DIR) / ROLLUPS_PATH
+        return pd.read_csv(path, dtype={"date": str, "cle": str}) if path.exists() else pd.DataFrame()
+    response = github_get(ROLLUPS_URL)
     if response.status_code == 200:
-        return pd.read_csv(StringIO(response.text))
-    st.error(f"❌ Impossible de charger le fichier CSV ({response.status_code})")
+        return pd.read_csv(StringIO(response.text), dtype={"date": str, "cle": str})
     return pd.DataFrame()
 
 
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def load_agencies() -> pd.DataFrame:
+    """
+    Charge les agrégats par agence et en calcule les indicateurs, partagés par toutes les sessions.
+
+    Retourne:
+    - DataFrame indexé par agence (vide si les agrégats n'ont pas encore été produits).
+    """
+    if DATA_DIR:
+        path = Path(DATA_DIR) / AGENCIES_PATH
+        return AgencyAggregates.load(path, with_active=False).summary() if path.exists() else pd.DataFrame()
+    response = github_get(AGENCIES_URL)
+    if response.status_code == 200:
+        return AgencyAggregates.load(response.content, with_active=False).summary()
+    return pd.DataFrame()
+
+
+@st.cache_resource
+def thumbnail_cache() -> ThumbnailCache | None:
+    """
+    Cache des miniatures partagé par toutes les sessions.
+
+    Retourne:
+    - ThumbnailCache, ou None si le service des fichiers statiques est désactivé
+      (les photos sont alors chargées directement depuis le site source).
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    return ThumbnailCache(THUMBNAILS_DIR)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def crossfilter_source(_dataset: Dataset, version: str) -> str:
+    """
+    Colonnes quantifiées du jeu pour l'exploration interactive (calculées une fois par version).
+
+    Retourne:
+    - URL du fichier statique (téléchargé une fois par le navigateur, puis en cache),
+      ou data URI si le service des fichiers statiques est désactivé.
+    """
+    if st.get_option("server.enableStaticServing"):
+        return f"{CROSSFILTER_URL}/{write_payload(CROSSFILTER_DIR, _dataset)}"
+    return "data:application/octet-stream;base64," + base64.b64encode(build_payload(_dataset)).decode("ascii")
+
+
+def gallery_urls(images) -> list:
+    """Premières photos d'une annonce (colonne images_page : liste, ou sa représentation texte dans le CSV)."""
+    try:
+        imgs = ast.literal_eval(images) if isinstance(images, str) else images
+    except (ValueError, SyntaxError):
+        return []
+    return [img for img in imgs[:GALLERY_SIZE] if isinstance(img, str)] if isinstance(imgs, list) else []
+
+
+def plot_chart(fig):
+    """Affiche une figure Plotly (sérialisation chronométrée dans le profilage)."""
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
 def render_header():
     """Affiche le titre principal et la description du tableau de bord."""
     st.markdown(
@@ -170,27 +368,30 @@ def render_header():
     st.divider()
 
 
-def render_summary(df: pd.DataFrame):
+def render_summary(summary: dict):
     """
     Affiche les métriques principales.
     
     Paramètres:
-    - df : DataFrame contenant les données des annonces.
+    - summary : métriques calculées par query.summary().
     """
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("**📊 Nombre d'annonces**", len(df))
-    if "prix_m2" in df:
-        col2.metric("**💶 Prix moyen/m²**", f"{df['prix_m2'].mean():,.0f} €")
-    if "surface" in df:
-        col3.metric("**📐 Surface moyenne**", f"{df['surface'].mean():.0f} m²")
-    if "ville" in df:
-        col4.metric("**🏙️ Nombre de villes**", df['ville'].nunique())
+    col1.metric("**📊 Nombre d'annonces**", summary["nb_annonces"])
+    if "prix_m2_moyen" in summary:
+        col2.metric("**💶 Prix moyen/m²**", f"{summary['prix_m2_moyen']:,.0f} €")
+    if "surface_moyenne" in summary:
+        col3.metric("**📐 Surface moyenne**", f"{summary['surface_moyenne']:.0f} m²")
+    if "nb_villes" in summary:
+        col4.metric("**🏙️ Nombre de villes**", summary["nb_villes"])
     st.divider()
 
 
-def sidebar_filters(df: pd.DataFrame):
+def sidebar_filters(dataset: Dataset):
     """
-    Crée et applique les filtres de la barre latérale avec un vrai reset visuel.
+    Crée les filtres de la barre latérale avec un vrai reset visuel.
+
+    Retourne:
+    - état des filtres, à passer à Dataset.select() ou au cache des résultats.
     """
     st.sidebar.header("🎯 Filtres")
     st.sidebar.markdown("Affinez votre recherche ci-dessous 👇")
@@ -208,9 +409,15 @@ def sidebar_filters(df: pd.DataFrame):
     key_suffix = f"_{st.session_state.filters_reset_count}"
 
     # === Widgets ===
+    recherche = st.sidebar.text_input(
+        "🔎 Recherche",
+        key=f"search_filter{key_suffix}",
+        help="Mots ou morceaux de mots à trouver dans le titre ou le nom de l'agence (tous doivent être présents).",
+        placeholder="loft, vue mer, nom d'agence..."
+    )
     ville = st.sidebar.multiselect(
         "🏙️ Ville",
-        sorted(df["ville"].dropna().unique()),
+        dataset.villes,
         default=[],
         key=f"ville_filter{key_suffix}",
         help="Sélectionnez les villes que vous souhaitez inclure dans l'analyse.",
@@ -219,15 +426,14 @@ def sidebar_filters(df: pd.DataFrame):
     )
     type_bien = st.sidebar.multiselect(
         "🏠 Type de bien",
-        sorted(df["type"].dropna().unique()),
+        dataset.types,
         default=[],
         key=f"type_filter{key_suffix}",
         help="Sélectionnez les types de biens que vous souhaitez inclure dans l'analyse.",
         label_visibility="visible",
         placeholder="Tous les types"
     )
-    prix_min = int(df["prix"].min()) if df["prix"].nunique() > 1 else int(df["prix"].min()) - 1
-    prix_max = int(df["prix"].max()) if df["prix"].nunique() > 1 else int(df["prix"].max()) + 1
+    prix_min, prix_max = dataset.prix_bounds
     prix_min, prix_max = st.sidebar.slider(
         "💰 Prix (€)",
         prix_min,
@@ -235,8 +441,7 @@ def sidebar_filters(df: pd.DataFrame):
         (prix_min, prix_max),
         key=f"prix_range{key_suffix}"
     )
-    surface_min = int(df["surface"].min()) if df["surface"].nunique() > 1 else int(df["surface"].min()) - 1
-    surface_max = int(df["surface"].max()) if df["surface"].nunique() > 1 else int(df["surface"].max()) + 1
+    surface_min, surface_max = dataset.surface_bounds
     surface_min, surface_max = st.sidebar.slider(
         "📏 Surface (m²)",
         surface_min,
@@ -246,7 +451,7 @@ def sidebar_filters(df: pd.DataFrame):
     )
     options = st.sidebar.multiselect(
         "⚙️ Options (logique ET)",
-        ["Parking 🚗", "Jardin 🌳", "Balcon/Terrasse 🏖️", "Piscine 🏊‍♂️", "Ascenseur 🛗", "Accès Handicapé ♿"],
+        list(OPTION_COLUMNS),
         default=[],
         key=f"options_filter{key_suffix}",
         help="Sélectionnez les options que le bien doit posséder.",
@@ -254,33 +459,14 @@ def sidebar_filters(df: pd.DataFrame):
         placeholder="Toutes les options"
     )
 
-    # === Application des filtres ===
-    filtered_df = df.copy()
-    if ville:
-        filtered_df = filtered_df[filtered_df["ville"].isin(ville)]
-    if type_bien:
-        filtered_df = filtered_df[filtered_df["type"].isin(type_bien)]
-    if options:
-        option_map = {
-            "Parking 🚗": "parking",
-            "Jardin 🌳": "jardin",
-            "Balcon/Terrasse 🏖️": "balcon_terrasse",
-            "Piscine 🏊‍♂️": "piscine",
-            "Ascenseur 🛗": "ascenseur",
-            "Accès Handicapé ♿": "acces_handicape"
-        } # Dans le fichier de données, ils sont à True/False
-        for opt in options:
-            col_name = option_map.get(opt)
-            if col_name in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df[col_name] == True]
-    filtered_df = filtered_df[
-        (filtered_df["prix"] >= prix_min)
-        & (filtered_df["prix"] <= prix_max)
-        & (filtered_df["surface"] >= surface_min)
-        & (filtered_df["surface"] <= surface_max)
-    ]
-
-    return filtered_df
+    return {
+        "villes": ville,
+        "types": type_bien,
+        "options": options,
+        "prix": (prix_min, prix_max),
+        "surface": (surface_min, surface_max),
+        "recherche": recherche,
+    }
 
 
 def render_data_table(df: pd.DataFrame):
@@ -347,7 +533,7 @@ def render_data_table(df: pd.DataFrame):
     # Découpage des données
     start = (st.session_state.current_page - 1) * page_size
     end = st.session_state.current_page * page_size
-    page_df = df.iloc[start:end].copy()
+    page_df = expand(df.iloc[start:end])  # forme d'origine des seules lignes affichées (options, nombres, texte)
 
     colonnes_affichees = ["type", "ville", "prix", "surface", "prix_m2", "images_page", "lien", "parking", "jardin", "balcon_terrasse", "piscine", "ascenseur", "acces_handicape"]
     page_df = page_df[[c for c in colonnes_affichees if c in page_df.columns]]
@@ -366,15 +552,25 @@ def render_data_table(df: pd.DataFrame):
 
     # === Galerie ===
     if "images_page" in page_df:
-        def render_gallery(images):
-            try:
-                imgs = eval(images) if isinstance(images, str) else images
-                if isinstance(imgs, list) and imgs:
-                    return " ".join([f'<img src="{img}" width="60">' for img in imgs[:5]])
-                return "—"
-            except Exception:
+        galeries = page_df["images_page"].apply(gallery_urls)
+        miniatures = {}
+        cache = thumbnail_cache()
+        if cache is not None:
+            with stage("render_data_table.thumbnails"):
+                # Miniatures locales de la page affichée (les photos encore absentes restent chargées depuis le site source)
+                miniatures = cache.get([img for imgs in galeries for img in imgs], timeout=THUMBNAIL_WAIT)
+                # Préchargement en arrière-plan de la page suivante
+                suivante = df["images_page"].iloc[end:end + page_size].apply(gallery_urls)
+                cache.fetch([img for imgs in suivante for img in imgs])
+
+        def render_gallery(imgs):
+            if not imgs:
                 return "—"
-        page_df["galerie"] = page_df["images_page"].apply(render_gallery)
+            return " ".join(
+                f'<img src="{THUMBNAILS_URL}/{miniatures[img]}" width="60">' if img in miniatures else f'<img src="{img}" width="60">'
+                for img in imgs
+            )
+        page_df["galerie"] = galeries.apply(render_gallery)
         page_df.drop(columns=["images_page"], inplace=True)
 
     # === Options === (parking, jardin, balcon/terrasse, piscine, ascenseur, accès handicapé) afficher des ronds de couleurs différentes pour chaque option
@@ -401,17 +597,70 @@ def render_data_table(df: pd.DataFrame):
         page_df["options"] = page_df["options"].replace("", "—")
     page_df.columns = ['Type', 'Ville', 'Prix', 'Surface', 'Prix/m²', 'Lien', 'Galerie', 'Options']
 
-    st.write(page_df.to_html(escape=False, index=False), unsafe_allow_html=True)
+    with stage("render_data_table.html"):
+        html = page_df.to_html(escape=False, index=False)
+    st.write(html, unsafe_allow_html=True)
     st.caption(f"📄 Total : {total_rows} annonces")
 
 
-def render_visualizations(df: pd.DataFrame):
+def render_export(dataset: Dataset, rows: np.ndarray, filtres: dict):
+    """
+    Export de toute la sélection filtrée (colonnes choisies) en CSV, Parquet ou XLSX.
+
+    Le fichier est produit par blocs (export.py) : la sélection n'est jamais
+    copiée en entier. Si SERVICE_URL est défini, le bouton pointe vers /export
+    du service, qui envoie le fichier en flux sans passer par Streamlit ; sinon
+    le fichier est écrit sur disque à la demande puis proposé au téléchargement.
+    """
+    with st.expander("📥 Exporter la sélection"):
+        defaut = [c for c in dataset.columns if c not in EXCLUDED_COLUMNS]
+        colonnes = st.multiselect("Colonnes", dataset.columns, default=defaut, key="export_colonnes")
+        fmt = st.radio("Format", list(EXPORT_FORMATS), format_func=str.upper, horizontal=True, key="export_format")
+        if not colonnes or len(rows) == 0:
+            st.info("Sélectionnez au moins une colonne et une annonce à exporter.")
+            return
+        type_mime, extension = EXPORT_FORMATS[fmt]
+        st.caption(f"{len(rows):,} annonces × {len(colonnes)} colonnes".replace(",", " "))
+
+        if SERVICE_URL:
+            params = filters_params(filtres) + [("format", fmt)] + [("colonne", c) for c in colonnes]
+            st.link_button("📥 Télécharger", f"{SERVICE_URL.rstrip('/')}/export?{urlencode(params)}")
+            return
+
+        # Fichier préparé pour cette sélection, ces colonnes et ce format (un seul par session)
+        cle = (filters_key(dataset, filtres), tuple(colonnes), fmt)
+        export = st.session_state.get("export")
+        if export is None or export["cle"] != cle:
+            if not st.button("⚙️ Préparer le fichier"):
+                return
+            if export is not None:
+                Path(export["chemin"]).unlink(missing_ok=True)
+            EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=EXPORT_DIR, suffix=extension, delete=False) as f:
+                chemin = f.name
+            with st.spinner("Préparation de l'export..."):
+                write_export(chemin, dataset.df, rows, colonnes, fmt)
+            export = st.session_state.export = {"cle": cle, "chemin": chemin}
+        if not Path(export["chemin"]).exists():
+            st.session_state.pop("export")
+            st.rerun()
+        with open(export["chemin"], "rb") as f:
+            st.download_button(
+                f"📥 Télécharger ({Path(export['chemin']).stat().st_size / 1e6:.1f} Mo)", f,
+                file_name=f"annonces{extension}", mime=type_mime, on_click="ignore",
+            )
+
+
+def render_visualizations(df: pd.DataFrame, charts: dict):
     """
     Affiche les graphiques d'analyse.
 
     Paramètres:
     - df : DataFrame contenant les données des annonces.
+    - charts : agrégats par catégorie calculés par query.chart_data().
     """
+    import plotly.express as px  # importé au premier graphique, pas au démarrage
+
     st.subheader("📊 Visualisations")
     colA, colB = st.columns(2)
 
@@ -419,29 +668,27 @@ def render_visualizations(df: pd.DataFrame):
         if "prix" in df:
             fig = px.histogram(df, x="prix", nbins=30, color_discrete_sequence=["#3b82f6"])
             fig.update_layout(title="Distribution des prix (€)", title_x=0.3, xaxis_title="Prix (€)", yaxis_title="Nombre d'annonces")
-            st.plotly_chart(fig, use_container_width=True)
+            plot_chart(fig)
 
     with colB:
         if "prix_m2" in df:
             fig = px.box(df, y="prix_m2", color_discrete_sequence=["#10b981"])
             fig.update_layout(title="Boxplot du prix au m²", title_x=0.3, yaxis_title="Prix/m² (€)")
-            st.plotly_chart(fig, use_container_width=True)
+            plot_chart(fig)
 
-    if "ville" in df:
+    if "villes" in charts:
         st.subheader("🏙️ Répartition par ville")
 
-        # On prépare les données
-        data_villes = df["ville"].value_counts().reset_index()
-        data_villes.columns = ["Ville", "Nombre d'annonces"]
-
-        # On laisse Plotly gérer la couleur par Ville
+        # Une couleur par ville, dans l'ordre de la palette Plotly (une seule trace :
+        # color="Ville" en créait une par ville, soit des secondes pour un millier de villes)
+        palette = px.colors.qualitative.Plotly
         fig = px.bar(
-            data_villes,
+            charts["villes"],
             x="Ville",
             y="Nombre d'annonces",
-            color="Ville",  # 👈 clé : une couleur par ville
             title="Nombre d'annonces par ville",
         )
+        fig.update_traces(marker_color=[palette[i % len(palette)] for i in range(len(charts["villes"]))])
 
         # Options visuelles
         fig.update_layout(
@@ -449,44 +696,19 @@ def render_visualizations(df: pd.DataFrame):
             showlegend=False,  # tu peux mettre True si tu veux afficher la légende
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart(fig)
     
     colA, colB = st.columns(2)
 
-    # --- Palette de couleurs cohérente avec DPE/GES
-    dpe_colors = {
-        "A": "#16a34a",  # Vert foncé
-        "B": "#65a30d",
-        "C": "#ca8a04",
-        "D": "#f59e0b",
-        "E": "#f97316",
-        "F": "#dc2626",
-        "G": "#991b1b"
-    }
-
-    ges_colors = {
-        "A": "#0ea5e9",  # bleu clair
-        "B": "#38bdf8",
-        "C": "#22d3ee",
-        "D": "#a855f7",
-        "E": "#d946ef",
-        "F": "#f43f5e",
-        "G": "#7f1d1d",  # rouge foncé
-    }
-
     with colA:
-        if "dpe" in df:
-            dpe_counts = df["dpe"].value_counts().reindex(["A","B","C","D","E","F","G"]).fillna(0)
-            dpe_df = dpe_counts.reset_index()
-            dpe_df.columns = ["DPE", "Nombre d'annonces"]
-
+        if "dpe" in charts:
             fig = px.bar(
-                dpe_df,
+                charts["dpe"],
                 y="DPE",
                 x="Nombre d'annonces",
                 orientation="h",
                 color="DPE",
-                color_discrete_map=dpe_colors,
+                color_discrete_map=DPE_COLORS,
                 title="🏠 Distribution des DPE (énergie)",
             )
 
@@ -499,21 +721,17 @@ def render_visualizations(df: pd.DataFrame):
                 height=400,
             )
 
-            st.plotly_chart(fig, use_container_width=True)
+            plot_chart(fig)
 
     with colB:
-        if "ges" in df:
-            ges_counts = df["ges"].value_counts().reindex(["A","B","C","D","E","F","G"]).fillna(0)
-            ges_df = ges_counts.reset_index()
-            ges_df.columns = ["GES", "Nombre d'annonces"]
-
+        if "ges" in charts:
             fig = px.bar(
-                ges_df,
+                charts["ges"],
                 y="GES",
                 x="Nombre d'annonces",
                 orientation="h",
                 color="GES",
-                color_discrete_map=ges_colors,
+                color_discrete_map=GES_COLORS,
                 title="🌫️ Distribution des GES (gaz à effet de serre)",
             )
 
@@ -526,25 +744,38 @@ def render_visualizations(df: pd.DataFrame):
                 height=400,
             )
 
-            st.plotly_chart(fig, use_container_width=True)
+            plot_chart(fig)
 
 
-def render_rankings(df: pd.DataFrame):
+def render_crossfilter(dataset: Dataset, rows: np.ndarray):
+    """
+    Exploration interactive : graphiques liés, filtrés dans le navigateur (voir crossfilter.py).
+
+    Paramètres:
+    - dataset : jeu de données complet (colonnes envoyées une fois par version).
+    - rows : lignes retenues par les filtres de la barre latérale.
+    """
+    st.subheader("⚡ Exploration interactive")
+    st.caption("Sélectionnez une plage sur un histogramme ou le boxplot, cliquez sur une ville, une lettre ou une option : "
+               "tous les graphiques se mettent à jour sans recharger la page.")
+    source = crossfilter_source(dataset, dataset.version)
+    page = render_html(source, pack_selection(rows, len(dataset)), {"dpe": DPE_COLORS, "ges": GES_COLORS})
+    components.html(page, height=CROSSFILTER_HEIGHT, scrolling=True)
+
+
+def render_rankings(rankings: dict):
     """
     Affiche les classements des villes selon le prix moyen/m² et la surface moyenne.
     Montre le top 10 et le bottom 10 pour chaque critère.
+
+    Paramètres:
+    - rankings : classements calculés par query.rankings() (partagés : ne pas modifier).
     """
     st.subheader("🏅 Classements des villes")
 
     # --- Classement par prix au m² ---
-    if "ville" in df and "prix_m2" in df:
-        classement_prix = (
-            df.groupby("ville")["prix_m2"]
-            .mean()
-            .reset_index()
-            .sort_values(by="prix_m2", ascending=True)
-        )
-        classement_prix.columns = ["Ville", "Prix moyen/m² (€)"]
+    if "prix" in rankings:
+        classement_prix = rankings["prix"]
 
         # Top 10 moins chères
         top_10_moins_cheres = classement_prix.head(10).reset_index(drop=True)
@@ -564,14 +795,8 @@ def render_rankings(df: pd.DataFrame):
             st.write(top_10_plus_cheres.style.format({"Prix moyen/m² (€)": "{:,.0f} €"}).to_html(escape=False), unsafe_allow_html=True)
 
     # --- Classement par surface moyenne ---
-    if "ville" in df and "surface" in df:
-        classement_surface = (
-            df.groupby("ville")["surface"]
-            .mean()
-            .reset_index()
-            .sort_values(by="surface", ascending=False)
-        )
-        classement_surface.columns = ["Ville", "Surface moyenne (m²)"]
+    if "surface" in rankings:
+        classement_surface = rankings["surface"]
 
         # Top 10 plus grandes
         top_10_plus_grandes = classement_surface.head(10).reset_index(drop=True)
@@ -592,6 +817,119 @@ def render_rankings(df: pd.DataFrame):
             st.write(top_10_plus_petites.style.format({"Surface moyenne (m²)": "{:,.0f} m²"}).to_html(escape=False), unsafe_allow_html=True)
 
 
+@st.fragment
+def render_history():
+    """
+    Affiche l'évolution de la médiane du prix au m² dans le temps.
+    Lit uniquement les agrégats quotidiens pré-calculés par history.py.
+    Fragment : ses widgets ne relancent que cette section, pas la page entière.
+    """
+    import plotly.express as px  # importé au premier graphique, pas au démarrage
+
+    st.subheader("📈 Évolution des prix")
+
+    rollups = load_rollups()
+    if rollups.empty:
+        st.info("Aucun historique disponible pour le moment : il sera alimenté à chaque exécution du pipeline.")
+        return
+
+    niveau = st.radio("Niveau", ["Ville", "Département"], horizontal=True, key="history_level")
+    rollups = rollups[rollups["niveau"] == ("ville" if niveau == "Ville" else "departement")]
+
+    # Par défaut : les 5 zones les plus représentées au dernier relevé
+    dernier_jour = rollups["date"].max()
+    par_defaut = (
+        rollups[rollups["date"] == dernier_jour]
+        .nlargest(5, "nb_annonces")["cle"]
+        .tolist()
+    )
+    cles = st.multiselect(
+        f"🏙️ {niveau}s",
+        sorted(rollups["cle"].unique()),
+        default=par_defaut,
+        key=f"history_keys_{niveau}",
+    )
+    if not cles:
+        st.warning("Sélectionnez au moins une zone.")
+        return
+
+    data = rollups[rollups["cle"].isin(cles)].sort_values("date")
+    fig = px.line(
+        data,
+        x="date",
+        y="prix_m2_median",
+        color="cle",
+        markers=True,
+        hover_data=["nb_annonces"],
+        title="Médiane du prix au m² par jour",
+    )
+    fig.update_layout(title_x=0.3, xaxis_title="Date", yaxis_title="Prix/m² médian (€)", legend_title=niveau)
+    plot_chart(fig)
+    st.caption(f"📅 {data['date'].nunique()} relevés — dernier relevé : {dernier_jour}")
+
+
+@st.fragment
+def render_agencies():
+    """
+    Affiche les indicateurs par agence : stock, prix/m² médian face au marché local et rotation.
+    Lit uniquement les agrégats tenus par agencies.py (indépendants des filtres de la barre latérale).
+    Fragment : ses widgets ne relancent que cette section, pas la page entière.
+    """
+    import plotly.express as px  # importé au premier graphique, pas au démarrage
+
+    st.subheader("🏢 Agences")
+
+    agences = load_agencies()
+    if agences.empty:
+        st.info("Aucun agrégat par agence disponible pour le moment : ils seront alimentés à chaque exécution du pipeline.")
+        return
+
+    stock_min = st.slider("Stock minimum", 1, max(2, int(agences["stock"].max())), min(5, int(agences["stock"].max())),
+                          key="agencies_min_stock")
+    agences = agences[agences["stock"] >= stock_min]
+    if agences.empty:
+        st.warning("Aucune agence avec ce stock.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("🏢 Agences", f"{len(agences):,}".replace(",", " "))
+    col2.metric("📦 Annonces en stock", f"{int(agences['stock'].sum()):,}".replace(",", " "))
+    col3.metric("📅 Durée en ligne médiane", f"{agences['jours_en_ligne'].median():.0f} jours"
+                if agences["jours_en_ligne"].notna().any() else "—")
+
+    fig = px.scatter(
+        agences.reset_index(),
+        x="stock",
+        y="ecart",
+        size="stock",
+        color="rotation",
+        hover_name="agence",
+        hover_data={"prix_m2_median": ":,.0f", "prix_m2_local": ":,.0f"},
+        log_x=True,
+        color_continuous_scale="Viridis",
+        title="Écart du prix/m² médian à celui du marché local",
+    )
+    fig.add_hline(y=0, line_dash="dot", line_color="#9ca3af")
+    fig.update_layout(title_x=0.3, xaxis_title="Annonces en stock", yaxis_title="Écart au marché local",
+                      yaxis_tickformat="+.0%", coloraxis_colorbar_title="Rotation")
+    plot_chart(fig)
+
+    tableau = agences.rename(columns={
+        "stock": "Stock", "entrees": "Entrées", "sorties": "Sorties", "prix_m2_median": "Prix/m² médian (€)",
+        "prix_m2_local": "Prix/m² local (€)", "ecart": "Écart", "jours_en_ligne": "Durée en ligne (jours)",
+        "rotation": "Rotation",
+    })
+    st.dataframe(
+        tableau.style.format({
+            "Prix/m² médian (€)": "{:,.0f}", "Prix/m² local (€)": "{:,.0f}", "Écart": "{:+.1%}",
+            "Durée en ligne (jours)": "{:.1f}", "Rotation": "{:.0%}",
+        }, na_rep="—"),
+        use_container_width=True,
+    )
+    st.caption("Prix/m² local : médiane du stock des départements de l'agence, pondérés par son stock dans chacun. "
+               "Rotation : part des annonces vues par l'agence qui sont sorties.")
+
+
 def render_settings():
     """Affiche les paramètres de l'application."""
     st.subheader("⚙️ Paramètres")
@@ -632,6 +970,7 @@ def render_settings():
         payload = {"ref": "main"}
 
         try:
+            import requests
             resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=15)
         except Exception as e:
             return False, f"Requête échouée: {e}"
@@ -659,32 +998,163 @@ def render_settings():
             else:
                 st.error(msg)
 
+    if LOCAL_PIPELINE:
+        st.markdown("---")
+        render_local_pipeline()
+
+
+def render_local_pipeline():
+    """
+    Lance le pipeline (scraping puis nettoyage) sur cette machine et suit sa
+    progression sans bloquer le tableau de bord : les nouvelles annonces sont
+    servies à cette session dès la fin de l'exécution, sans attendre GitHub
+    Actions, puis à toutes après promotion.
+    Réservé aux sessions munies d'un token GitHub pouvant déclencher main.yml.
+    """
+    runner = pipeline_runner()
+    st.markdown("### 🖥️ Exécuter le pipeline en local")
+    st.markdown(
+        f"Le crawl puis `clean.py` sont lancés en arrière-plan sur ce serveur ; le résultat est servi à cette "
+        f"session à la fin de l'exécution, et remplace `{CSV_PATH}` dans `{LOCAL_DATA_DIR}` pour toutes les "
+        f"sessions une fois publié."
+    )
+    token = st.text_input(
+        "Token GitHub (droit d'écriture sur le dépôt)", type="password", placeholder="ghp_xxx...", key="pipeline_token"
+    )
+    col_pages, col_url = st.columns(2)
+    max_pages = col_pages.number_input("Pages au plus (0 = crawl complet)", min_value=0, value=0, step=100, key="pipeline_max_pages")
+    base_url = col_url.text_input(
+        "Site à crawler (facultatif)", placeholder="https://www.etreproprio.com", key="pipeline_base_url"
+    )
+    if st.button("🖥️ Lancer en local"):
+        if not can_dispatch(token.strip()):
+            st.error("Token GitHub absent ou sans droit d'écriture sur le dépôt.")
+        else:
+            st.session_state.pipeline_authorized = True
+            try:
+                st.session_state.pipeline_job = runner.submit(max_pages=int(max_pages), base_url=base_url.strip())
+                st.toast(f"Exécution #{st.session_state.pipeline_job.id} ajoutée à la file.")
+            except ValueError as e:
+                st.error(str(e))
+    autorise = st.session_state.get("pipeline_authorized", False)
+
+    # Rafraîchissement périodique de la seule progression tant qu'une exécution est en cours
+    actif = runner.busy
+
+    @st.fragment(run_every=PIPELINE_REFRESH if actif else None)
+    def progression():
+        for job in reversed(runner.jobs[-5:]):
+            icone = {"terminé": "✅", "échec": "❌", "annulé": "⏹️"}.get(job.status, "⏳")
+            st.markdown(f"**{icone} Exécution #{job.id}** — {job.status} ({job.elapsed:.0f} s)")
+            if job.max_pages and job.status == "scraping":
+                st.progress(min(job.pages / job.max_pages, 1.0))
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Pages", f"{job.pages:,}".replace(",", " "), f"{job.pages_per_s:.1f} pages/s", delta_color="off")
+            col2.metric("Annonces collectées", f"{job.items:,}".replace(",", " "), f"{job.items_per_s:.1f} /s", delta_color="off")
+            col3.metric("Lignes nettoyées", f"{job.rows:,}".replace(",", " "), f"{job.rows_per_s:,.0f} lignes/s".replace(",", " "), delta_color="off")
+            if autorise and job.active:
+                col4.button("⏹️ Annuler", key=f"pipeline_cancel_{job.id}", on_click=runner.cancel, args=(job,))
+            if autorise and job.dataset is not None and job.dataset is not runner.dataset:
+                if col4.button("📤 Publier", key=f"pipeline_promote_{job.id}", help="Servir ce jeu à toutes les sessions"):
+                    try:
+                        runner.promote(job)
+                        st.rerun(scope="app")
+                    except RuntimeError as e:
+                        st.error(str(e))
+            if job.error:
+                st.error(job.error)
+            with st.expander("Journal"):
+                st.code("\n".join(list(job.log)[-30:]) or "—", language=None)
+        # Fin de l'exécution suivie : rerun complet pour servir le nouveau jeu et arrêter le rafraîchissement
+        if actif and not runner.busy:
+            st.rerun(scope="app")
+
+    progression()
+
 
 # =========================
 # Application principale
 # =========================
+TABS = ["📋 Données", "📊 Visualisations", "🏅 Classements", "📈 Évolution", "🏢 Agences", "⚙️ Paramètres"]
+
+
+def tab_selector(labels: list) -> str:
+    """
+    Affiche la barre d'onglets et retourne l'onglet actif.
+    Contrairement à st.tabs, dont l'onglet ouvert n'est connu que du navigateur,
+    le choix est lu côté Python : main() ne calcule que la section affichée.
+
+    Paramètres:
+        labels (list): libellés des onglets, dans l'ordre d'affichage
+
+    Retourne:
+        str: libellé de l'onglet actif
+    """
+    # Premier affichage ou onglet disparu (Debug retiré de l'URL) : retour au premier onglet
+    if st.session_state.get("active_tab") not in labels:
+        st.session_state.active_tab = labels[0]
+    onglet = st.radio("Onglet", labels, key="active_tab", horizontal=True, label_visibility="collapsed")
+    return onglet
+
+
 def main():
-    apply_custom_css()
+    start_rerun()
+    with stage("apply_custom_css"):
+        apply_custom_css()
 
-    df = load_data()
-    if df.empty:
+    with stage("load_data"):
+        try:
+            dataset = current_dataset()
+        except RuntimeError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+    if dataset.df.empty:
         st.stop()
+    track_memory("dataset (partagé)", dataset.memory_bytes)
 
     render_header()
-    filtered_df = sidebar_filters(df)
-
-    render_summary(filtered_df)
-
-    tab1, tab2, tab3, tab4 = st.tabs(["📋 Données", "📊 Visualisations", "🏅 Classements", "⚙️ Paramètres"])
-    with tab1:
-        render_data_table(filtered_df)
-    with tab2:
-        render_visualizations(filtered_df)
-    with tab3:
-        render_rankings(filtered_df)
-    with tab4:
+    with stage("sidebar_filters"):
+        filtres = sidebar_filters(dataset)
+    with stage("query"):
+        # Sélection et agrégats partagés : des filtres identiques ne sont calculés qu'une fois
+        resultat, st.session_state.query_cache_hit = result_cache().get(dataset, filtres)
+    track_memory("sélection (partagée)", int(resultat.rows.nbytes))
+
+    with stage("render_summary"):
+        render_summary(resultat.summary)
+
+    debug = DEBUG or st.query_params.get("debug") == "1"
+    onglet = tab_selector(TABS + (["🛠️ Debug"] if debug else []))
+    # Seul l'onglet affiché est calculé : st.tabs exécutait (et envoyait) les six à chaque rerun
+    if onglet == "📋 Données":
+        with stage("render_data_table"):
+            render_data_table(dataset.view(resultat.rows))
+        with stage("render_export"):
+            render_export(dataset, resultat.rows, filtres)
+    elif onglet == "📊 Visualisations":
+        if st.toggle("⚡ Exploration interactive", key="crossfilter",
+                     help="Graphiques liés : les sélections sont appliquées dans le navigateur, sans rechargement."):
+            with stage("render_crossfilter"):
+                render_crossfilter(dataset, resultat.rows)
+        else:
+            with stage("render_visualizations"):
+                render_visualizations(dataset.view(resultat.rows), resultat.charts)
+    elif onglet == "🏅 Classements":
+        with stage("render_rankings"):
+            render_rankings(resultat.rankings)
+    elif onglet == "📈 Évolution":
+        with stage("render_history"):
+            render_history()
+    elif onglet == "🏢 Agences":
+        with stage("render_agencies"):
+            render_agencies()
+    elif onglet == "⚙️ Paramètres":
         render_settings()
 
+    finish_rerun()
+    if onglet == "🛠️ Debug":
+        render_debug_panel(result_cache().stats())
+
 
 if __name__ == "__main__":
     main()
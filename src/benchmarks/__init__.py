@@ -0,0 +1,8 @@
+"""
+Benchmarks du pipeline (nettoyage, déduplication, historique), des fonctions
+du tableau de bord exécutées sans navigateur et du parsing du spider, sur des
+jeux de données synthétiques de 1k à 10M annonces.
+
+Usage (depuis src/) :
+    python -m benchmarks --sizes 1000 10000 100000 --output bench_results.json
+"""
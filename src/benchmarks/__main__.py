@@ -0,0 +1,274 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(SRC_DIR / "webscraping"))
+
+from benchmarks.generator import (  # noqa: E402
+    build_site, generate_clean, generate_communes, generate_gazetteer, nb_communes, to_raw_items,
+)
+
+
+# =========================
+# Cas de benchmark
+# =========================
+# Chaque cas reçoit les données préparées pour une taille donnée et retourne
+# (préparation, exécution) : seule l'exécution est chronométrée, la préparation
+# fournit une copie fraîche des entrées à chaque répétition.
+CASES = {}
+
+
+def case(name):
+    def register(fonction):
+        CASES[name] = fonction
+        return fonction
+    return register
+
+
+@case("clean.clean_dataframe")
+def bench_clean(data):
+    from clean import clean_dataframe
+    return (lambda: data["raw"].copy()), clean_dataframe
+
+
+@case("gazetteer.geocode")
+def bench_geocode(data):
+    from gazetteer import Gazetteer, geocode
+    gazetteer = Gazetteer(data["gazetteer"])
+    return (lambda: data["clean"]), (lambda df: geocode(df, gazetteer))
+
+
+@case("dedup.deduplicate")
+def bench_dedup(data):
+    from dedup import deduplicate
+    return (lambda: data["clean"]), deduplicate
+
+
+@case("history.update_history")
+def bench_history(data):
+    from history import COLONNES_HISTORIQUE, update_history
+    veille = update_history(pd.DataFrame(columns=COLONNES_HISTORIQUE), data["clean"], "2025-01-01")
+    return (lambda: veille.copy()), (lambda h: update_history(h, data["clean"], "2025-01-02"))
+
+
+@case("agencies.AgencyAggregates.update")
+def bench_agencies(data):
+    from agencies import AgencyAggregates
+    veille = AgencyAggregates()
+    veille.update(data["clean"], "2025-01-01")
+    # Relevé du lendemain : 5 % des annonces sorties
+    releve = data["clean"].sample(frac=0.95, random_state=0)
+    return (
+        (lambda: AgencyAggregates(veille.counters, veille.sketches, veille.active, veille.partitions)),
+        (lambda agregats: agregats.update(releve, "2025-01-02")),
+    )
+
+
+@case("dataset.Dataset")
+def bench_dataset(data):
+    from dataset import Dataset
+    return (lambda: data["clean"]), Dataset
+
+
+@case("search.SearchIndex.build")
+def bench_search_index(data):
+    from search import SearchIndex
+    return (lambda: data["clean"]), SearchIndex.build
+
+
+@case("app.sidebar_filters")
+def bench_sidebar_filters(data):
+    from dataset import Dataset
+    app = import_app()
+    dataset = Dataset(data["clean"])
+    return (lambda: dataset), app.sidebar_filters
+
+
+@case("query.compute")
+def bench_query_compute(data):
+    from dataset import Dataset
+    from query import compute
+    dataset = Dataset(data["clean"])
+    filtres = {"prix": dataset.prix_bounds, "surface": dataset.surface_bounds}
+    return (lambda: filtres), (lambda f: compute(dataset, f))
+
+
+@case("query.ResultCache.hit")
+def bench_query_cache_hit(data):
+    from dataset import Dataset
+    from query import ResultCache
+    dataset = Dataset(data["clean"])
+    cache = ResultCache()
+    filtres = {"prix": dataset.prix_bounds, "surface": dataset.surface_bounds}
+    cache.get(dataset, filtres)
+    return (lambda: filtres), (lambda f: cache.get(dataset, f))
+
+
+@case("app.render_summary")
+def bench_render_summary(data):
+    from query import summary
+    app = import_app()
+    return (lambda: summary(data["clean"])), app.render_summary
+
+
+@case("app.render_rankings")
+def bench_render_rankings(data):
+    from query import rankings
+    app = import_app()
+    return (lambda: rankings(data["clean"])), app.render_rankings
+
+
+@case("app.render_data_table")
+def bench_render_data_table(data):
+    app = import_app()
+    return (lambda: data["clean"]), app.render_data_table
+
+
+@case("spider.parse")
+def bench_spider(data):
+    from scrapy.http import HtmlResponse, Request
+    from webscraping.spiders.french_immobilier import FrenchImmobilierSpider
+
+    spider = FrenchImmobilierSpider()
+    reponses = []
+    for chemin, (callback, html) in data["site"].items():
+        url = "https://www.etreproprio.com" + chemin
+        requete = Request(url, callback=getattr(spider, callback), meta={"url_annonce": url})
+        reponses.append(HtmlResponse(url, body=html.encode("utf-8"), encoding="utf-8", request=requete))
+
+    def parse_all(reponses):
+        for reponse in reponses:
+            for _ in reponse.request.callback(reponse) or ():
+                pass
+
+    return (lambda: reponses), parse_all
+
+
+def import_app():
+    """Importe app.py sans serveur Streamlit (mode "bare" : les widgets renvoient leur valeur par défaut)."""
+    # Sans serveur, chaque appel st.* journalise "missing ScriptRunContext" : on
+    # filtre ce message pour ne pas fausser les mesures (Streamlit réinitialise
+    # les niveaux de log à la lecture de sa configuration, un filtre y résiste).
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage()
+    )
+    import app
+    return app
+
+
+# =========================
+# Exécution
+# =========================
+def prepare(n: int, seed: int, spider_max: int) -> dict:
+    clean = generate_clean(n, seed=seed)
+    return {
+        "clean": clean,
+        "gazetteer": generate_gazetteer(generate_communes(nb_communes(n), np.random.default_rng(seed)), seed=seed),
+        "raw": pd.DataFrame(to_raw_items(clean)),
+        "site": build_site(clean.head(spider_max)),
+    }
+
+
+def run_case(nom: str, data: dict, repeat: int) -> dict:
+    preparer, executer = CASES[nom](data)
+    durees = []
+    for _ in range(repeat):
+        entree = preparer()
+        debut = time.perf_counter()
+        executer(entree)
+        durees.append(time.perf_counter() - debut)
+    lignes = len(data["site"]) if nom == "spider.parse" else len(data["clean"])
+    mediane = statistics.median(durees)
+    return {
+        "case": nom,
+        "n": len(data["clean"]),
+        "rows": lignes,
+        "repeat": repeat,
+        "median_s": round(mediane, 6),
+        "min_s": round(min(durees), 6),
+        "rows_per_s": round(lignes / mediane, 1) if mediane else None,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=SRC_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def compare(resultats: list, baseline_file: str, max_regression: float) -> bool:
+    """Compare aux résultats de référence ; retourne False si un cas régresse au-delà du seuil."""
+    reference = {(r["case"], r["n"]): r for r in json.loads(Path(baseline_file).read_text())["results"]}
+    ok = True
+    print(f"\n{'Cas':<28}{'n':>10}{'réf. (s)':>12}{'actuel (s)':>12}{'ratio':>8}")
+    for r in resultats:
+        ref = reference.get((r["case"], r["n"]))
+        if ref is None:
+            continue
+        ratio = r["median_s"] / ref["median_s"] if ref["median_s"] else float("inf")
+        alerte = " ⚠️" if ratio > max_regression else ""
+        ok &= ratio <= max_regression
+        print(f"{r['case']:<28}{r['n']:>10}{ref['median_s']:>12.4f}{r['median_s']:>12.4f}{ratio:>8.2f}{alerte}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline et du tableau de bord.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="tailles des jeux synthétiques (ex : 1000 10000 100000 1000000 10000000)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spider-max", type=int, default=2_000,
+                        help="nombre maximal d'annonces du site synthétique parsé par le spider")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="fichier de résultats de référence à comparer")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="ratio actuel/référence au-delà duquel un cas est en régression")
+    args = parser.parse_args()
+
+    resultats = []
+    for n in args.sizes:
+        print(f"📦 Génération de {n:,} annonces...")
+        data = prepare(n, args.seed, args.spider_max)
+        for nom in args.cases:
+            resultat = run_case(nom, data, args.repeat)
+            resultats.append(resultat)
+            print(f"  {nom:<28}{resultat['median_s']:>10.4f} s  ({resultat['rows_per_s']:,.0f} lignes/s)")
+
+    Path(args.output).write_text(
+        json.dumps({"meta": {**environment(), "seed": args.seed}, "results": resultats}, indent=2), encoding="utf-8"
+    )
+    print(f"✅ Résultats écrits dans {args.output}")
+
+    if args.baseline and not compare(resultats, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from agencies import SANS_AGENCE, SKETCH_ACCURACY, AgencyAggregates  # noqa: E402
+from benchmarks.generator import generate_clean  # noqa: E402
+from history import departement_from_code_postal, extract_id  # noqa: E402
+
+
+# =========================
+# Agrégats des agences : mise à jour incrémentale face au recalcul complet
+# =========================
+# Simule une suite de crawls quotidiens d'un stock d'annonces synthétiques :
+# chaque jour, une partie des annonces est retirée, de nouvelles arrivent,
+# certains prix changent, et quelques départements ne sont pas relevés
+# (shard en échec). Compare, jour après jour :
+# - AgencyAggregates.update() sur le seul relevé du jour ;
+# - le recalcul par groupby sur tout l'historique des relevés (référence).
+# Vérifie ensuite que les deux donnent les mêmes stocks, entrées, sorties et
+# durées en ligne, des médianes à l'erreur du sketch près, et que des
+# agrégats tenus séparément sur deux moitiés des départements, puis fusionnés
+# (merge), sont identiques à ceux tenus ensemble.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.agency_aggregates -n 20000 --days 15
+
+
+def simulate(n: int, jours: int, seed: int):
+    """Relevés quotidiens (jour, DataFrame nettoyé) d'un stock de n annonces qui se renouvelle."""
+    rng = np.random.default_rng(seed)
+    reserve = generate_clean(n * 2, seed=seed)
+    reserve["departement"] = departement_from_code_postal(reserve["code_postal"]).astype(str)
+    en_ligne = np.zeros(len(reserve), dtype=bool)
+    en_ligne[:n] = True
+    suivant = n
+    departements = reserve["departement"].unique()
+    for j in range(jours):
+        jour = (pd.Timestamp("2025-01-01") + pd.Timedelta(days=j)).date().isoformat()
+        if j:
+            retires = rng.random(len(reserve)) < 0.03
+            en_ligne &= ~retires
+            arrivees = min(len(reserve) - suivant, int(n * 0.03))
+            en_ligne[suivant:suivant + arrivees] = True
+            suivant += arrivees
+            baisses = en_ligne & (rng.random(len(reserve)) < 0.02)
+            reserve.loc[baisses, "prix_m2"] = (reserve.loc[baisses, "prix_m2"] * 0.95).round(2)
+        manques = rng.choice(departements, size=max(1, len(departements) // 20), replace=False) if j else []
+        releve = reserve[en_ligne & ~reserve["departement"].isin(manques).to_numpy()]
+        yield jour, releve.copy()
+
+
+def recompute(historique: pd.DataFrame) -> pd.DataFrame:
+    """Référence : indicateurs par agence recalculés par groupby sur tout l'historique des relevés."""
+    h = historique
+    # Relevés de chaque département : une annonce est sortie si le relevé suivant de son département ne la contient plus
+    releves = h[["departement", "jour"]].drop_duplicates().sort_values(["departement", "jour"])
+    releves["jour_suivant"] = releves.groupby("departement")["jour"].shift(-1)
+    par_annonce = h.sort_values("jour").groupby("id_annonce").agg(
+        agence=("agence", "last"), departement=("departement", "last"), debut=("jour", "min"),
+        dernier=("jour", "max"), prix_m2=("prix_m2", "last"),
+    )
+    par_annonce = par_annonce.merge(releves, left_on=["departement", "dernier"], right_on=["departement", "jour"], how="left")
+    sortie = par_annonce["jour_suivant"].notna()
+    par_annonce["jours"] = np.where(sortie, (pd.to_datetime(par_annonce["jour_suivant"]) - pd.to_datetime(par_annonce["debut"])).dt.days, 0)
+    stock = par_annonce[~sortie]
+    resume = pd.DataFrame({
+        "stock": stock.groupby("agence").size(),
+        "entrees": par_annonce.groupby("agence").size(),
+        "sorties": sortie.groupby(par_annonce["agence"]).sum(),
+        "jours_sortis": par_annonce.groupby("agence")["jours"].sum(),
+        # Médiane au rang (valeur inférieure si l'effectif est pair), comme celle lue dans le sketch
+        "prix_m2_median": stock.groupby("agence")["prix_m2"].quantile(0.5, interpolation="lower"),
+    }).fillna(0)
+    # Médiane locale : stock des départements de l'agence, pondéré par la part de l'agence dans chacun
+    poids = stock.groupby(["agence", "departement"]).size()
+    poids = (poids / poids.groupby(level="agence").transform("sum")).rename("poids").reset_index()
+    taille = stock.groupby("departement").size().rename("taille").reset_index()
+    melange = poids.merge(taille, on="departement").merge(stock[["departement", "prix_m2"]], on="departement")
+    melange["w"] = melange["poids"] / melange["taille"]
+    melange = melange.sort_values(["agence", "prix_m2"])
+    cumul = melange.groupby("agence")["w"].cumsum()
+    resume["prix_m2_local"] = melange[cumul >= 0.5 - 1e-9].drop_duplicates("agence").set_index("agence")["prix_m2"]
+    return resume.drop(SANS_AGENCE, errors="ignore")
+
+
+def check(agregats: AgencyAggregates, reference: pd.DataFrame):
+    resume = agregats.summary()
+    ref = reference.loc[resume.index]
+    assert set(resume.index) == set(reference.index[reference["entrees"] > 0])
+    for col in ["stock", "entrees", "sorties"]:
+        assert (resume[col] == ref[col]).all(), col
+    jours = (resume["jours_en_ligne"] * resume["sorties"]).fillna(0).round()
+    assert (jours == ref["jours_sortis"]).all()
+    en_stock = resume["stock"] > 0
+    for col in ["prix_m2_median", "prix_m2_local"]:
+        ecart = (resume.loc[en_stock, col] / ref.loc[en_stock, col] - 1).abs()
+        assert (ecart <= SKETCH_ACCURACY + 1e-9).all(), (col, ecart.max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mise à jour incrémentale des agrégats d'agences face au recalcul complet.")
+    parser.add_argument("-n", type=int, default=20_000, help="annonces en stock")
+    parser.add_argument("--days", type=int, default=15, help="nombre de relevés quotidiens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    agregats, moities = AgencyAggregates(), (AgencyAggregates(), AgencyAggregates())
+    historique, resultats = [], []
+    for jour, releve in simulate(args.n, args.days, args.seed):
+        debut = time.perf_counter()
+        agregats.update(releve, jour)
+        incremental = time.perf_counter() - debut
+
+        moitie = releve["departement"] < "50"
+        moities[0].update(releve[moitie], jour)
+        moities[1].update(releve[~moitie], jour)
+
+        historique.append(pd.DataFrame({
+            "jour": jour, "id_annonce": extract_id(releve["lien"]).to_numpy(),
+            "agence": releve["agence"].fillna(SANS_AGENCE).to_numpy(), "departement": releve["departement"].to_numpy(),
+            "prix_m2": releve["prix_m2"].to_numpy(),
+        }))
+        debut = time.perf_counter()
+        reference = recompute(pd.concat(historique, ignore_index=True))
+        complet = time.perf_counter() - debut
+        resultats.append({"jour": jour, "lignes_historique": sum(len(h) for h in historique),
+                          "incremental_s": round(incremental, 3), "recalcul_s": round(complet, 3)})
+        print(f"  {jour}  historique {resultats[-1]['lignes_historique']:>10,} lignes  "
+              f"incrémental {incremental:6.3f} s  recalcul complet {complet:6.3f} s")
+
+    check(agregats, reference)
+    fusion = moities[0].merge(moities[1])
+    pd.testing.assert_frame_equal(fusion.summary().sort_index(), agregats.summary().sort_index())
+    print("✅ Agrégats incrémentaux identiques au recalcul complet (médianes à l'erreur du sketch près) et fusionnables")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
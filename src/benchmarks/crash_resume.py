@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import BASE_URL, build_site, generate_clean, to_raw_items  # noqa: E402
+from benchmarks.site import serve  # noqa: E402
+
+
+# =========================
+# Vérification de la reprise après un arrêt brutal
+# =========================
+# Crawle le site local de substitution avec CHECKPOINT_DIR, tue le processus
+# (SIGKILL) une fois une fraction des annonces écrite, relance jusqu'au bout et
+# vérifie que items.jsonl contient chaque annonce du site exactement une fois.
+#
+# Avec --shards N, le crawl est lancé par webscraping.shards : le lanceur et
+# ses shards sont tués ensemble, puis on vérifie que chaque shard a repris son
+# propre journal (<checkpoint>-i/items.jsonl sans doublon) et que la sortie
+# fusionnée contient chaque annonce.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.crash_resume -n 600 --kill-at 0.3 0.7
+#   python -m benchmarks.crash_resume -n 300 --kill-at 0.5 --shards 2
+def crawl_command(base_url: str, checkpoint_dir: Path, shards: int = 0, output: Path = None) -> list:
+    if shards:
+        # Le délai entre deux requêtes est alors celui de la base partagée
+        lanceur = [sys.executable, "-m", "webscraping.shards", "-n", str(shards), "-O", str(output),
+                   "-s", "SHARED_DOWNLOAD_DELAY=0.005"]
+    else:
+        lanceur = [sys.executable, "-m", "scrapy", "crawl", "french_immobilier"]
+    return lanceur + [
+        "-a", f"base_url={base_url}",
+        "-s", f"CHECKPOINT_DIR={checkpoint_dir}",
+        "-s", "CHECKPOINT_INTERVAL=0.2",
+        "-s", "DOWNLOAD_DELAY=0.005",
+        "-s", "ROBOTSTXT_OBEY=False",
+        "-s", "TELEMETRY_FILE=",
+        "-s", "LOG_LEVEL=ERROR",
+    ]
+
+
+def count_lines(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def read_links(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(ligne)["lien"] for ligne in f]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tue un crawl en cours puis vérifie que la reprise est complète.")
+    parser.add_argument("-n", type=int, default=600, help="nombre d'annonces du site local")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kill-at", type=float, nargs="+", default=[0.5],
+                        help="fractions d'annonces écrites auxquelles le crawl est tué")
+    parser.add_argument("--shards", type=int, default=0, help="crawl partitionné en N shards (0 : un seul processus)")
+    args = parser.parse_args()
+
+    df = generate_clean(args.n, seed=args.seed)
+    server = serve(build_site(df))
+    base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    attendus = {base_url + item["lien"].replace(BASE_URL, "") for item in to_raw_items(df)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint_dir = Path(tmp) / "checkpoint"
+        output = Path(tmp) / "annonces.json"
+        if args.shards:
+            items_files = [Path(f"{checkpoint_dir}-{shard}") / "items.jsonl" for shard in range(args.shards)]
+        else:
+            items_files = [checkpoint_dir / "items.jsonl"]
+        commande = crawl_command(base_url, checkpoint_dir, args.shards, output)
+        cwd = SRC_DIR / "webscraping"
+
+        for fraction in args.kill_at:
+            # Nouvelle session : le lanceur des shards et ses sous-processus sont tués ensemble
+            processus = subprocess.Popen(commande, cwd=cwd, start_new_session=True)
+            while sum(map(count_lines, items_files)) < fraction * len(attendus) and processus.poll() is None:
+                time.sleep(0.05)
+            os.killpg(processus.pid, signal.SIGKILL)
+            processus.wait()
+            print(f"💥 Crawl tué avec {sum(map(count_lines, items_files))} annonces écrites")
+
+        debut = time.perf_counter()
+        subprocess.run(commande, cwd=cwd, check=True)
+        print(f"🔁 Reprise terminée en {time.perf_counter() - debut:.1f} s")
+
+        # Chaque journal est sans doublon ; en mode shards, la sortie fusionnée doit être complète
+        doublons = sum(len(liens) - len(set(liens)) for liens in map(read_links, items_files))
+        if args.shards:
+            with open(output, encoding="utf-8") as f:
+                liens = [item["lien"] for item in json.load(f)]
+        else:
+            liens = read_links(items_files[0])
+    server.shutdown()
+
+    manquants = attendus - set(liens)
+    doublons += len(liens) - len(set(liens))
+    print(f"📦 {len(liens)} annonces écrites / {len(attendus)} attendues, "
+          f"{len(manquants)} manquantes, {doublons} doublons")
+    if manquants or doublons:
+        print("❌ Reprise incomplète")
+        sys.exit(1)
+    print("✅ Reprise complète, sans doublon")
+
+
+if __name__ == "__main__":
+    main()
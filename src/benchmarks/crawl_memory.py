@@ -0,0 +1,111 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import build_site, generate_clean  # noqa: E402
+from benchmarks.site import serve  # noqa: E402
+
+
+# =========================
+# Mémoire et latence du crawl selon l'ordonnancement
+# =========================
+# Crawle le site local de substitution avec plusieurs configurations du
+# scheduler et relève, pour chacune, le pic de mémoire (RSS) du processus
+# Scrapy, le délai avant le premier item et la durée totale.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.crawl_memory -n 20000 [--output crawl_memory.json]
+CONFIGURATIONS = {
+    # Largeur d'abord : files FIFO, sans priorités ni plafond de villes
+    "largeur": [
+        "-s", "CALLBACK_PRIORITIES={}",
+        "-s", "VILLE_EXPANSION_MAX=0",
+        "-s", "SCHEDULER_MEMORY_QUEUE=scrapy.squeues.FifoMemoryQueue",
+    ],
+    # Réglages par défaut : priorités par callback et plafond de villes en cours
+    "profondeur": [],
+    # Idem avec les files du scheduler sur disque (JOBDIR)
+    "profondeur+disque": ["-s", "JOBDIR={tmp}/jobdir"],
+}
+
+
+def peak_rss_kb(pid: int) -> int:
+    """Pic de mémoire résidente d'un processus en Ko (Linux), 0 s'il vient de se terminer."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for ligne in f:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run_crawl(base_url: str, options: list, tmp: Path) -> dict:
+    sortie = tmp / "items.jsonl"
+    commande = [
+        sys.executable, "-m", "scrapy", "crawl", "french_immobilier",
+        "-a", f"base_url={base_url}",
+        "-O", str(sortie),
+        "-s", "DOWNLOAD_DELAY=0",
+        "-s", "ROBOTSTXT_OBEY=False",
+        "-s", "TELEMETRY_FILE=",
+        "-s", "LOG_LEVEL=ERROR",
+        *(option.replace("{tmp}", str(tmp)) for option in options),
+    ]
+    debut = time.perf_counter()
+    premier_item = None
+    processus = subprocess.Popen(commande, cwd=SRC_DIR / "webscraping")
+    rss_max = 0
+    while processus.poll() is None:
+        # VmHWM : pic de RSS depuis l'exec (ru_maxrss compterait aussi la mémoire héritée du fork)
+        rss_max = max(rss_max, peak_rss_kb(processus.pid))
+        if premier_item is None and sortie.exists() and sortie.stat().st_size > 0:
+            premier_item = time.perf_counter() - debut
+        time.sleep(0.01)
+    duree = time.perf_counter() - debut
+    if processus.returncode != 0:
+        raise subprocess.CalledProcessError(processus.returncode, commande)
+    with open(sortie, encoding="utf-8") as f:
+        nb_items = sum(1 for _ in f)
+    return {
+        "items": nb_items,
+        "premier_item_s": round(premier_item, 2) if premier_item is not None else None,
+        "duree_s": round(duree, 2),
+        "rss_max_mo": round(rss_max / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic de mémoire et délai avant le premier item selon l'ordonnancement.")
+    parser.add_argument("-n", type=int, default=20_000, help="nombre d'annonces du site local")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    server = serve(build_site(generate_clean(args.n, seed=args.seed)))
+    base_url = "http://127.0.0.1:%d" % server.server_address[1]
+
+    resultats = {}
+    print(f"{'Configuration':<20}{'items':>8}{'1er item (s)':>14}{'durée (s)':>11}{'RSS max (Mo)':>14}")
+    for nom in args.configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            r = run_crawl(base_url, CONFIGURATIONS[nom], Path(tmp))
+        resultats[nom] = r
+        print(f"{nom:<20}{r['items']:>8}{r['premier_item_s']:>14}{r['duree_s']:>11}{r['rss_max_mo']:>14}")
+    server.shutdown()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"n": args.n, "results": resultats}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import plotly.express as px
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean  # noqa: E402
+from crossfilter import MISSING_BIN, MISSING_LEVEL, PAYLOAD_MAGIC, build_payload  # noqa: E402
+from dataset import OPTION_COLUMNS, Dataset  # noqa: E402
+from query import DPE_LETTRES  # noqa: E402
+
+
+# =========================
+# Taille et fidélité des colonnes envoyées au filtrage croisé
+# =========================
+# Pour des jeux synthétiques de tailles croissantes, mesure la taille du
+# fichier de crossfilter.build_payload() (envoyé une fois par version du jeu)
+# et son temps de construction, face à ce que coûte chaque rerun des
+# graphiques Plotly (histogramme et boxplot, dont les figures embarquent les
+# valeurs de toutes les annonces). Le fichier est ensuite décodé comme le fait
+# le navigateur et comparé aux données sources :
+# - classes de prix et de surface cohérentes avec les bornes ;
+# - prix/m² restitué à un demi-pas de quantification près ;
+# - villes, lettres DPE/GES et options identiques.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.crossfilter_payload --sizes 10000 100000 500000
+
+
+def decode(contenu: bytes) -> tuple:
+    """(en-tête, colonnes numpy) — même lecture que templates/crossfilter.html."""
+    assert contenu[:4] == PAYLOAD_MAGIC
+    longueur = struct.unpack("<I", contenu[4:8])[0]
+    entete = json.loads(contenu[8:8 + longueur])
+    debut = (8 + longueur + 7) // 8 * 8
+    colonnes = {
+        c["nom"]: np.frombuffer(contenu, dtype="<" + {"uint8": "u1", "uint16": "u2"}[c["type"]],
+                                count=c["longueur"], offset=debut + c["position"])
+        for c in entete["colonnes"]
+    }
+    return entete, colonnes
+
+
+def check(dataset: Dataset, source, entete: dict, colonnes: dict):
+    df = dataset.df
+    for nom in ("prix", "surface"):
+        valeurs, codes, bornes = df[nom].to_numpy(dtype=float), colonnes[nom], np.array(entete[f"{nom}_bornes"])
+        presents = ~np.isnan(valeurs)
+        assert (codes[~presents] == MISSING_BIN).all() and (codes[presents] < len(bornes) - 1).all(), nom
+        # Hors des classes extrêmes (qui regroupent les valeurs aberrantes), la valeur est dans sa classe
+        milieu = presents & (codes > 0) & (codes < len(bornes) - 2)
+        c = codes[milieu]
+        tolerance = 0.01 + 1e-9 * np.abs(valeurs[milieu])
+        assert ((valeurs[milieu] >= bornes[c] - tolerance) & (valeurs[milieu] <= bornes[c + 1] + tolerance)).all(), nom
+
+    valeurs, codes = df["prix_m2"].to_numpy(dtype=float), colonnes["prix_m2"]
+    presents = np.isfinite(valeurs)
+    assert (codes[~presents] == MISSING_LEVEL).all()
+    restitue = entete["prix_m2"]["min"] + codes[presents] * entete["prix_m2"]["pas"]
+    assert np.abs(restitue - valeurs[presents]).max() <= entete["prix_m2"]["pas"] / 2 + 1e-6
+
+    villes = np.array(entete["villes"] + [None], dtype=object)[colonnes["ville"]]
+    assert (villes == df["ville"].astype(object).where(df["ville"].notna(), None).to_numpy()).all()
+    lettres = np.array(DPE_LETTRES + [None], dtype=object)
+    for nom in ("dpe", "ges"):
+        if nom in df:
+            assert (lettres[colonnes[nom]] == df[nom].astype(object).where(df[nom].notna(), None).to_numpy()).all(), nom
+    for bit, (libelle, col) in enumerate(OPTION_COLUMNS.items()):
+        if col in dataset.options:
+            assert (((colonnes["options"] >> bit) & 1).astype(bool) == source[col].to_numpy()).all(), libelle
+
+
+def plotly_bytes(dataset: Dataset) -> int:
+    """Taille des figures histogramme + boxplot renvoyées à chaque rerun de l'onglet Visualisations."""
+    df = dataset.df
+    figures = [px.histogram(df, x="prix", nbins=30), px.box(df, y="prix_m2")]
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taille et fidélité des colonnes du filtrage croisé.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    resultats = []
+    for taille in args.sizes:
+        source = generate_clean(taille, seed=args.seed)
+        dataset = Dataset(source)
+        debut = time.perf_counter()
+        contenu = build_payload(dataset)
+        duree = time.perf_counter() - debut
+        entete, colonnes = decode(contenu)
+        check(dataset, source, entete, colonnes)
+        ligne = {
+            "annonces": taille,
+            "fichier_ko": round(len(contenu) / 1e3, 1),
+            "octets_par_annonce": round(len(contenu) / taille, 2),
+            "construction_s": round(duree, 3),
+            "plotly_par_rerun_ko": round(plotly_bytes(dataset) / 1e3, 1),
+        }
+        resultats.append(ligne)
+        print(f"  {taille:>10,} annonces  fichier {ligne['fichier_ko']:>9,.1f} ko "
+              f"({ligne['octets_par_annonce']} o/annonce, {duree:.2f} s)  "
+              f"Plotly par rerun {ligne['plotly_par_rerun_ko']:>9,.1f} ko")
+    print("✅ Colonnes décodées et vérifiées")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
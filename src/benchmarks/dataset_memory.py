@@ -0,0 +1,102 @@
+import argparse
+import json
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean  # noqa: E402
+from dataset import OPTION_COLUMNS, Dataset, expand  # noqa: E402
+from query import compute  # noqa: E402
+
+
+# =========================
+# Mémoire du jeu de données chargé par le tableau de bord
+# =========================
+# Pour des jeux synthétiques de tailles croissantes, compare le CSV lu tel
+# quel (toutes les colonnes, texte en object, nombres en float64) à la forme
+# compacte de Dataset.from_csv (colonnes de DASHBOARD_SCHEMA, float32,
+# catégories, options en masque de bits) :
+# - octets par annonce, au total et par colonne ;
+# - temps de chargement et de query.compute() sans filtre ;
+# - mêmes lignes retenues pour des filtres aléatoires, et lignes rendues par
+#   expand() identiques au CSV.
+# Le générateur produit une image principale de quelques centaines d'octets :
+# sur les vraies annonces (data URI base64), l'écart est bien plus grand.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.dataset_memory --sizes 10000 100000 1000000
+
+
+def check(dataset: Dataset, brut: pd.DataFrame, seed: int):
+    rng = np.random.default_rng(seed)
+    libelles = list(OPTION_COLUMNS)
+    for _ in range(20):
+        villes = list(rng.choice(dataset.villes, size=3, replace=False))
+        options = list(rng.choice(libelles, size=rng.integers(0, 3), replace=False))
+        prix = tuple(sorted(rng.uniform(*dataset.prix_bounds, size=2).round()))
+        attendu = brut["ville"].isin(villes) & brut["prix"].between(*prix)
+        for libelle in options:
+            attendu &= brut[OPTION_COLUMNS[libelle]] == True  # noqa: E712
+        rows = dataset.select(villes=villes, options=options, prix=prix)
+        assert (rows == np.flatnonzero(attendu)).all(), (villes, options, prix)
+    lignes = rng.choice(len(dataset), size=min(len(dataset), 1000), replace=False)
+    attendu = brut.iloc[lignes][dataset.columns].reset_index(drop=True)
+    # Lu comme texte, le code postal garde son zéro initial (06000), que la lecture en nombre perdait
+    attendu["code_postal"] = attendu["code_postal"].astype(str).str.zfill(5)
+    pd.testing.assert_frame_equal(expand(dataset.df.iloc[lignes]).reset_index(drop=True), attendu, check_dtype=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire du jeu de données chargé par le tableau de bord.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    resultats = []
+    for taille in args.sizes:
+        contenu = generate_clean(taille, seed=args.seed).to_csv(index=False).encode("utf-8")
+        debut = time.perf_counter()
+        brut = pd.read_csv(BytesIO(contenu))
+        lecture = time.perf_counter() - debut
+        debut = time.perf_counter()
+        dataset = Dataset.from_csv(contenu)
+        chargement = time.perf_counter() - debut
+        debut = time.perf_counter()
+        compute(dataset, {})
+        requete = time.perf_counter() - debut
+        check(dataset, brut, args.seed)
+
+        avant, apres = brut.memory_usage(deep=True), dataset.df.memory_usage(deep=True)
+        ligne = {
+            "annonces": taille,
+            "octets_par_annonce_avant": round(avant.sum() / taille, 1),
+            "octets_par_annonce_apres": round(dataset.memory_bytes / taille, 1),
+            "lecture_csv_s": round(lecture, 3),
+            "chargement_compact_s": round(chargement, 3),
+            "compute_s": round(requete, 3),
+            "colonnes_avant": (avant / taille).round(1).drop("Index").to_dict(),
+            "colonnes_apres": (apres / taille).round(1).drop("Index").to_dict(),
+        }
+        resultats.append(ligne)
+        print(f"  {taille:>10,} annonces  {ligne['octets_par_annonce_avant']:>7,.1f} → "
+              f"{ligne['octets_par_annonce_apres']:>7,.1f} octets/annonce  "
+              f"(lecture {lecture:.2f} s → {chargement:.2f} s, compute {requete:.3f} s)")
+    print("  octets par annonce et par colonne (avant → après) :")
+    for col, valeur in resultats[-1]["colonnes_avant"].items():
+        print(f"    {col:<18} {valeur:>7,.1f} → {resultats[-1]['colonnes_apres'].get(col, 0):>7,.1f}")
+    print(f"    {'options':<18} {'':>7} → {resultats[-1]['colonnes_apres']['options']:>7,.1f}")
+    print("✅ Mêmes lignes retenues et lignes rendues identiques au CSV")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean, repost  # noqa: E402
+from dedup import evaluate, find_duplicates, pair_scores  # noqa: E402
+
+
+# =========================
+# Qualité et débit de la détection des quasi-doublons
+# =========================
+# 1. Annonces réelles : échantillon étiqueté livré avec le dépôt
+#    (data/doublons_etiquetes.csv.gz), les annonces de annonces_propres.csv
+#    telles quelles. Toutes les paires candidates réelles (même ville et même
+#    type, surface à 5 % et prix à 15 % près) ont été vérifiées à la main :
+#    DOUBLONS_REELS sont le même bien, DISTINCTS_REELS des biens distincts
+#    pourtant voisins (même quartier, même lotissement) : les cas difficiles.
+#    Le score porte sur toutes les paires de l'échantillon, et chaque paire
+#    vérifiée est rapportée avec son verdict.
+# 2. Republications synthétiques, rapportées à part : 20 % des annonces
+#    réelles republiées par generator.repost (titre retouché, une partie des
+#    photos, prix renégocié). Ces retouches sont celles que l'heuristique sait
+#    reconnaître : ce score mesure le générateur autant que la détection.
+# 3. Débit de find_duplicates et précision/rappel sur des jeux synthétiques
+#    jusqu'à 1 million d'annonces, dont 10 % republiées.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.dedup_quality --sizes 100000 1000000
+#   python -m benchmarks.dedup_quality --build-sample ../annonces_propres.csv   (régénère l'échantillon)
+SAMPLE_PATH = SRC_DIR / "data" / "doublons_etiquetes.csv.gz"
+SAMPLE_COLUMNS = ["lien", "groupe", "titre", "type", "ville", "surface", "prix", "agence", "images_page"]
+DOUBLONS_REELS = [  # identifiants des annonces (lien) vérifiées à la main comme un même bien
+    ("22997580", "23045016"),  # même agence, titre, prix, surfaces, pièces et DPE ; photos remises en ligne
+    ("23456152", "23456762"),  # même terrain de 700 m² à Corbeil-Essonnes proposé par deux constructeurs
+]
+DISTINCTS_REELS = [  # paires candidates vérifiées à la main comme deux biens distincts
+    ("23459121", "23458664"),  # Saint-Étienne, T3 de 77 et 75 m² : codes postaux 42000 et 42100
+    ("23458664", "23455903"),  # Saint-Étienne, T3 de 75 et 73 m² : codes postaux et DPE différents
+    ("23456042", "23456039"),  # deux lots de 513 m² du même lotissement, même constructeur, prix différents
+    ("23456799", "18896215"),  # villas à Saint-Quentin-la-Poterie : 5 et 6 pièces, terrains de 2 275 et 1 500 m²
+    ("20476982", "21413861"),  # villas vue mer (06530) : 220 et 214 m², terrains de 3 000 et 3 440 m²
+]
+
+
+def build_sample(source: str) -> pd.DataFrame:
+    """Échantillon étiqueté (lien, groupe, colonnes utiles à find_duplicates) des annonces réelles."""
+    df = pd.read_csv(source).reset_index(drop=True)
+    ids = df["lien"].str.extract(r"immobilier-(\d+)", expand=False)
+    groupes = np.arange(len(df))
+    for a, b in DOUBLONS_REELS:
+        groupes[ids == b] = groupes[ids == a][0]
+    df["groupe"] = groupes
+    return df[SAMPLE_COLUMNS]
+
+
+def labelled_pairs(echantillon: pd.DataFrame, predits: np.ndarray) -> list:
+    """Verdict de la détection sur chaque paire vérifiée à la main."""
+    position = {i: k for k, i in enumerate(echantillon["lien"].str.extract(r"immobilier-(\d+)", expand=False))}
+    verdicts = []
+    for attendu, paires in (("doublon", DOUBLONS_REELS), ("distinct", DISTINCTS_REELS)):
+        for a, b in paires:
+            regroupees = bool(predits[position[a]] == predits[position[b]])
+            verdicts.append({"paire": f"{a}/{b}", "attendu": attendu, "correct": regroupees == (attendu == "doublon")})
+    return verdicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qualité et débit de la détection des quasi-doublons.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--build-sample", metavar="CSV", help="reconstruire l'échantillon étiqueté depuis ce CSV nettoyé")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    if args.build_sample:
+        echantillon = build_sample(args.build_sample)
+        SAMPLE_PATH.parent.mkdir(exist_ok=True)
+        echantillon.to_csv(SAMPLE_PATH, index=False, encoding="utf-8")
+        print(f"✅ {len(echantillon)} annonces étiquetées écrites dans {SAMPLE_PATH}")
+
+    # 1️⃣ Annonces réelles
+    echantillon = pd.read_csv(SAMPLE_PATH, dtype={"lien": str})
+    scores = evaluate(echantillon, echantillon[["lien", "groupe"]])
+    verdicts = labelled_pairs(echantillon, find_duplicates(echantillon))
+    resultats = {"reel": {"annonces": len(echantillon), **scores, "paires_verifiees": verdicts}}
+    print(f"  annonces réelles ({len(echantillon)})  précision {scores['precision']:.3f}  rappel {scores['recall']:.3f}  "
+          f"({scores['paires_predites']} paires prédites, {scores['paires_attendues']} attendues)")
+    for v in verdicts:
+        print(f"    {'✅' if v['correct'] else '❌'} {v['paire']:<20} {v['attendu']}")
+
+    # 2️⃣ Republications synthétiques des annonces réelles
+    republiees, groupes = repost(echantillon, np.random.default_rng(args.seed), proportion=0.2)
+    scores = pair_scores(find_duplicates(republiees), echantillon["groupe"].to_numpy()[groupes])
+    resultats["republications"] = {"annonces": len(republiees), **scores}
+    print(f"  republications synthétiques ({len(republiees)} annonces)  précision {scores['precision']:.3f}  "
+          f"rappel {scores['recall']:.3f}")
+
+    # 3️⃣ Débit sur des jeux synthétiques
+    resultats["synthetique"] = []
+    for taille in args.sizes:
+        # taille annonces au total, dont environ 10 % de republications
+        df, groupes = repost(generate_clean(round(taille / 1.1), seed=args.seed), np.random.default_rng(args.seed))
+        debut = time.perf_counter()
+        predits = find_duplicates(df)
+        duree = time.perf_counter() - debut
+        scores = pair_scores(predits, groupes)
+        ligne = {"annonces": len(df), "duree_s": round(duree, 2), "annonces_par_s": round(len(df) / duree), **scores}
+        resultats["synthetique"].append(ligne)
+        print(f"  {len(df):>10,} annonces  {duree:7.1f} s  ({ligne['annonces_par_s']:,} annonces/s)  "
+              f"précision {scores['precision']:.3f}  rappel {scores['recall']:.3f}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
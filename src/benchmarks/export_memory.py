@@ -0,0 +1,115 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean  # noqa: E402
+from export import EXPORT_FORMATS, iter_export  # noqa: E402
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+# =========================
+# Mémoire de l'export en flux
+# =========================
+# Exporte des sélections de tailles croissantes d'un jeu synthétique dans
+# chaque format et relève le pic de mémoire allouée pendant l'export
+# (tracemalloc, plus le pool de pyarrow pour le Parquet), le fichier étant
+# écrit au fil de l'eau dans /dev/null. Référence : la méthode naïve
+# df.iloc[rows][colonnes].to_csv(), qui copie la sélection puis tout le texte.
+# Le pic de l'export en flux doit rester à peu près constant quand la
+# sélection grandit ; le contenu des fichiers est relu et vérifié.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.export_memory -n 500000 --selections 10000 100000 500000
+COLUMNS = ["titre", "type", "ville", "code_postal", "prix", "surface", "prix_m2", "dpe", "parking", "jardin", "agence"]
+
+
+def measure(fonction) -> tuple:
+    """(pic de mémoire allouée en Mo, durée en s) pendant l'appel."""
+    if pa is not None:
+        pool = pa.default_memory_pool()
+        pool.release_unused()
+        arrow_avant = pool.max_memory()
+    tracemalloc.start()
+    debut = time.perf_counter()
+    fonction()
+    duree = time.perf_counter() - debut
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if pa is not None:
+        pic += max(0, pool.max_memory() - arrow_avant)
+    return round(pic / 1e6, 1), round(duree, 2)
+
+
+def stream_to(destination, df, rows, fmt):
+    for morceau in iter_export(df, rows, COLUMNS, fmt):
+        destination.write(morceau)
+
+
+def check(df, rows, fmt):
+    """Relit l'export d'une petite sélection et le compare aux données sources."""
+    sortie = io.BytesIO()
+    stream_to(sortie, df, rows, fmt)
+    attendu = df.iloc[rows][COLUMNS].reset_index(drop=True)
+    if fmt == "csv":
+        relu = pd.read_csv(io.BytesIO(sortie.getvalue()), dtype={"code_postal": str})
+    elif fmt == "parquet":
+        relu = pq.read_table(io.BytesIO(sortie.getvalue())).to_pandas()
+    else:
+        try:
+            relu = pd.read_excel(io.BytesIO(sortie.getvalue()), dtype={"code_postal": str})
+        except ImportError:  # openpyxl absent : lecture non vérifiée
+            return
+    pd.testing.assert_frame_equal(relu.fillna(np.nan), attendu.fillna(np.nan), check_dtype=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic mémoire de l'export en flux selon la taille de la sélection.")
+    parser.add_argument("-n", type=int, default=500_000, help="nombre d'annonces synthétiques")
+    parser.add_argument("--selections", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--formats", nargs="+", choices=list(EXPORT_FORMATS), default=list(EXPORT_FORMATS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    print(f"📦 Génération de {args.n:,} annonces...")
+    df = generate_clean(args.n, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    formats = [f for f in args.formats if f != "parquet" or pq is not None]
+    for fmt in formats:
+        check(df, np.sort(rng.choice(len(df), 500, replace=False)), fmt)
+
+    resultats = []
+    with open(os.devnull, "wb") as nul:
+        for taille in args.selections:
+            rows = np.sort(rng.choice(len(df), min(taille, len(df)), replace=False))
+            ligne = {"selection": len(rows)}
+            ligne["naif_csv"] = measure(lambda: df.iloc[rows][COLUMNS].to_csv(index=False).encode("utf-8"))
+            for fmt in formats:
+                ligne[fmt] = measure(lambda: stream_to(nul, df, rows, fmt))
+            resultats.append(ligne)
+            print(f"  {len(rows):>10,} annonces  " + "  ".join(
+                f"{nom}: {pic:>7.1f} Mo {duree:>5.2f} s" for nom, (pic, duree) in list(ligne.items())[1:]
+            ))
+    print("✅ Exports relus et vérifiés")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"n": args.n, "resultats": resultats}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean, generate_communes, generate_gazetteer, nb_communes, vary_names  # noqa: E402
+from gazetteer import Gazetteer, geocode  # noqa: E402
+from search import fold  # noqa: E402
+
+
+# =========================
+# Débit de la jointure au référentiel des communes
+# =========================
+# Génère des annonces synthétiques et le référentiel couvrant leurs communes,
+# puis dégrade une partie des données comme sur le site : graphies
+# concurrentes des villes (casse, accents, « St- »), codes postaux CEDEX.
+# Compare le débit (lignes/s) de gazetteer.geocode (couples distincts cherchés
+# dans des index de hachage) à une recherche ligne par ligne dans un
+# dictionnaire, et vérifie que chaque annonce retrouve sa commune d'origine.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.gazetteer_join --sizes 10000 100000 1000000
+NAIVE_MAX = 1_000_000  # au-delà, la recherche ligne par ligne est trop lente pour être mesurée
+
+
+def degrade(df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    df = df.copy()
+    df["ville"] = vary_names(df["ville"], rng)
+    cedex = rng.random(len(df)) < 0.02  # code postal propre à une entreprise : même département
+    df.loc[cedex, "code_postal"] = df.loc[cedex, "code_postal"].str[:2] + "999"
+    return df
+
+
+def naive(df: pd.DataFrame, table: pd.DataFrame) -> list:
+    """Référence : normalisation et recherche ligne par ligne."""
+    par_code_nom = {(cp, fold(nom)): i for i, (cp, nom) in enumerate(zip(table["code_postal"], table["nom"]))}
+    return [par_code_nom.get((cp, fold(ville)), -1) for ville, cp in zip(df["ville"], df["code_postal"])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de la jointure au référentiel des communes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    resultats = []
+    for taille in args.sizes:
+        communes = generate_communes(nb_communes(taille), np.random.default_rng(args.seed))
+        propre = generate_clean(taille, seed=args.seed, communes=communes)
+        table = generate_gazetteer(communes, seed=args.seed)
+        brut = degrade(propre, np.random.default_rng(args.seed))
+
+        debut = time.perf_counter()
+        gazetteer = Gazetteer(table)
+        index_s = time.perf_counter() - debut
+        debut = time.perf_counter()
+        geo = geocode(brut, gazetteer)
+        duree = time.perf_counter() - debut
+
+        # Chaque annonce retrouve sa commune d'origine, sous son nom d'origine
+        attendu = propre["ville"].map(dict(zip(table["nom"], table["code_insee"])))
+        assert (geo["ville"] == propre["ville"]).mean() > 0.99
+        assert (geo["code_insee"] == attendu).mean() > 0.99
+        assert geo["latitude"].notna().mean() > 0.99
+
+        ligne = {
+            "annonces": taille,
+            "couples_distincts": int((brut["ville"] + "|" + brut["code_postal"]).nunique()),
+            "index_s": round(index_s, 3),
+            "jointure_s": round(duree, 3),
+            "lignes_par_s": round(taille / duree),
+            "rattachees": round(float(geo["code_insee"].notna().mean()), 4),
+        }
+        if taille <= NAIVE_MAX:
+            debut = time.perf_counter()
+            naive(brut, table)
+            ligne["ligne_par_ligne_par_s"] = round(taille / (time.perf_counter() - debut))
+        resultats.append(ligne)
+        print(f"  {taille:>10,} annonces  {ligne['lignes_par_s']:>10,} lignes/s"
+              + (f"  (ligne par ligne : {ligne['ligne_par_ligne_par_s']:>8,} lignes/s)" if "ligne_par_ligne_par_s" in ligne else "")
+              + f"  rattachées {ligne['rattachees']:.2%}")
+    print("✅ Communes retrouvées et vérifiées")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import ast
+import numpy as np
+import pandas as pd
+import unicodedata
+import uuid
+
+
+# =========================
+# Générateur d'annonces synthétiques
+# =========================
+# Les distributions (types, prix, surfaces, DPE, options) reprennent celles
+# observées dans annonces_propres.csv ; les sorties suivent exactement son
+# schéma (CSV nettoyé) ou celui des items Scrapy (JSON brut).
+VILLES = [
+    ("Paris", "75011"), ("Marseille", "13008"), ("Lyon", "69003"), ("Toulouse", "31000"),
+    ("Nice", "06000"), ("Nantes", "44000"), ("Montpellier", "34000"), ("Strasbourg", "67000"),
+    ("Bordeaux", "33000"), ("Lille", "59000"), ("Rennes", "35000"), ("Reims", "51100"),
+    ("Saint-Étienne", "42000"), ("Toulon", "83000"), ("Le Havre", "76600"), ("Grenoble", "38000"),
+    ("Dijon", "21000"), ("Angers", "49000"), ("Nîmes", "30000"), ("Clermont-Ferrand", "63000"),
+    ("Aix-en-Provence", "13090"), ("Brest", "29200"), ("Tours", "37000"), ("Amiens", "80000"),
+    ("Limoges", "87000"), ("Annecy", "74000"), ("Perpignan", "66000"), ("Metz", "57000"),
+    ("Besançon", "25000"), ("Orléans", "45000"), ("Ajaccio", "20000"), ("Bastia", "20200"),
+    ("Saint-Denis", "97400"), ("Moissy-Cramayel", "77550"), ("Corbeil-Essonnes", "91100"),
+    ("Brignoles", "83170"), ("Draveil", "91210"), ("Menton", "06500"), ("Sens", "89100"),
+    ("Bonchamp-lès-Laval", "53960"),
+]
+RACINES = ["Mont", "Beau", "Ville", "Font", "Roche", "Val", "Bois", "Champ", "Pont", "Mar", "Bel", "Châtel"]
+SUFFIXES = ["", "-sur-Loire", "-sur-Mer", "-lès-Bains", "-le-Château", "-en-Forêt", "-la-Rivière", "-Saint-Jean"]
+
+TYPES = ["Maison", "Appartement", "Terrain", "Commerce", "Parking", "Autre"]
+TYPES_POIDS = [0.49, 0.365, 0.107, 0.024, 0.01, 0.004]
+TYPES_PLURIEL = {"Maison": "Maisons", "Appartement": "Appartements", "Terrain": "Terrains",
+                 "Commerce": "Commerces", "Parking": "Parkings", "Autre": "Autres"}
+SURFACE_MEDIANE = {"Maison": 120, "Appartement": 65, "Terrain": 800, "Commerce": 150, "Parking": 15, "Autre": 100}
+PRIX_M2_MEDIAN = {"Maison": 2500, "Appartement": 3800, "Terrain": 150, "Commerce": 2000, "Parking": 1500, "Autre": 2000}
+
+LETTRES = np.array(["A", "B", "C", "D", "E", "F", "G", None], dtype=object)
+DPE_POIDS = [0.064, 0.038, 0.188, 0.262, 0.122, 0.071, 0.034, 0.221]
+OPTIONS = {  # colonne → (probabilité, texte alt de l'icône sur la page annonce)
+    "parking": (0.43, "parking"),
+    "jardin": (0.46, "jardin"),
+    "balcon_terrasse": (0.35, "balcon"),
+    "piscine": (0.08, "piscine"),
+    "ascenseur": (0.15, "ascenseur"),
+    "acces_handicape": (0.03, "accès handicapé"),
+}
+NOMS_AGENCES = ["Immobilier", "Transactions", "Habitat", "Conseil", "Patrimoine", "Immo"]
+IMAGE_PRINCIPALE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+BASE_URL = "https://www.etreproprio.com"
+COLONNES_CSV = [
+    "titre", "type", "lien", "prix", "surface", "surface_terrain", "pieces", "dpe", "ges", "image_principale",
+    "images_page", "parking", "jardin", "balcon_terrasse", "piscine", "ascenseur", "acces_handicape", "agence",
+    "ville", "code_postal", "prix_m2",
+]
+
+
+def slugify(texte: str) -> str:
+    """Nom de ville → fragment d'URL ("Saint-Étienne" → "saint-etienne")."""
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return "-".join("".join(c if c.isalnum() else " " for c in texte).split())
+
+
+def generate_communes(n: int, rng: np.random.Generator) -> list:
+    """Liste de n communes (nom, code postal) : villes réelles puis communes synthétiques."""
+    communes = list(VILLES[:n])
+    deja_vus = {nom for nom, _ in communes}
+    while len(communes) < n:
+        nom = f"{rng.choice(RACINES)}{rng.choice(RACINES).lower()}{rng.choice(SUFFIXES)}"
+        if nom in deja_vus:
+            nom = f"{nom}-{len(communes)}"
+        deja_vus.add(nom)
+        departement = int(rng.integers(1, 96))
+        communes.append((nom, f"{departement:02d}{int(rng.integers(0, 1000)):03d}"))
+    return communes
+
+
+def nb_communes(n: int) -> int:
+    """Nombre de communes distinctes pour n annonces (≈ 20 annonces par commune, 36 000 au plus)."""
+    return int(min(36_000, max(len(VILLES), n // 20)))
+
+
+def generate_clean(n: int, seed: int = 0, start_id: int = 20_000_000, communes: list = None) -> pd.DataFrame:
+    """
+    Génère n annonces au format de annonces_propres.csv.
+
+    Paramètres:
+    - n : nombre d'annonces.
+    - seed : graine du générateur (résultats reproductibles).
+    - start_id : premier identifiant d'annonce (dans le lien).
+    - communes : liste (nom, code postal) imposée (générée à partir de n sinon).
+    """
+    rng = np.random.default_rng(seed)
+    if communes is None:
+        communes = generate_communes(nb_communes(n), rng)
+    # Loi de Zipf : quelques grandes villes concentrent beaucoup d'annonces
+    poids = 1 / np.arange(1, len(communes) + 1)
+    idx_commune = rng.choice(len(communes), size=n, p=poids / poids.sum())
+    villes = np.array([c[0] for c in communes], dtype=object)[idx_commune]
+    codes = np.array([c[1] for c in communes], dtype=object)[idx_commune]
+
+    types = rng.choice(np.array(TYPES, dtype=object), size=n, p=TYPES_POIDS)
+    surface_mediane = pd.Series(types).map(SURFACE_MEDIANE).to_numpy(dtype=float)
+    prix_m2_median = pd.Series(types).map(PRIX_M2_MEDIAN).to_numpy(dtype=float)
+    surface = np.maximum(7, np.round(surface_mediane * rng.lognormal(0, 0.45, n)))
+    prix = np.maximum(5_000, np.round(surface * prix_m2_median * rng.lognormal(0, 0.5, n), -2))
+    pieces = np.where(np.isin(types, ["Terrain", "Parking"]), np.nan, np.clip(np.round(surface / 25 + rng.normal(1, 1, n)), 1, 17))
+    surface_terrain = np.where(
+        np.isin(types, ["Maison", "Terrain"]) & (rng.random(n) < 0.8), np.round(rng.lognormal(6.4, 0.9, n)), np.nan
+    )
+
+    ids = np.arange(start_id, start_id + n)
+    villes_slug = pd.Series(villes).map(slugify)
+    types_lower = pd.Series(types).str.lower()
+    titres = np.where(
+        rng.random(n) < 0.7,
+        types + " " + surface.astype(int).astype(str) + "m² à " + villes_slug,
+        types + " de " + np.nan_to_num(pieces, nan=1).astype(int).astype(str) + " pièces de "
+        + surface.astype(int).astype(str) + "m² en vente à " + villes_slug,
+    )
+    liens = (BASE_URL + "/immobilier-" + pd.Series(ids).astype(str) + "-vente-" + types_lower
+             + "-" + surface.astype(int).astype(str) + "m-a-" + villes_slug + "-" + villes_slug).to_numpy()
+
+    nb_images = rng.integers(0, 15, n)
+    images_page = [
+        str([f"https://storage.etreproprio.com/classified/image/thumb/{u.hex[0]}/{u.hex[1]}/{u.hex[2]}/{u}_ptw0.jpeg"
+             for u in (uuid.UUID(int=int(x)) for x in rng.integers(0, 2**63, k))])
+        for k in nb_images
+    ]
+
+    nb_agences = max(20, n // 50)
+    agences = np.array(
+        [f"{RACINES[i % len(RACINES)]}{NOMS_AGENCES[i % len(NOMS_AGENCES)].lower()} {NOMS_AGENCES[(i // 7) % len(NOMS_AGENCES)]} {i}"
+         for i in range(nb_agences)], dtype=object
+    )[rng.integers(0, nb_agences, n)]
+
+    df = pd.DataFrame({
+        "titre": titres,
+        "type": types,
+        "lien": liens,
+        "prix": prix,
+        "surface": surface,
+        "surface_terrain": surface_terrain,
+        "pieces": pieces,
+        "dpe": rng.choice(LETTRES, size=n, p=DPE_POIDS),
+        "ges": rng.choice(LETTRES, size=n, p=DPE_POIDS),
+        "image_principale": IMAGE_PRINCIPALE,
+        "images_page": images_page,
+        **{col: rng.random(n) < proba for col, (proba, _) in OPTIONS.items()},
+        "agence": agences,
+        "ville": villes,
+        "code_postal": codes,
+        "prix_m2": np.round(prix / surface, 2),
+    })
+    return df[COLONNES_CSV]
+
+
+def write_clean_csv(path: str, n: int, seed: int = 0, chunk_size: int = 500_000):
+    """Écrit n annonces synthétiques par blocs (mémoire bornée, jusqu'à 10M lignes)."""
+    communes = generate_communes(nb_communes(n), np.random.default_rng(seed))
+    for i, debut in enumerate(range(0, n, chunk_size)):
+        bloc = generate_clean(min(chunk_size, n - debut), seed=seed + i, start_id=20_000_000 + debut, communes=communes)
+        bloc.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False, encoding="utf-8")
+
+
+def generate_gazetteer(communes: list, seed: int = 0) -> pd.DataFrame:
+    """Référentiel des communes (schéma de gazetteer.GAZETTEER_COLUMNS) couvrant les communes générées."""
+    rng = np.random.default_rng(seed)
+    codes = pd.Series([code for _, code in communes], dtype=str)
+    departements = codes.str[:2].mask(codes.str[:2] == "20", "2A")
+    return pd.DataFrame({
+        "code_postal": codes,
+        "code_insee": [f"{i:05d}" for i in range(len(communes))],
+        "nom": [nom for nom, _ in communes],
+        "latitude": np.round(rng.uniform(42.3, 51.1, len(communes)), 5),
+        "longitude": np.round(rng.uniform(-4.8, 8.2, len(communes)), 5),
+        "departement": departements,
+        "region": "Région " + departements,
+    })
+
+
+def vary_names(villes: pd.Series, rng: np.random.Generator, proportion: float = 0.3) -> pd.Series:
+    """Graphies concurrentes d'une partie des villes (casse, accents, « Saint » abrégé), comme sur le site."""
+    variantes = [
+        lambda s: s.str.lower(),
+        lambda s: s.str.upper(),
+        lambda s: s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii"),
+        lambda s: s.str.replace("Saint-", "St-", regex=False).str.replace("-", " ", regex=False),
+    ]
+    villes = villes.astype(str).copy()
+    tirage = rng.integers(0, len(variantes), len(villes))
+    modifiees = rng.random(len(villes)) < proportion
+    for i, variante in enumerate(variantes):
+        lignes = modifiees & (tirage == i)
+        villes[lignes] = variante(villes[lignes])
+    return villes
+
+
+def repost(df: pd.DataFrame, rng: np.random.Generator, proportion: float = 0.1) -> tuple:
+    """
+    Republie une partie des annonces chez une autre agence, comme sur le site :
+    titre retouché, une partie des photos (autre taille de miniature), prix
+    renégocié de quelques pourcents, surface arrondie autrement.
+
+    Paramètres:
+    - df : annonces au format de annonces_propres.csv.
+    - rng : générateur aléatoire.
+    - proportion : part des annonces republiées.
+
+    Retourne:
+    - (annonces originales suivies des republications, groupe de chaque ligne) ;
+      le groupe est la position de l'annonce d'origine.
+    """
+    df = df.reset_index(drop=True)
+    sources = np.flatnonzero(rng.random(len(df)) < proportion)
+    copies = df.iloc[sources].copy()
+    retouches = [
+        lambda t: t + " - exclusivité",
+        lambda t: "À vendre : " + t.lower(),
+        lambda t: t.replace("m²", " m2").replace("à ", "sur "),
+        lambda t: " ".join(t.split()[:-1]) if len(t.split()) > 3 else t.upper(),
+    ]
+    tirage = rng.integers(0, len(retouches), len(copies))
+    copies["titre"] = [retouches[k](str(t)) for k, t in zip(tirage, copies["titre"])]
+
+    def photos(images):
+        urls = ast.literal_eval(images) if isinstance(images, str) else []
+        gardees = [u.replace("_ptw0.", "_ptw1.") for u in urls if rng.random() < 0.8]
+        return str(gardees)
+
+    copies["images_page"] = copies["images_page"].map(photos)
+    copies["prix"] = np.round(copies["prix"] * rng.uniform(0.93, 1.05, len(copies)), -2)
+    copies["surface"] = np.round(copies["surface"] * rng.uniform(0.98, 1.02, len(copies)))
+    copies["prix_m2"] = np.round(copies["prix"] / copies["surface"], 2)
+    copies["agence"] = df["agence"].to_numpy()[rng.integers(0, len(df), len(copies))]
+    copies["lien"] = copies["lien"].str.replace(r"immobilier-(\d+)", lambda m: f"immobilier-9{m.group(1)}", regex=True)
+    groupes = np.concatenate((np.arange(len(df)), sources))
+    return pd.concat([df, copies], ignore_index=True), groupes
+
+
+def to_raw_items(df: pd.DataFrame) -> list:
+    """Convertit des annonces nettoyées en items bruts du spider (chaînes localisées françaises)."""
+    def montant(x, unite):
+        return f"{int(x):,}".replace(",", " ") + f" {unite}"
+
+    items = []
+    for ligne in df.itertuples(index=False):
+        items.append({
+            "titre": f"  {ligne.titre}  ",
+            "type": f"{TYPES_PLURIEL[ligne.type]} à vendre",
+            "lien": ligne.lien,
+            "prix": montant(ligne.prix, "€"),
+            "surface": montant(ligne.surface, "m²"),
+            "surface_terrain": None if pd.isna(ligne.surface_terrain) else montant(ligne.surface_terrain, "m²"),
+            "pieces": None if pd.isna(ligne.pieces) else f"{int(ligne.pieces)} pièces",
+            "dpe": ligne.dpe,
+            "ges": ligne.ges,
+            "localisation": f"\n            — {ligne.ville} {ligne.code_postal} —\n        ",
+            "image_principale": ligne.image_principale,
+            "images_page": ast.literal_eval(ligne.images_page),
+            **{col: (alt if getattr(ligne, col) else None) for col, (_, alt) in OPTIONS.items()},
+            "agence": ligne.agence,
+        })
+    return items
+
+
+# =========================
+# Site HTML synthétique (mêmes sélecteurs que le spider)
+# =========================
+def render_annonce(item: dict) -> str:
+    """Page détail d'une annonce (callback parse_annonce)."""
+    photos = "".join(f'<img src="{src}">' for src in item["images_page"])
+    options = "".join(f'<img alt="{alt}" src="/icons/{col}.svg">' for col, (_, alt) in OPTIONS.items() if item[col])
+    dpe = "".join(
+        f'<div class="dpe-letter{" selected" if lettre == item["dpe"] else ""}">{lettre}</div>' for lettre in "ABCDEFG"
+    )
+    ges = "".join(
+        f'<div class="ges-letter{" selected" if lettre == item["ges"] else ""}">{lettre}</div>' for lettre in "ABCDEFG"
+    )
+    terrain = f'<span class="dtl-main-surface-terrain">{item["surface_terrain"]}</span>' if item["surface_terrain"] else ""
+    pieces = f'<div class="ep-room">{item["pieces"]}</div>' if item["pieces"] else ""
+    return f"""<html><head><meta charset="utf-8"><title>{item["titre"]}</title></head><body>
+<div class="ep-breadcrumb-cla-dir"><ol>
+<li><span itemprop="name">Accueil</span></li>
+<li><span itemprop="name">{item["type"]}</span></li>
+</ol></div>
+<h1 class="annonce-immobilier">{item["titre"]}</h1>
+<div class="ep-price">{item["prix"]}</div><div class="ep-area">{item["surface"]}</div>{pieces}{terrain}
+<div class="ep-loc">{item["localisation"]}</div>
+<div class="ep-tiles-photos">{photos}</div>
+<div class="ep-features">{options}</div>
+<div class="dpe-container">{dpe}</div><div class="ges-container">{ges}</div>
+<div class="ep-name"><a href="/agence">{item["agence"]}</a></div>
+</body></html>"""
+
+
+def _page(classe: str, liens: list, balise: str = "div") -> str:
+    ancres = "".join(f'<a href="{lien}">{lien.rsplit("/", 1)[-1]}</a>' for lien in liens)
+    return (f'<html><head><meta charset="utf-8"></head><body>'
+            f'<{balise} class="{classe}">{ancres}</{balise}></body></html>')
+
+
+def build_site(df: pd.DataFrame, annonces_par_page: int = 20) -> dict:
+    """
+    Construit un site statique imitant etreproprio.com pour les annonces de `df`.
+
+    Retourne:
+    - dict chemin → (callback attendu, HTML) ; les pages d'entrée sont
+      /maison-a-vendre et /appartement-a-vendre, comme les start_urls du spider.
+    """
+    pages = {}
+    items = to_raw_items(df)
+    types_entree = ["maison-a-vendre", "appartement-a-vendre"]
+    arbre = {}  # type → département → ville → [chemins d'annonces]
+    for i, item in enumerate(items):
+        chemin = item["lien"].replace(BASE_URL, "")
+        code_postal = df["code_postal"].iat[i]
+        ville = f"{slugify(df['ville'].iat[i])}-{code_postal}"
+        arbre.setdefault(types_entree[i % 2], {}).setdefault(code_postal[:2], {}).setdefault(ville, []).append(chemin)
+        pages[chemin] = ("parse_annonce", render_annonce(item))
+
+    for type_entree, departements in arbre.items():
+        pages[f"/{type_entree}"] = (
+            "parse", _page("ep-cla-key-sec", [f"/{type_entree}/{d}" for d in sorted(departements)], "section")
+        )
+        for dep, villes in departements.items():
+            pages[f"/{type_entree}/{dep}"] = (
+                "parse_departement", _page("ep-cla-dir-top-cities", [f"/{type_entree}/{dep}/{v}" for v in sorted(villes)])
+            )
+            for ville, annonces in villes.items():
+                listes = [f"/{type_entree}/{dep}/{ville}/p{k + 1}" for k in range(0, len(annonces), annonces_par_page)]
+                pages[f"/{type_entree}/{dep}/{ville}"] = ("parse_ville", _page("ep-cla-key-list", listes))
+                for k, liste in enumerate(listes):
+                    lot = annonces[k * annonces_par_page:(k + 1) * annonces_par_page]
+                    html = _page("ep-search-list-wrapper", lot).replace(
+                        "<body>", f'<body><img src="{IMAGE_PRINCIPALE}">', 1
+                    )
+                    pages[liste] = ("parse_liste_annonces", html)
+    return pages
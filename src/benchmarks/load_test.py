@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import write_clean_csv  # noqa: E402
+
+
+# =========================
+# Test de charge du tableau de bord
+# =========================
+# Lance `streamlit run app.py` sur un CSV synthétique local (DATA_DIR) et simule
+# des sessions concurrentes en parlant directement le protocole du navigateur
+# (WebSocket /_stcore/stream, messages protobuf de Streamlit) : chaque session
+# charge la page puis change plusieurs fois de filtres. Rapporte la latence des
+# reruns (p50/p95) et la mémoire résidente du serveur.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.load_test --sessions 50 -n 20000
+def server_rss_mb(pid: int, champ: str = "VmRSS") -> float:
+    """Mémoire résidente du serveur en Mo (Linux ; VmHWM pour le pic)."""
+    with open(f"/proc/{pid}/status") as f:
+        for ligne in f:
+            if ligne.startswith(champ + ":"):
+                return int(ligne.split()[1]) / 1024
+    return float("nan")
+
+
+def start_server(data_dir: str, port: int) -> subprocess.Popen:
+    serveur = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", str(SRC_DIR / "app.py"),
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.enableXsrfProtection", "false",
+            "--browser.gatherUsageStats", "false",
+        ],
+        env={**os.environ, "DATA_DIR": data_dir},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return serveur
+        except OSError:
+            time.sleep(0.1)
+    serveur.kill()
+    raise RuntimeError("le serveur Streamlit n'a pas démarré")
+
+
+class Session:
+    """Client minimal du protocole Streamlit : une connexion WebSocket = une session."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.multiselects = []  # (id, options) des multiselect de la barre latérale, dans l'ordre
+
+    async def connect(self):
+        from tornado.httpclient import HTTPRequest
+        from tornado.websocket import websocket_connect
+
+        # Serveur saturé pendant le test : pas de délai de connexion court
+        requete = HTTPRequest(self.url, connect_timeout=600, request_timeout=600)
+        self.ws = await websocket_connect(requete, subprotocols=["streamlit"], max_message_size=1 << 30)
+
+    async def rerun(self, valeurs: dict = None) -> float:
+        """
+        Demande un rerun avec les valeurs de widgets données (id → liste d'options).
+
+        Retourne:
+        - durée jusqu'au message script_finished, en secondes
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        for widget_id, options in (valeurs or {}).items():
+            etat = message.rerun_script.widget_states.widgets.add()
+            etat.id = widget_id
+            etat.string_array_value.data.extend(options)
+        debut = time.perf_counter()
+        await self.ws.write_message(message.SerializeToString(), binary=True)
+        multiselects = []
+        while True:
+            brut = await self.ws.read_message()
+            if brut is None:
+                raise RuntimeError("connexion fermée par le serveur")
+            recu = ForwardMsg()
+            recu.ParseFromString(brut)
+            genre = recu.WhichOneof("type")
+            if genre == "delta" and recu.delta.WhichOneof("type") == "new_element":
+                element = recu.delta.new_element
+                if element.WhichOneof("type") == "multiselect" and recu.metadata.delta_path[0] == 1:
+                    multiselects.append((element.multiselect.id, list(element.multiselect.options)))
+            elif genre == "script_finished":
+                self.multiselects = multiselects or self.multiselects
+                return time.perf_counter() - debut
+
+    def close(self):
+        self.ws.close()
+
+
+async def run_session(url: str, reruns: int, rng: random.Random) -> tuple:
+    """Ouvre une session, charge la page puis enchaîne `reruns` changements de filtres."""
+    session = Session(url)
+    await session.connect()
+    latences = [await session.rerun()]
+    (ville_id, villes), (type_id, types) = session.multiselects[:2]
+    for _ in range(reruns):
+        if rng.random() < 0.5:
+            valeurs = {ville_id: rng.sample(villes, k=min(3, len(villes)))}
+        else:
+            valeurs = {type_id: rng.sample(types, k=1)}
+        latences.append(await session.rerun(valeurs))
+    return session, latences
+
+
+async def load_test(url: str, pid: int, nb_sessions: int, reruns: int, seed: int) -> dict:
+    rss_depart = server_rss_mb(pid)
+    # Une première session charge le jeu partagé ; les suivantes ne paient que leur propre état
+    premiere, latences = await run_session(url, reruns, random.Random(seed))
+    rss_une_session = server_rss_mb(pid)
+    debut = time.perf_counter()
+    resultats = await asyncio.gather(
+        *(run_session(url, reruns, random.Random(seed + i)) for i in range(1, nb_sessions))
+    )
+    duree = time.perf_counter() - debut
+    # Mesure avec toutes les sessions encore ouvertes
+    rss_fin = server_rss_mb(pid)
+    concurrentes = [l for _, session in resultats for l in session]
+    for session, _ in [(premiere, None), *resultats]:
+        session.close()
+
+    quantiles = statistics.quantiles(concurrentes, n=100)
+    return {
+        "sessions": nb_sessions,
+        "reruns_mesures": len(concurrentes),
+        "premier_chargement_s": round(latences[0], 2),
+        "duree_s": round(duree, 1),
+        "latence_p50_ms": round(quantiles[49] * 1000, 1),
+        "latence_p95_ms": round(quantiles[94] * 1000, 1),
+        "rss_depart_mo": round(rss_depart, 1),
+        "rss_une_session_mo": round(rss_une_session, 1),
+        "rss_fin_mo": round(rss_fin, 1),
+        "rss_pic_mo": round(server_rss_mb(pid, "VmHWM"), 1),
+        "rss_par_session_mo": round((rss_fin - rss_une_session) / max(1, nb_sessions - 1), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sessions concurrentes du tableau de bord : latence et mémoire.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=3, help="changements de filtres par session")
+    parser.add_argument("-n", type=int, default=20_000, help="nombre d'annonces du CSV synthétique")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_clean_csv(Path(data_dir) / "annonces_propres.csv", args.n, seed=args.seed)
+        serveur = start_server(data_dir, args.port)
+        try:
+            resultats = asyncio.run(load_test(
+                f"ws://127.0.0.1:{args.port}/_stcore/stream", serveur.pid, args.sessions, args.reruns, args.seed
+            ))
+        finally:
+            serveur.terminate()
+            serveur.wait()
+
+    resultats["n"] = args.n
+    for cle, valeur in resultats.items():
+        print(f"  {cle:<22}{valeur}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import build_site, generate_clean  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from runner import CSV_PATH, PipelineRunner  # noqa: E402
+
+
+# =========================
+# Exécution locale du pipeline face à un site synthétique
+# =========================
+# Sert le site HTML synthétique (sélecteurs du spider) sur un port local, lance
+# une exécution de PipelineRunner (scraping → nettoyage → promotion du
+# jeu) et relève sa progression toutes les 0,5 s, comme le tableau de bord.
+# Vérifie ensuite :
+# - que la progression a été suivie pendant le crawl (et pas seulement à la fin) ;
+# - que le jeu n'est installé qu'à la promotion, qu'il correspond alors au
+#   CSV installé, et qu'une référence à l'ancien jeu (rerun en cours) reste
+#   utilisable ;
+# - qu'une exécution en attente peut être annulée ;
+# - qu'un site hors des domaines autorisés est refusé.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.local_pipeline -n 500
+POLL_INTERVAL = 0.5
+
+
+def serve_site(pages: dict) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in pages:
+                self.send_error(404)
+                return
+            corps = pages[self.path][1].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exécution locale du pipeline face à un site synthétique.")
+    parser.add_argument("-n", type=int, default=500, help="nombre d'annonces du site synthétique")
+    parser.add_argument("--python", default=sys.executable, help="interpréteur disposant de Scrapy")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    server = serve_site(build_site(generate_clean(args.n, seed=0)))
+    base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    with tempfile.TemporaryDirectory() as dossier:
+        ancien = Dataset(generate_clean(10, seed=1))
+        runner = PipelineRunner(dossier, python=args.python, allowed_domains=("127.0.0.1",))
+        runner.dataset = ancien
+        try:
+            runner.submit(base_url="https://exemple.org")
+            raise AssertionError("site hors des domaines autorisés accepté")
+        except ValueError:
+            pass
+        job = runner.submit(base_url=base_url, settings={"DOWNLOAD_DELAY": 0, "ROBOTSTXT_OBEY": False})
+        en_attente = runner.submit(base_url=base_url)
+        runner.cancel(en_attente)
+
+        releves = []
+        while runner.busy:
+            time.sleep(POLL_INTERVAL)
+            releves.append((job.status, job.pages, job.items, job.rows))
+        assert job.status == "terminé", (job.status, job.error, list(job.log)[-20:])
+        assert en_attente.status == "annulé" and en_attente.started is None
+
+        # Progression visible pendant le crawl, avant la fin du scraping
+        pendant = [r for r in releves if r[0] == "scraping" and 0 < r[1] < job.pages]
+        assert pendant, releves
+        # Jeu rattaché à l'exécution, installé pour tous seulement à la promotion
+        assert job.dataset is not None and runner.dataset is ancien
+        assert not (Path(dossier) / CSV_PATH).exists()
+        runner.promote(job)
+        # Nouveau jeu : celui du CSV installé ; l'ancien reste intact pour les reruns en cours
+        installe = Dataset.from_csv((Path(dossier) / CSV_PATH).read_bytes())
+        assert runner.dataset is not ancien and runner.dataset.version == installe.version
+        assert len(ancien.select()) == 10 and runner.generation == 1
+        resultats = {
+            "annonces_site": args.n,
+            "pages": job.pages,
+            "annonces_collectees": job.items,
+            "annonces_installees": len(runner.dataset),
+            "pages_par_s": round(job.pages_per_s, 1),
+            "lignes_par_s": job.rows_per_s,
+            "releves_pendant_crawl": len(pendant),
+            "duree_s": round(job.elapsed, 1),
+        }
+    server.shutdown()
+
+    for cle, valeur in resultats.items():
+        print(f"  {cle:<24}{valeur}")
+    print("✅ Vérifications réussies")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
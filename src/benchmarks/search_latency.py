@@ -0,0 +1,110 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from search import SearchIndex, fold  # noqa: E402
+
+
+# =========================
+# Latence de la recherche plein texte
+# =========================
+# Construit l'index sur un jeu synthétique, puis mesure Dataset.select() avec
+# des recherches tirées du vocabulaire (mots entiers, débuts et morceaux de
+# mots, plusieurs mots, noms d'agence), seules ou combinées aux autres filtres.
+# Une recherche naïve (str.contains sur le titre et l'agence) sert de référence.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.search_latency -n 1000000 --queries 200
+def random_queries(index: SearchIndex, agences: list, nb: int, rng: random.Random) -> list:
+    vocab = [str(t) for t in index.vocab if len(t) >= 3 and not t.isdigit()]
+    requetes = []
+    for _ in range(nb):
+        mot = rng.choice(vocab)
+        tirage = rng.random()
+        if tirage < 0.3:
+            requetes.append(mot)
+        elif tirage < 0.5:
+            requetes.append(mot[:rng.randint(2, len(mot))])  # début de mot
+        elif tirage < 0.65:
+            debut = rng.randint(0, len(mot) - 3)
+            requetes.append(mot[debut:debut + 3 + rng.randint(0, 3)])  # morceau de mot
+        elif tirage < 0.85:
+            requetes.append(f"{mot} {rng.choice(vocab)}")
+        else:
+            requetes.append(rng.choice(agences))
+    return requetes
+
+
+def random_filters(dataset: Dataset, rng: random.Random) -> dict:
+    if rng.random() < 0.5:
+        return {}
+    return {"villes": rng.sample(dataset.villes, k=3), "types": [rng.choice(dataset.types)]}
+
+
+def percentiles(durees: list) -> dict:
+    quantiles = statistics.quantiles(durees, n=100)
+    return {"p50_ms": round(quantiles[49] * 1000, 2), "p95_ms": round(quantiles[94] * 1000, 2), "max_ms": round(max(durees) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence de la recherche plein texte (index inversé vs str.contains).")
+    parser.add_argument("-n", type=int, default=1_000_000, help="nombre d'annonces synthétiques")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--naive", type=int, default=20, help="nombre de recherches naïves de référence (0 pour ignorer)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    print(f"📦 Génération de {args.n:,} annonces...")
+    df = generate_clean(args.n, seed=args.seed)
+    debut = time.perf_counter()
+    index = SearchIndex.build(df, version="synthetique")
+    construction = time.perf_counter() - debut
+    dataset = Dataset(df, version=index.version, search_index=index)
+    print(f"🔎 Index construit en {construction:.1f} s ({len(index.vocab):,} jetons, {len(index.trigrams):,} trigrammes)")
+
+    rng = random.Random(args.seed)
+    requetes = random_queries(index, sorted(df["agence"].dropna().unique()), args.queries, rng)
+    seule, combinee = [], []
+    for requete in requetes:
+        filtres = random_filters(dataset, rng)
+        debut = time.perf_counter()
+        dataset.select(recherche=requete)
+        seule.append(time.perf_counter() - debut)
+        debut = time.perf_counter()
+        dataset.select(**filtres, recherche=requete)
+        combinee.append(time.perf_counter() - debut)
+
+    resultats = {
+        "n": args.n,
+        "construction_s": round(construction, 2),
+        "recherche": percentiles(seule),
+        "recherche+filtres": percentiles(combinee),
+    }
+    if args.naive:
+        textes = (df["titre"].fillna("") + " " + df["agence"].fillna("")).map(fold)
+        naive = []
+        for requete in requetes[:args.naive]:
+            debut = time.perf_counter()
+            for terme in fold(requete).split():
+                textes.str.contains(terme, regex=False)
+            naive.append(time.perf_counter() - debut)
+        resultats["str.contains"] = percentiles(naive)
+
+    for cle, valeur in resultats.items():
+        print(f"  {cle:<20}{valeur}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlencode
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import write_clean_csv  # noqa: E402
+
+
+# =========================
+# Test de charge du service HTTP
+# =========================
+# Lance `service.py` sur un CSV synthétique local et le sollicite depuis
+# plusieurs processus clients (connexions HTTP/1.1 persistantes, gzip accepté)
+# pendant une durée fixe. Chaque client enchaîne un mélange de requêtes :
+# pages d'annonces suivies par curseur, Arrow, résumé, classements,
+# répartitions et revalidations par ETag (If-None-Match). Rapporte le débit
+# (requêtes/s) et la latence par type de requête.
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.service_load -n 100000 --clients 8 --duration 20
+SCENARIOS = {
+    # nom → poids dans le mélange
+    "annonces": 4,
+    "annonces.arrow": 1,
+    "resume": 2,
+    "classements": 2,
+    "repartition": 1,
+    "revalidation": 2,
+}
+
+
+def start_service(data_dir: str, port: int) -> subprocess.Popen:
+    service = subprocess.Popen(
+        [sys.executable, str(SRC_DIR / "service.py"), "--data-dir", data_dir, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return service
+        except OSError:
+            time.sleep(0.1)
+    service.kill()
+    raise RuntimeError("le service n'a pas démarré")
+
+
+def random_filters(meta: dict, rng: random.Random) -> list:
+    """Filtres tirés au hasard, biaisés vers les plus fréquents (grande ville, type seul, aucun filtre)."""
+    tirage = rng.random()
+    if tirage < 0.3:
+        return []
+    if tirage < 0.6:
+        return [("type", rng.choice(meta["types"]))]
+    if tirage < 0.85:
+        return [("ville", rng.choice(meta["villes"][:20]))]
+    prix_min, prix_max = meta["prix"]
+    return [
+        ("ville", rng.choice(meta["villes"])),
+        ("option", rng.choice(meta["options"])),
+        ("prix_max", rng.randint(prix_min, prix_max)),
+    ]
+
+
+def client(port: int, duration: float, seed: int) -> dict:
+    """Boucle d'un processus client ; retourne les latences (s) par scénario."""
+    rng = random.Random(seed)
+    connexion = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def get(chemin, params, entetes=None):
+        debut = time.perf_counter()
+        connexion.request("GET", f"{chemin}?{urlencode(params)}", headers={"Accept-Encoding": "gzip", **(entetes or {})})
+        reponse = connexion.getresponse()
+        reponse.read()
+        if reponse.status not in (200, 304):
+            raise RuntimeError(f"{chemin} : HTTP {reponse.status}")
+        return reponse, time.perf_counter() - debut
+
+    connexion.request("GET", "/meta")
+    meta = json.loads(connexion.getresponse().read())
+    etags = []
+    latences = {nom: [] for nom in SCENARIOS}
+    fin = time.perf_counter() + duration
+    while time.perf_counter() < fin:
+        scenario = rng.choices(list(SCENARIOS), weights=list(SCENARIOS.values()))[0]
+        filtres = random_filters(meta, rng)
+        if scenario == "annonces":
+            # Première page puis deux pages suivantes par curseur
+            params = [*filtres, ("limit", 50)]
+            for _ in range(3):
+                reponse, duree = get("/annonces", params)
+                latences[scenario].append(duree)
+                curseur = reponse.getheader("X-Next-Cursor")
+                if not curseur:
+                    break
+                params = [*filtres, ("limit", 50), ("after", curseur)]
+        elif scenario == "annonces.arrow":
+            _, duree = get("/annonces", [*filtres, ("limit", 500), ("format", "arrow")])
+            latences[scenario].append(duree)
+        elif scenario == "revalidation":
+            if etags:
+                chemin, params, etag = rng.choice(etags)
+                _, duree = get(chemin, params, {"If-None-Match": etag})
+                latences[scenario].append(duree)
+        else:
+            reponse, duree = get(f"/{scenario}", filtres)
+            latences[scenario].append(duree)
+            etags.append((f"/{scenario}", filtres, reponse.getheader("ETag")))
+    connexion.close()
+    return latences
+
+
+def run_client(arguments: tuple) -> dict:
+    return client(*arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit (requêtes/s) et latence du service HTTP des annonces.")
+    parser.add_argument("-n", type=int, default=100_000, help="nombre d'annonces du CSV synthétique")
+    parser.add_argument("--clients", type=int, default=min(8, os.cpu_count() or 1), help="processus clients concurrents")
+    parser.add_argument("--duration", type=float, default=20, help="durée du test en secondes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8598)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_clean_csv(Path(data_dir) / "annonces_propres.csv", args.n, seed=args.seed)
+        service = start_service(data_dir, args.port)
+        try:
+            with multiprocessing.Pool(args.clients) as pool:
+                debut = time.perf_counter()
+                par_client = pool.map(run_client, [(args.port, args.duration, args.seed + i) for i in range(args.clients)])
+                duree = time.perf_counter() - debut
+        finally:
+            service.terminate()
+            service.wait()
+
+    resultats = {"n": args.n, "clients": args.clients, "duree_s": round(duree, 1), "scenarios": {}}
+    total = 0
+    print(f"{'Scénario':<18}{'requêtes':>10}{'req/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for nom in SCENARIOS:
+        latences = [l for c in par_client for l in c[nom]]
+        if len(latences) < 2:
+            continue
+        total += len(latences)
+        quantiles = statistics.quantiles(latences, n=100)
+        r = {
+            "requetes": len(latences),
+            "req_par_s": round(len(latences) / duree, 1),
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p95_ms": round(quantiles[94] * 1000, 2),
+        }
+        resultats["scenarios"][nom] = r
+        print(f"{nom:<18}{r['requetes']:>10}{r['req_par_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    resultats["req_par_s"] = round(total / duree, 1)
+    print(f"{'total':<18}{total:>10}{resultats['req_par_s']:>10}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generator import build_site, generate_clean  # noqa: E402
+
+
+# =========================
+# Site local de substitution
+# =========================
+# Sert le site statique de generator.build_site en HTTP, pour crawler le spider
+# de bout en bout (-a base_url=http://127.0.0.1:<port>) sans toucher au vrai site.
+def make_handler(pages: dict):
+    class SiteHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            page = pages.get(self.path.rstrip("/") or "/")
+            if page is None:
+                self.send_error(404)
+                return
+            body = page[1].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # une ligne par requête noierait la sortie des benchmarks
+
+    return SiteHandler
+
+
+def serve(pages: dict, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Démarre le site dans un thread.
+
+    Retourne:
+    - le serveur (adresse dans server.server_address, arrêt avec server.shutdown())
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(pages))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sert un site synthétique imitant etreproprio.com.")
+    parser.add_argument("-n", type=int, default=1_000, help="nombre d'annonces")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(build_site(generate_clean(args.n, seed=args.seed))))
+    print(f"🌐 {args.n} annonces servies sur http://127.0.0.1:{args.port} (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
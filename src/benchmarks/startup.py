@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from benchmarks.generator import generate_clean  # noqa: E402
+
+
+# =========================
+# Démarrage à froid du tableau de bord
+# =========================
+# Chaque mesure est prise dans un processus neuf (aucun module en cache) :
+# 1. import de app.py une fois streamlit et pandas chargés (ce que coûte le
+#    premier rerun au processus du serveur), et modules lourds importés par
+#    app.py (hors ceux déjà chargés par streamlit et pandas : pandas charge
+#    pyarrow s'il est installé) ;
+# 2. premier affichage d'une session (AppTest : exécution complète du script
+#    sur un CSV synthétique de DATA_DIR), puis passage dans chaque onglet et
+#    retour au premier, avec les temps par étape du profilage.
+# Les photos du jeu synthétique sont retirées : le premier affichage ne doit
+# pas dépendre du site source des miniatures.
+# Code retour 1 si un temps dépasse son budget (STARTUP_BUDGETS_S).
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.startup -n 20000
+
+STARTUP_BUDGETS_S = {"import": 0.3, "first_paint": 2.0, "tab_switch": 1.0}
+HEAVY_MODULES = ["plotly.express", "requests", "dotenv", "pyarrow", "PIL"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+import streamlit, pandas
+avant = set(sys.modules)
+debut = time.perf_counter()
+import app
+duree = time.perf_counter() - debut
+print(json.dumps({"import_s": duree, "modules": {m: m in set(sys.modules) - avant for m in %r}}))
+""" % HEAVY_MODULES
+
+PAINT_SCRIPT = """
+import json, sys, time
+import pandas
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("src/app.py", default_timeout=300)
+avant = set(sys.modules)
+debut = time.perf_counter()
+at.run()
+assert not at.exception, at.exception
+mesures = {"first_paint_s": time.perf_counter() - debut,
+           "etapes_ms": at.session_state["profiling_history"][-1]["timings_ms"],
+           "modules": {m: m in set(sys.modules) - avant for m in %r}, "onglets": {}}
+from app import TABS  # après les mesures du premier affichage
+for onglet in TABS[1:] + TABS[:1]:
+    at.session_state["active_tab"] = onglet
+    debut = time.perf_counter()
+    at.run()
+    assert not at.exception, (onglet, at.exception)
+    mesures["onglets"][onglet] = time.perf_counter() - debut
+print(json.dumps(mesures, ensure_ascii=False))
+""" % HEAVY_MODULES
+
+
+def run(script: str, data_dir: str) -> dict:
+    """Exécute `script` dans un processus neuf (racine du dépôt, pour .streamlit/config.toml)."""
+    env = dict(os.environ, DATA_DIR=data_dir, PYTHONPATH=str(SRC_DIR))
+    resultat = subprocess.run([sys.executable, "-c", script], cwd=SRC_DIR.parent, env=env,
+                              capture_output=True, text=True, check=True)
+    return json.loads(resultat.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Démarrage à froid du tableau de bord (import et premier affichage).")
+    parser.add_argument("-n", type=int, default=20_000, help="annonces du CSV synthétique")
+    parser.add_argument("--repeat", type=int, default=3, help="processus neufs par mesure (médiane)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        df = generate_clean(args.n, seed=args.seed).assign(images_page="[]")
+        df.to_csv(Path(dossier) / "annonces_propres.csv", index=False)
+        imports = [run(IMPORT_SCRIPT, dossier) for _ in range(args.repeat)]
+        affichages = [run(PAINT_SCRIPT, dossier) for _ in range(args.repeat)]
+
+    def mediane(valeurs):
+        return round(sorted(valeurs)[len(valeurs) // 2], 3)
+
+    resultats = {
+        "annonces": args.n,
+        "import_s": mediane([m["import_s"] for m in imports]),
+        "modules_apres_import": imports[0]["modules"],
+        "first_paint_s": mediane([m["first_paint_s"] for m in affichages]),
+        "modules_apres_premier_affichage": affichages[0]["modules"],
+        "etapes_premier_affichage_ms": affichages[len(affichages) // 2]["etapes_ms"],
+        "onglets_s": {onglet: mediane([m["onglets"][onglet] for m in affichages]) for onglet in affichages[0]["onglets"]},
+    }
+    print(f"  import de app.py            {resultats['import_s']:.3f} s  "
+          f"(déjà importés : {', '.join(m for m, ok in resultats['modules_apres_import'].items() if ok) or 'aucun'})")
+    print(f"  premier affichage           {resultats['first_paint_s']:.3f} s  "
+          f"(déjà importés : {', '.join(m for m, ok in resultats['modules_apres_premier_affichage'].items() if ok) or 'aucun'})")
+    for nom, ms in resultats["etapes_premier_affichage_ms"].items():
+        print(f"    {nom:<30} {ms:>9.1f} ms")
+    for onglet, duree in resultats["onglets_s"].items():
+        print(f"  onglet {onglet:<20} {duree:.3f} s")
+
+    depassements = [
+        nom for nom, duree in [("import", resultats["import_s"]), ("first_paint", resultats["first_paint_s"])]
+        + [("tab_switch", d) for d in resultats["onglets_s"].values()]
+        if duree > STARTUP_BUDGETS_S[nom]
+    ]
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2, ensure_ascii=False), encoding="utf-8")
+    if depassements:
+        print(f"⚠️ Budget dépassé : {', '.join(sorted(set(depassements)))}")
+        sys.exit(1)
+    print("✅ Démarrage dans les budgets")
+
+
+if __name__ == "__main__":
+    main()
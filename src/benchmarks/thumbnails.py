@@ -0,0 +1,153 @@
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from thumbnails import ThumbnailCache  # noqa: E402
+
+
+# =========================
+# Cache des miniatures face à un serveur d'images local
+# =========================
+# Un serveur local de substitution sert des photos JPEG générées (avec une
+# latence réglable, comme un CDN distant) ; le script mesure puis vérifie :
+# - le temps d'obtention des miniatures d'une page de 10 annonces, à froid puis
+#   depuis le cache ;
+# - le préchargement de la page suivante (disponible sans attente) ;
+# - le dédoublonnage par contenu, la mémorisation des images introuvables et le
+#   respect du volume maximal (éviction LRU).
+#
+# Usage (depuis src/) :
+#   python -m benchmarks.thumbnails --latency 0.2
+PAGE_SIZE = 10
+IMAGES_PER_ROW = 5
+
+
+def make_photo(numero: int, taille=(640, 480)) -> bytes:
+    """Photo JPEG synthétique (bruit coloré, différent pour chaque numéro)."""
+    rng = np.random.default_rng(numero)
+    pixels = rng.integers(0, 256, (taille[1] // 8, taille[0] // 8, 3), dtype=np.uint8)
+    sortie = BytesIO()
+    Image.fromarray(pixels).resize(taille).save(sortie, "JPEG", quality=85)
+    return sortie.getvalue()
+
+
+def serve_images(latence: float) -> ThreadingHTTPServer:
+    """
+    Serveur d'images : /photo/<n>.jpeg renvoie la photo n, /copie/<n>.jpeg la même
+    photo sous une autre URL, toute autre URL une 404.
+    """
+    photos = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latence)
+            parties = self.path.strip("/").split("/")
+            if len(parties) != 2 or parties[0] not in ("photo", "copie"):
+                self.send_error(404)
+                return
+            numero = int(parties[1].split(".")[0])
+            if numero not in photos:
+                photos[numero] = make_photo(numero)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(photos[numero])))
+            self.end_headers()
+            self.wfile.write(photos[numero])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def page_urls(base_url: str, page: int) -> list:
+    premier = page * PAGE_SIZE * IMAGES_PER_ROW
+    return [f"{base_url}/photo/{n}.jpeg" for n in range(premier, premier + PAGE_SIZE * IMAGES_PER_ROW)]
+
+
+def chrono(fonction, *args, **kwargs):
+    debut = time.perf_counter()
+    resultat = fonction(*args, **kwargs)
+    return resultat, time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache des miniatures de la galerie face à un serveur d'images local.")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du serveur d'images par requête (s)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    server = serve_images(args.latency)
+    base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    resultats = {"latence_s": args.latency, "images_par_page": PAGE_SIZE * IMAGES_PER_ROW}
+    with tempfile.TemporaryDirectory() as dossier:
+        cache = ThumbnailCache(dossier, workers=args.workers)
+
+        # Page affichée à froid, puis à nouveau (retour sur la page)
+        miniatures, duree = chrono(cache.get, page_urls(base_url, 0), timeout=60)
+        assert len(miniatures) == PAGE_SIZE * IMAGES_PER_ROW, miniatures
+        resultats["page_froide_s"] = round(duree, 3)
+        _, duree = chrono(cache.get, page_urls(base_url, 0), timeout=60)
+        resultats["page_en_cache_ms"] = round(duree * 1000, 2)
+
+        # Préchargement : la page suivante est prête quand l'utilisateur y arrive
+        for future in cache.fetch(page_urls(base_url, 1)):
+            future.result()
+        miniatures, duree = chrono(cache.get, page_urls(base_url, 1), timeout=0)
+        assert len(miniatures) == PAGE_SIZE * IMAGES_PER_ROW
+        resultats["page_prechargee_ms"] = round(duree * 1000, 2)
+
+        fichier = Path(dossier) / miniatures[page_urls(base_url, 1)[0]]
+        with Image.open(fichier) as image:
+            assert image.format == "WEBP" and image.width == 60, (image.format, image.size)
+        resultats["octets_par_miniature"] = round(cache.stats()["octets"] / (2 * PAGE_SIZE * IMAGES_PER_ROW))
+
+        # Même photo sous une autre URL : un seul fichier
+        originale, copie = page_urls(base_url, 0)[0], f"{base_url}/copie/0.jpeg"
+        assert cache.get([copie], timeout=60)[copie] == cache.get([originale])[originale]
+        assert cache.stats()["fichiers"] == 2 * PAGE_SIZE * IMAGES_PER_ROW
+
+        # Image introuvable : mémorisée, pas redemandée
+        introuvable = f"{base_url}/absente.jpeg"
+        assert cache.get([introuvable], timeout=60) == {}
+        assert cache.fetch([introuvable]) == []
+        cache.close()
+
+        # Éviction : volume borné, les miniatures les plus récemment affichées sont gardées
+        limite = resultats["octets_par_miniature"] * 60
+        cache = ThumbnailCache(dossier, max_bytes=limite, workers=args.workers)
+        cache.get(page_urls(base_url, 1), timeout=0)  # page 1 consultée en dernier
+        for page in range(2, 4):
+            cache.get(page_urls(base_url, page), timeout=60)
+        stats = cache.stats()
+        fichiers = len(list(Path(dossier).glob("*.webp")))
+        assert stats["octets"] <= limite and fichiers == stats["fichiers"], (stats, fichiers, limite)
+        assert len(cache.get(page_urls(base_url, 3))) == PAGE_SIZE * IMAGES_PER_ROW
+        resultats["eviction"] = {"limite_octets": limite, **stats, "fichiers_sur_disque": fichiers}
+        cache.close()
+    server.shutdown()
+
+    for cle, valeur in resultats.items():
+        print(f"  {cle:<22}{valeur}")
+    print("✅ Vérifications réussies")
+    if args.output:
+        Path(args.output).write_text(json.dumps(resultats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
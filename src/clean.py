@@ -1,6 +1,12 @@
 import pandas as pd
 import re
 import sys
+import time
+from pathlib import Path
+from dataset import content_version
+from dedup import deduplicate
+from gazetteer import Gazetteer, geocode
+from search import SearchIndex, index_path
 
 
 def clean_str(str_val):
@@ -71,17 +77,17 @@ def clean_pieces(pieces_str): # "pieces": "3 pièces"
 # =========================
 # Pipeline de nettoyage
 # =========================
-def main():
-    # 1️⃣ Charger le JSON
-    # df = pd.read_json("annonces.json")
+def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Nettoie les annonces brutes du spider.
 
-    if len(sys.argv) != 3:
-        print("Usage: python clean.py <input_json_file> <output_csv_file>")
-        sys.exit(1)
-    input_file = sys.argv[1]
-    df = pd.DataFrame(pd.read_json(input_file))
+    Paramètres:
+    - df : DataFrame des items Scrapy (une ligne par annonce).
 
-    # 2️⃣ Nettoyage des colonnes
+    Retourne:
+    - DataFrame nettoyé (sans localisation, avec ville, code_postal et prix_m2).
+    """
+    # 1️⃣ Nettoyage des colonnes
     df['titre'] = df['titre'].apply(clean_str)
     df['type'] = df['type'].apply(clean_type)
     df['prix'] = df['prix'].apply(clean_prix)
@@ -97,22 +103,63 @@ def main():
     df['acces_handicape'] = df['acces_handicape'].apply(lambda x: True if x else False)
     df['agence'] = df['agence'].apply(clean_str)
 
-    # 3️⃣ Gérer les valeurs manquantes et supprimer les colonnes inutiles
+    # 2️⃣ Gérer les valeurs manquantes et supprimer les colonnes inutiles
     df = df.dropna(subset=['prix', 'surface'])  # on enlève les lignes sans prix ou surface
     df = df.drop(columns=['localisation'], errors='ignore')  # on enlève la colonne localisation
 
-    # 4️⃣ Calculer le prix au m² (2 décimales)
+    # 3️⃣ Calculer le prix au m² (2 décimales)
     df['prix_m2'] = (df['prix'] / df['surface']).round(2)
+    return df
+
+
+# =========================
+# Main
+# =========================
+def main():
+    # 1️⃣ Charger le JSON
+    # df = pd.read_json("annonces.json")
+
+    if len(sys.argv) != 3:
+        print("Usage: python clean.py <input_json_or_jsonl_file> <output_csv_file>")
+        sys.exit(1)
+    input_file = sys.argv[1]
+    df = pd.DataFrame(pd.read_json(input_file, lines=input_file.endswith(".jsonl")))
+    print(f"📥 {len(df)} annonces lues.", flush=True)
+
+    # 2️⃣ Nettoyage des colonnes, valeurs manquantes et prix au m²
+    # (les débits affichés sont suivis par l'exécution locale du pipeline, voir runner.py)
+    nb_avant, debut = len(df), time.perf_counter()
+    df = clean_dataframe(df)
+    duree = time.perf_counter() - debut
+    print(f"🧹 {nb_avant} annonces nettoyées en {duree:.1f} s ({nb_avant / max(duree, 1e-6):.0f} lignes/s).", flush=True)
+
+    # 3️⃣ Villes : nom officiel, code INSEE et coordonnées (référentiel des communes hors ligne)
+    gazetteer = Gazetteer.load()
+    if gazetteer is None:
+        print("⚠️ Référentiel des communes absent (voir gazetteer.py) : villes normalisées sans coordonnées.")
+    debut = time.perf_counter()
+    df = geocode(df, gazetteer)
+    duree = time.perf_counter() - debut
+    print(f"📍 {df['code_insee'].notna().sum()} / {len(df)} annonces rattachées à une commune en {duree:.1f} s "
+          f"({len(df) / max(duree, 1e-6):.0f} lignes/s).", flush=True)
+
+    # 4️⃣ Fusionner les quasi-doublons publiés par plusieurs agences
+    nb_avant, debut = len(df), time.perf_counter()
+    df = deduplicate(df)
+    duree = time.perf_counter() - debut
+    print(f"🔁 {nb_avant - len(df)} doublons fusionnés en {duree:.1f} s ({nb_avant / max(duree, 1e-6):.0f} lignes/s).", flush=True)
 
     # 5️⃣ Sauvegarder en CSV
     output_file = sys.argv[2]
     df.to_csv(output_file, index=False, encoding='utf-8')
 
+    # 6️⃣ Index de recherche plein texte (titre, agence), rattaché à la version du CSV écrit
+    version = content_version(Path(output_file).read_bytes())
+    SearchIndex.build(df, version).save(index_path(output_file))
+    print(f"🔎 Index de recherche écrit dans '{index_path(output_file)}'.")
+
     print(f"✅ Nettoyage terminé. Fichier '{output_file}' créé.")
 
 
-# =========================
-# Main
-# =========================
 if __name__ == "__main__":
     main()
\ No newline at end of file
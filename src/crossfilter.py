@@ -0,0 +1,169 @@
+import base64
+import json
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dataset import OPTION_COLUMNS, Dataset
+from query import DPE_LETTRES
+
+
+# =========================
+# Filtrage croisé dans le navigateur
+# =========================
+# Les colonnes utiles aux graphiques sont quantifiées en petits entiers et
+# envoyées une seule fois au navigateur (un fichier binaire par version du
+# jeu, servi comme fichier statique) ; le composant templates/crossfilter.html
+# y calcule histogrammes, boxplot et répartitions, et applique les sélections
+# (brossage) de chaque graphique aux autres sans aucun aller-retour serveur.
+#
+# Format du fichier : b"XF01", longueur de l'en-tête (uint32), en-tête JSON
+# (bornes des classes, dictionnaires, position de chaque colonne), puis les
+# colonnes, little-endian, alignées sur 8 octets (positions relatives au début
+# des colonnes, lui-même aligné) :
+#   prix, surface  uint8   classe de l'histogramme (MISSING_BIN si manquant)
+#   prix_m2        uint16  (valeur - min) / pas (MISSING_LEVEL si manquant)
+#   ville          uint16  code de la ville (nombre de villes si manquante)
+#   dpe, ges       uint8   rang de la lettre A-G (7 si manquante)
+#   options        uint8   bit i : i-ème option d'OPTION_COLUMNS
+
+NB_BINS = 60
+MISSING_BIN = 255
+MISSING_LEVEL = 65535  # prix_m2 : 65 535 niveaux, le dernier code marque une valeur manquante
+BIN_QUANTILES = (0.005, 0.995)  # les valeurs extrêmes sont comptées dans la première / dernière classe
+PAYLOAD_MAGIC = b"XF01"
+TEMPLATE = Path(__file__).resolve().parent / "templates" / "crossfilter.html"
+
+
+def _bin(values: np.ndarray) -> tuple:
+    """Classes de même largeur entre les quantiles BIN_QUANTILES ; retourne (codes uint8, bornes)."""
+    valides = values[~np.isnan(values)]
+    if len(valides) == 0:
+        return np.full(len(values), MISSING_BIN, dtype=np.uint8), [0.0, 1.0]
+    bas, haut = np.quantile(valides, BIN_QUANTILES)
+    if haut <= bas:
+        haut = bas + 1
+    bornes = np.linspace(bas, haut, NB_BINS + 1)
+    codes = np.clip(np.searchsorted(bornes, values, side="right") - 1, 0, NB_BINS - 1).astype(np.uint8)
+    codes[np.isnan(values)] = MISSING_BIN
+    return codes, [round(float(b), 2) for b in bornes]
+
+
+def _quantize(values: np.ndarray) -> tuple:
+    """Quantification linéaire sur 16 bits ; retourne (codes uint16, minimum, pas)."""
+    valides = values[np.isfinite(values)]
+    if len(valides) == 0:
+        return np.full(len(values), MISSING_LEVEL, dtype=np.uint16), 0.0, 1.0
+    bas, haut = float(valides.min()), float(valides.max())
+    pas = (haut - bas) / (MISSING_LEVEL - 1) or 1.0
+    codes = np.full(len(values), MISSING_LEVEL, dtype=np.uint16)
+    finies = np.isfinite(values)
+    codes[finies] = np.rint((values[finies] - bas) / pas).astype(np.uint16)
+    return codes, bas, pas
+
+
+def _letters(dataset: Dataset, col: str) -> np.ndarray:
+    if col not in dataset.df:
+        return np.full(len(dataset), len(DPE_LETTRES), dtype=np.uint8)
+    codes = pd.Categorical(dataset.df[col], categories=DPE_LETTRES).codes
+    return np.where(codes >= 0, codes, len(DPE_LETTRES)).astype(np.uint8)
+
+
+def build_payload(dataset: Dataset) -> bytes:
+    """
+    Colonnes quantifiées du jeu de données, au format décrit en tête de module.
+
+    Retourne:
+    - contenu binaire (9 octets par annonce, plus l'en-tête).
+    """
+    prix, bornes_prix = _bin(dataset.prix.astype(float))
+    surface, bornes_surface = _bin(dataset.surface.astype(float))
+    prix_m2, prix_m2_min, prix_m2_pas = _quantize(dataset.df["prix_m2"].to_numpy(dtype=float))
+    ville = dataset.ville_codes.astype(np.uint16)
+    ville[dataset.ville_codes < 0] = len(dataset.villes)
+    # Même masque de bits que Dataset.option_bits (bit i : i-ème option), limité aux options du fichier
+    options = dataset.option_bits & np.uint8(sum(dataset.options.values()))
+    libelles = list(OPTION_COLUMNS)
+    colonnes = {
+        "prix": prix, "surface": surface, "prix_m2": prix_m2, "ville": ville,
+        "dpe": _letters(dataset, "dpe"), "ges": _letters(dataset, "ges"), "options": options,
+    }
+
+    entete = {
+        "version": dataset.version,
+        "n": len(dataset),
+        "prix_bornes": bornes_prix,
+        "surface_bornes": bornes_surface,
+        "prix_m2": {"min": prix_m2_min, "pas": prix_m2_pas},
+        "villes": dataset.villes,
+        "lettres": DPE_LETTRES,
+        "options": libelles,
+        "colonnes": [],
+    }
+    position = 0
+    for nom, valeurs in colonnes.items():
+        entete["colonnes"].append({"nom": nom, "type": valeurs.dtype.name, "position": position, "longueur": len(valeurs)})
+        position = _align(position + valeurs.nbytes)
+    texte = json.dumps(entete).encode("utf-8")
+    debut = _align(8 + len(texte))  # début des colonnes, auquel les positions sont relatives
+    contenu = bytearray(debut + position)
+    contenu[:8 + len(texte)] = PAYLOAD_MAGIC + struct.pack("<I", len(texte)) + texte
+    for colonne in entete["colonnes"]:
+        valeurs = colonnes[colonne["nom"]]
+        donnees = valeurs.astype(valeurs.dtype.newbyteorder("<")).tobytes()
+        contenu[debut + colonne["position"]:debut + colonne["position"] + len(donnees)] = donnees
+    return bytes(contenu)
+
+
+def _align(position: int) -> int:
+    return (position + 7) // 8 * 8
+
+
+def payload_name(dataset: Dataset) -> str:
+    return f"{dataset.version[:16]}.bin"
+
+
+def write_payload(directory, dataset: Dataset) -> str:
+    """
+    Écrit le fichier du jeu (une seule fois par version) et supprime ceux des versions précédentes.
+
+    Retourne:
+    - nom du fichier dans `directory`.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    nom = payload_name(dataset)
+    chemin = directory / nom
+    if not chemin.exists():
+        temporaire = chemin.with_suffix(f".{os.getpid()}.tmp")
+        temporaire.write_bytes(build_payload(dataset))
+        os.replace(temporaire, chemin)
+    for ancien in directory.glob("*.bin"):
+        if ancien.name != nom:
+            ancien.unlink(missing_ok=True)
+    return nom
+
+
+def pack_selection(rows: np.ndarray, nb_rows: int):
+    """Lignes retenues par la barre latérale en masque de bits (base64), ou None si toutes le sont."""
+    if len(rows) == nb_rows:
+        return None
+    masque = np.zeros(nb_rows, dtype=bool)
+    masque[rows] = True
+    return base64.b64encode(np.packbits(masque).tobytes()).decode("ascii")
+
+
+def render_html(source: str, selection: str = None, couleurs: dict = None) -> str:
+    """
+    Page du composant.
+
+    Paramètres:
+    - source : URL (ou data URI) du fichier produit par build_payload().
+    - selection : masque de pack_selection() (None : toutes les annonces).
+    - couleurs : palettes des graphiques (clés "dpe" et "ges" : lettre → couleur).
+    """
+    config = {"source": source, "selection": selection, "couleurs": couleurs or {}}
+    return TEMPLATE.read_text(encoding="utf-8").replace("/*CONFIG*/null", json.dumps(config))
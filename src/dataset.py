@@ -0,0 +1,252 @@
+import hashlib
+from functools import cached_property
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from search import SearchIndex
+
+
+# =========================
+# Jeu de données partagé du tableau de bord
+# =========================
+# Le DataFrame des annonces et ses index dérivés sont construits une seule fois
+# par processus (st.cache_resource dans app.py) et partagés par toutes les
+# sessions : ils ne doivent jamais être modifiés. Chaque session ne conserve
+# que l'état de ses filtres et la sélection de lignes qui en résulte.
+#
+# Le DataFrame est gardé sous une forme compacte (DASHBOARD_SCHEMA) : seules
+# les colonnes utiles au tableau de bord sont chargées (pas l'image principale
+# en base64), les nombres en float32, les colonnes répétitives (ville, type,
+# DPE, agence...) en catégories, et les six options en un seul masque de bits
+# (colonne "options", uint8). expand() rend à quelques lignes leur forme
+# d'origine pour l'affichage et l'export.
+
+# Libellé du filtre → colonne booléenne du CSV
+OPTION_COLUMNS = {
+    "Parking 🚗": "parking",
+    "Jardin 🌳": "jardin",
+    "Balcon/Terrasse 🏖️": "balcon_terrasse",
+    "Piscine 🏊‍♂️": "piscine",
+    "Ascenseur 🛗": "ascenseur",
+    "Accès Handicapé ♿": "acces_handicape",
+}
+
+
+# Colonnes gardées au chargement → type compact (les autres colonnes du CSV ne sont pas lues)
+DASHBOARD_SCHEMA = {
+    "titre": "object",
+    "type": "category",
+    "lien": "object",
+    "prix": "float32",
+    "surface": "float32",
+    "surface_terrain": "float32",
+    "pieces": "float32",  # entier, mais avec des valeurs manquantes
+    "dpe": "category",
+    "ges": "category",
+    "images_page": "object",
+    "agence": "category",
+    "ville": "category",
+    "code_postal": "category",
+    "departement": "category",
+    "prix_m2": "float32",
+    # Référentiel des communes (gazetteer.py) et fusion des quasi-doublons (dedup.py)
+    "code_insee": "category",
+    "region": "category",
+    "latitude": "float32",
+    "longitude": "float32",
+    "nb_doublons": "uint8",
+}
+OPTIONS_COLUMN = "options"  # bit i : i-ème colonne d'OPTION_COLUMNS
+DECIMALS = 2  # décimales du CSV, rétablies par expand() (float32 : ~7 chiffres significatifs)
+COORDINATE_DECIMALS = {"latitude": 5, "longitude": 5}  # coordonnées : au mètre près, pas à 2 décimales
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Forme compacte des annonces : colonnes de DASHBOARD_SCHEMA à leur type, options en masque de bits.
+
+    Retourne:
+    - nouveau DataFrame (df n'est pas modifié) ; un DataFrame déjà compact est rendu tel quel.
+    """
+    colonnes = {}
+    for col, dtype in DASHBOARD_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if dtype == "category" and not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        elif dtype == "float32" and serie.dtype != np.float32:
+            serie = pd.to_numeric(serie, errors="coerce").astype(np.float32)
+        elif dtype == "uint8" and serie.dtype != np.uint8:
+            serie = pd.to_numeric(serie, errors="coerce").fillna(0).clip(0, 255).astype(np.uint8)
+        colonnes[col] = serie
+    if OPTIONS_COLUMN in df.columns:
+        colonnes[OPTIONS_COLUMN] = df[OPTIONS_COLUMN].astype(np.uint8)
+    else:
+        bits = np.zeros(len(df), dtype=np.uint8)
+        for i, col in enumerate(OPTION_COLUMNS.values()):
+            if col in df.columns:
+                bits |= (df[col] == True).to_numpy().astype(np.uint8) << i  # noqa: E712 (valeurs manquantes → False)
+        colonnes[OPTIONS_COLUMN] = bits
+    return pd.DataFrame(colonnes, index=df.index)
+
+
+def expand(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Forme d'origine (celle du CSV) de lignes du jeu compact : options en colonnes
+    booléennes, nombres en float64 arrondis à DECIMALS, catégories en texte.
+    À réserver à de petits blocs (page affichée, bloc d'export).
+    """
+    colonnes = {}
+    for col in df.columns:
+        serie = df[col]
+        if col == OPTIONS_COLUMN:
+            for i, option in enumerate(OPTION_COLUMNS.values()):
+                colonnes[option] = (serie.to_numpy() >> i & 1).astype(bool)
+            continue
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        elif serie.dtype == np.float32:
+            serie = serie.astype(np.float64).round(COORDINATE_DECIMALS.get(col, DECIMALS))
+        elif serie.dtype == np.uint8:
+            serie = serie.astype(np.int64)
+        colonnes[col] = serie
+    return pd.DataFrame(colonnes, index=df.index)
+
+
+def _bounds(serie: pd.Series) -> tuple:
+    """Bornes entières d'un slider (élargies d'une unité si la colonne n'a qu'une valeur)."""
+    if serie.nunique() > 1:
+        return int(serie.min()), int(serie.max())
+    return int(serie.min()) - 1, int(serie.max()) + 1
+
+
+def content_version(contenu: bytes) -> str:
+    """Version d'un CSV : empreinte SHA-1 de son contenu (partagée avec l'index de recherche)."""
+    return hashlib.sha1(contenu).hexdigest()
+
+
+def _member(codes: np.ndarray, selection: np.ndarray, nb_categories: int) -> np.ndarray:
+    """
+    Masque des lignes dont le code appartient à la sélection.
+
+    Une table booléenne indexée par code coûte une seule lecture par ligne,
+    quel que soit le nombre de valeurs sélectionnées (np.isin est bien plus lent).
+    """
+    table = np.zeros(nb_categories + 1, dtype=bool)  # dernière case : code -1 (valeur manquante), jamais retenue
+    table[selection[selection >= 0]] = True
+    return table[codes]
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class Dataset:
+    """
+    Annonces nettoyées et index précalculés pour les filtres.
+
+    Paramètres:
+    - df : DataFrame de annonces_propres.csv (gardé sous sa forme compacte, voir compact()).
+    - version : identifiant du contenu (empreinte du CSV) ; calculé à partir du DataFrame si absent.
+    - search_index : index plein texte enregistré au nettoyage (ignoré s'il ne correspond pas à cette version).
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str = None, search_index: SearchIndex = None):
+        # Les résultats mis en cache (query.ResultCache) sont rattachés à cette version
+        self.version = version or format(int(pd.util.hash_pandas_object(df, index=False).sum()), "016x")
+        # Options filtrables : colonnes présentes dans le fichier (toutes si df est déjà compact)
+        options = [col for col in OPTION_COLUMNS.values() if col in df.columns or OPTIONS_COLUMN in df.columns]
+        self.df = df = compact(df)
+        self.villes = sorted(df["ville"].dropna().unique())
+        self.types = sorted(df["type"].dropna().unique())
+        self.prix_bounds = _bounds(df["prix"])
+        self.surface_bounds = _bounds(df["surface"])
+        if search_index is not None and (search_index.version != self.version or search_index.nb_rows != len(df)):
+            search_index = None
+        self._search_index = search_index
+
+        # Codes entiers des villes et types : un filtre isin devient une recherche dans un petit tableau
+        self.ville_codes = _read_only(pd.Categorical(df["ville"], categories=self.villes).codes)
+        self.type_codes = _read_only(pd.Categorical(df["type"], categories=self.types).codes)
+        # Index (et leur table de hachage) réutilisés pour traduire les valeurs sélectionnées en codes
+        self.ville_index = pd.Index(self.villes)
+        self.type_index = pd.Index(self.types)
+        self.prix = _read_only(df["prix"].to_numpy())
+        self.surface = _read_only(df["surface"].to_numpy())
+        # Masque de bits des options (lu dans le DataFrame, sans copie) et bit de chaque option
+        self.option_bits = _read_only(df[OPTIONS_COLUMN].to_numpy())
+        self.options = {col: np.uint8(1 << i) for i, col in enumerate(OPTION_COLUMNS.values()) if col in options}
+
+    @classmethod
+    def from_csv(cls, contenu: bytes, search_index: SearchIndex = None) -> "Dataset":
+        """Construit le jeu de données à partir du contenu brut du CSV (versionné par son empreinte SHA-1)."""
+        # Seules les colonnes du schéma sont lues, directement à leur type compact (sauf les options, empaquetées ensuite)
+        lues = set(DASHBOARD_SCHEMA) | set(OPTION_COLUMNS.values())
+        df = pd.read_csv(
+            BytesIO(contenu),
+            usecols=lambda col: col in lues,
+            dtype={col: dtype for col, dtype in DASHBOARD_SCHEMA.items() if dtype in ("category", "float32")},
+        )
+        return cls(df, version=content_version(contenu), search_index=search_index)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Index plein texte (construit à la première recherche si aucun index à jour n'a été chargé)."""
+        if self._search_index is None:
+            self._search_index = SearchIndex.build(self.df, self.version)
+        return self._search_index
+
+    @cached_property
+    def memory_bytes(self) -> int:
+        """Empreinte mémoire du DataFrame et des index (calculée une fois, le jeu étant immuable)."""
+        # prix, surface et option_bits sont des vues sur les colonnes du DataFrame
+        index = self.ville_codes.nbytes + self.type_codes.nbytes
+        return int(self.df.memory_usage(deep=True).sum()) + index
+
+    @property
+    def columns(self) -> list:
+        """Colonnes des lignes rendues par expand() (affichage, export)."""
+        return list(expand(self.df.iloc[:0]).columns)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def select(self, villes=(), types=(), options=(), prix=None, surface=None, recherche="") -> np.ndarray:
+        """
+        Applique les filtres de la barre latérale.
+
+        Paramètres:
+        - villes, types : valeurs retenues (toutes si vide).
+        - options : libellés d'OPTION_COLUMNS que le bien doit posséder (logique ET).
+        - prix, surface : intervalles (min, max) inclusifs.
+        - recherche : mots (ou débuts/morceaux de mots) à trouver dans le titre ou l'agence.
+
+        Retourne:
+        - positions (ordre d'origine) des lignes retenues.
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+        if villes:
+            mask &= _member(self.ville_codes, self.ville_index.get_indexer(villes), len(self.villes))
+        if types:
+            mask &= _member(self.type_codes, self.type_index.get_indexer(types), len(self.types))
+        for libelle in options:
+            col = OPTION_COLUMNS.get(libelle)
+            if col in self.options:
+                mask &= (self.option_bits & self.options[col]) != 0
+        if prix is not None:
+            mask &= (self.prix >= prix[0]) & (self.prix <= prix[1])
+        if surface is not None:
+            mask &= (self.surface >= surface[0]) & (self.surface <= surface[1])
+        if recherche:
+            mask &= self.search_index.mask(recherche)
+        return np.flatnonzero(mask)
+
+    def view(self, rows: np.ndarray) -> pd.DataFrame:
+        """Lignes sélectionnées (le DataFrame partagé lui-même si rien n'est filtré)."""
+        if len(rows) == len(self.df):
+            return self.df
+        return self.df.iloc[rows]
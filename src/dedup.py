@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+import re
+import sys
+import time
+import unicodedata
+import zlib
+
+
+# =========================
+# Détection des quasi-doublons (MinHash + LSH)
+# =========================
+# Une même annonce est souvent publiée par plusieurs agences avec un titre et
+# des photos légèrement différents. Chaque annonce est représentée par un
+# ensemble de jetons (n-grammes de caractères du titre + identifiants des
+# images), résumé par une signature MinHash. Le découpage de la signature en
+# bandes (LSH) regroupe les annonces similaires dans les mêmes seaux : seules
+# ces paires candidates sont comparées, ce qui évite le O(n²).
+NB_PERMUTATIONS = 64
+NB_BANDES = 16            # 16 bandes de 4 lignes → seuil de similarité ≈ 0.5
+SEUIL_JACCARD = 0.6       # similarité estimée minimale pour valider une paire
+SEUIL_MEME_AGENCE = 0.9   # seuil relevé quand les deux annonces viennent de la même agence
+TAILLE_SEAU_MAX = 50      # seaux plus grands = jetons trop génériques, ignorés
+TAILLE_BLOC = 100_000     # annonces traitées par bloc (mémoire bornée)
+ECART_SURFACE_MAX = 0.05  # 5 % d'écart de surface toléré
+ECART_PRIX_MAX = 0.15     # 15 % d'écart de prix toléré (négociation, frais d'agence)
+
+_PREMIER = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(42)
+_A = _rng.integers(1, (1 << 31) - 1, NB_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, NB_PERMUTATIONS, dtype=np.uint64)
+_MULT_BANDES = _rng.integers(1, 1 << 62, NB_PERMUTATIONS // NB_BANDES, dtype=np.uint64) | np.uint64(1)
+
+
+def normalize_text(texte) -> str:
+    """Mettre en minuscules, retirer les accents et la ponctuation."""
+    if not isinstance(texte, str):
+        return ""
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", texte).strip()
+
+
+def listing_tokens(titre, images, n=4) -> set:
+    """
+    Construit l'ensemble de jetons d'une annonce.
+
+    Paramètres:
+    - titre : titre de l'annonce.
+    - images : liste des URLs d'images (ou sa représentation texte dans le CSV).
+    - n : taille des n-grammes de caractères du titre.
+    """
+    titre = normalize_text(titre)
+    jetons = {"t:" + titre[i:i + n] for i in range(max(len(titre) - n + 1, 0))}
+    # Identifiant de l'image = nom du fichier sans le suffixe de taille (_ptw0, ...)
+    for nom in re.findall(r"([\w-]+?)(?:_[a-z]+\d*)?\.(?:jpe?g|png|webp|gif)", str(images or ""), re.IGNORECASE):
+        jetons.add("i:" + nom.lower())
+    return jetons
+
+
+def minhash_signatures(ensembles: list) -> np.ndarray:
+    """
+    Calcule les signatures MinHash d'une liste d'ensembles de jetons.
+
+    Retourne:
+    - tableau (n, NB_PERMUTATIONS) de uint64 ; une ligne vide vaut _PREMIER partout.
+    """
+    n = len(ensembles)
+    signatures = np.full((n, NB_PERMUTATIONS), _PREMIER, dtype=np.uint64)
+    for debut in range(0, n, TAILLE_BLOC):
+        bloc = ensembles[debut:debut + TAILLE_BLOC]
+        tailles = np.fromiter((len(e) for e in bloc), dtype=np.int64, count=len(bloc))
+        if tailles.sum() == 0:
+            continue
+        hachages = np.fromiter(
+            (zlib.crc32(j.encode()) for e in bloc for j in e), dtype=np.uint64, count=int(tailles.sum())
+        ) % _PREMIER
+        non_vides = np.flatnonzero(tailles)
+        offsets = np.concatenate(([0], np.cumsum(tailles)[:-1]))[non_vides]
+        for k in range(NB_PERMUTATIONS):
+            permutes = (_A[k] * hachages + _B[k]) % _PREMIER
+            signatures[debut + non_vides, k] = np.minimum.reduceat(permutes, offsets)
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray) -> np.ndarray:
+    """
+    Trouve les paires candidates par LSH (bandes de la signature).
+
+    Retourne:
+    - tableau (m, 2) d'indices (i < j), sans répétition.
+    """
+    n = len(signatures)
+    lignes = NB_PERMUTATIONS // NB_BANDES
+    vides = (signatures == _PREMIER).all(axis=1)
+    paires = []
+    for b in range(NB_BANDES):
+        bande = signatures[:, b * lignes:(b + 1) * lignes]
+        cles = (bande * _MULT_BANDES).sum(axis=1) + np.uint64(b)
+        ordre = np.argsort(cles, kind="stable")
+        ordre = ordre[~vides[ordre]]
+        cles_triees = cles[ordre]
+        # Taille du seau de chaque position (pour ignorer les seaux trop génériques)
+        _, taille_seau = np.unique(cles_triees, return_counts=True)
+        taille = np.repeat(taille_seau, taille_seau)
+        utile = taille <= TAILLE_SEAU_MAX
+        # Dans un tableau trié, les membres d'un seau sont contigus : on compare
+        # chaque position à ses voisines à distance d (d < taille du seau).
+        for d in range(1, min(int(taille_seau.max(initial=1)), TAILLE_SEAU_MAX)):
+            meme = (cles_triees[:-d] == cles_triees[d:]) & utile[:-d]
+            if not meme.any():
+                break
+            i, j = ordre[:-d][meme], ordre[d:][meme]
+            paires.append(np.column_stack((np.minimum(i, j), np.maximum(i, j))))
+    if not paires:
+        return np.empty((0, 2), dtype=np.int64)
+    paires = np.concatenate(paires).astype(np.int64)
+    codes = np.unique(paires[:, 0] * n + paires[:, 1])
+    return np.column_stack((codes // n, codes % n))
+
+
+def _connected_components(n: int, paires: np.ndarray) -> np.ndarray:
+    """Étiquette chaque annonce par le plus petit indice de son groupe (propagation vectorisée)."""
+    etiquettes = np.arange(n)
+    if len(paires) == 0:
+        return etiquettes
+    i, j = paires[:, 0], paires[:, 1]
+    while True:
+        mini = np.minimum(etiquettes[i], etiquettes[j])
+        avant = etiquettes.copy()
+        np.minimum.at(etiquettes, i, mini)
+        np.minimum.at(etiquettes, j, mini)
+        etiquettes = etiquettes[etiquettes]  # compression des chemins
+        if np.array_equal(avant, etiquettes):
+            return etiquettes
+
+
+def find_duplicates(df: pd.DataFrame) -> np.ndarray:
+    """
+    Regroupe les quasi-doublons.
+
+    Paramètres:
+    - df : DataFrame nettoyé (titre, images_page, type, ville, surface, prix).
+
+    Retourne:
+    - tableau des identifiants de groupe (position de la première annonce du groupe).
+    """
+    ensembles = [listing_tokens(t, i) for t, i in zip(df["titre"], df["images_page"])]
+    signatures = minhash_signatures(ensembles)
+    paires = candidate_pairs(signatures)
+    i, j = paires[:, 0], paires[:, 1]
+
+    # Vérification des candidats : similarité estimée + attributs du bien
+    similarite = (signatures[i] == signatures[j]).mean(axis=1)
+    surface = df["surface"].to_numpy(dtype=float)
+    prix = df["prix"].to_numpy(dtype=float)
+    type_bien = df["type"].astype(str).to_numpy()
+    ville = df["ville"].astype(str).str.lower().to_numpy()
+    valides = (
+        (similarite >= SEUIL_JACCARD)
+        & (type_bien[i] == type_bien[j])
+        & (ville[i] == ville[j])
+        & (np.abs(surface[i] - surface[j]) <= ECART_SURFACE_MAX * np.maximum(surface[i], surface[j]))
+        & (np.abs(prix[i] - prix[j]) <= ECART_PRIX_MAX * np.maximum(prix[i], prix[j]))
+    )
+    if "agence" in df:
+        # Une même agence qui publie deux annonces proches a en général deux biens
+        # distincts (titres génériques) : on exige alors une similarité quasi totale.
+        agence = df["agence"].astype(str).to_numpy()
+        valides &= (agence[i] != agence[j]) | (similarite >= SEUIL_MEME_AGENCE)
+    # Deux annonces illustrées sans aucune photo commune sont deux biens distincts, même
+    # sous un titre identique (« Maison 83m² à paris ») : une republication reprend les photos
+    paires = paires[valides]
+    photos = {k: {jeton for jeton in ensembles[k] if jeton.startswith("i:")} for k in np.unique(paires)}
+    distinctes = np.fromiter(
+        (bool(photos[a]) and bool(photos[b]) and not (photos[a] & photos[b]) for a, b in paires),
+        dtype=bool, count=len(paires),
+    )
+    return _connected_components(len(df), paires[~distinctes])
+
+
+def deduplicate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fusionne chaque groupe de quasi-doublons en une annonce canonique.
+
+    L'annonce conservée est celle qui a le plus de photos ; la colonne
+    `nb_doublons` indique combien d'annonces ont été fusionnées avec elle.
+    """
+    if df.empty:
+        return df.assign(nb_doublons=0)
+    df = df.reset_index(drop=True)
+    groupes = find_duplicates(df)
+    nb_images = df["images_page"].astype(str).str.count(r"https?://")
+    ordre = pd.DataFrame({"groupe": groupes, "nb_images": -nb_images}).sort_values(["groupe", "nb_images"], kind="stable")
+    canoniques = ordre.drop_duplicates("groupe").index
+    tailles = pd.Series(groupes).value_counts()
+    resultat = df.loc[canoniques.sort_values()].copy()
+    resultat["nb_doublons"] = tailles.reindex(groupes[resultat.index]).to_numpy() - 1
+    return resultat.reset_index(drop=True)
+
+
+# =========================
+# Évaluation
+# =========================
+def pair_scores(groupes_predits, groupes_reels) -> dict:
+    """
+    Compare deux regroupements paire par paire.
+
+    Retourne:
+    - dict avec precision, recall et le nombre de paires prédites / attendues.
+    """
+    def paires(groupes):
+        serie = pd.Series(np.arange(len(groupes))).groupby(np.asarray(groupes))
+        return {(a, b) for membres in serie.groups.values() if len(membres) > 1
+                for a in membres for b in membres if a < b}
+
+    predites, attendues = paires(groupes_predits), paires(groupes_reels)
+    vrais_positifs = len(predites & attendues)
+    return {
+        "precision": vrais_positifs / len(predites) if predites else 1.0,
+        "recall": vrais_positifs / len(attendues) if attendues else 1.0,
+        "paires_predites": len(predites),
+        "paires_attendues": len(attendues),
+    }
+
+
+def evaluate(df: pd.DataFrame, labels: pd.DataFrame) -> dict:
+    """
+    Mesure la précision et le rappel sur un échantillon étiqueté.
+
+    Paramètres:
+    - df : DataFrame nettoyé contenant au moins les annonces étiquetées.
+    - labels : DataFrame (lien, groupe) ; deux annonces du même groupe sont des doublons.
+
+    Retourne:
+    - dict avec precision, recall et le nombre de paires prédites / attendues.
+    """
+    echantillon = df[df["lien"].isin(labels["lien"])].reset_index(drop=True)
+    groupes_reels = echantillon["lien"].map(labels.set_index("lien")["groupe"]).to_numpy()
+    return pair_scores(find_duplicates(echantillon), groupes_reels)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python dedup.py <cleaned_csv_file> [<labels_csv_file>]")
+        sys.exit(1)
+    df = pd.read_csv(sys.argv[1])
+
+    debut = time.perf_counter()
+    dedup = deduplicate(df)
+    duree = time.perf_counter() - debut
+    print(f"📦 {len(df)} annonces → {len(dedup)} après fusion de {len(df) - len(dedup)} doublons")
+    print(f"⏱️ {duree:.2f} s ({len(df) / duree:,.0f} annonces/s)")
+
+    if len(sys.argv) == 3:
+        scores = evaluate(df, pd.read_csv(sys.argv[2]))
+        print(f"🎯 Précision : {scores['precision']:.3f} — Rappel : {scores['recall']:.3f} "
+              f"({scores['paires_predites']} paires prédites, {scores['paires_attendues']} attendues)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import io
+import zipfile
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from dataset import expand
+
+
+# =========================
+# Export de la sélection (CSV, Parquet, XLSX)
+# =========================
+# Les lignes retenues sont lues par blocs de CHUNK_ROWS, rendues à leur forme
+# d'origine (dataset.expand), réduites aux colonnes demandées et encodées bloc par bloc : les générateurs ci-dessous produisent
+# le fichier morceau par morceau (bytes), sans jamais matérialiser toute la
+# sélection. La mémoire utilisée dépend de la taille d'un bloc, pas du nombre
+# de lignes exportées.
+
+CHUNK_ROWS = 10_000
+# Format → (type MIME, extension) ; Parquet seulement si pyarrow est installé
+# (pyarrow n'est importé qu'au premier export Parquet, pas au démarrage du tableau de bord)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+}
+if find_spec("pyarrow") is None:
+    del EXPORT_FORMATS["parquet"]
+XLSX_MAX_CELL = 32_767  # longueur maximale d'une cellule Excel
+
+
+class _Sink(io.RawIOBase):
+    """Flux d'écriture non repositionnable dont on récupère le contenu au fil de l'eau."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        contenu = b"".join(self.parts)
+        self.parts = []
+        return contenu
+
+
+def iter_chunks(df: pd.DataFrame, rows: np.ndarray, columns: list, chunk_rows: int = CHUNK_ROWS):
+    """Blocs successifs des lignes `rows`, sous leur forme d'origine et réduits aux colonnes `columns`."""
+    for debut in range(0, len(rows), chunk_rows):
+        yield expand(df.iloc[rows[debut:debut + chunk_rows]])[columns]
+
+
+def iter_csv(df, rows, columns, chunk_rows: int = CHUNK_ROWS):
+    """En-tête puis un morceau de CSV par bloc (même format que annonces_propres.csv)."""
+    yield expand(df.iloc[:0])[columns].to_csv(index=False).encode("utf-8")
+    for bloc in iter_chunks(df, rows, columns, chunk_rows):
+        yield bloc.to_csv(index=False, header=False).encode("utf-8")
+
+
+def parquet_schema(df: pd.DataFrame, columns: list):
+    """Schéma fixe pour tous les blocs (un bloc dont une colonne texte est vide ne doit pas la typer en null)."""
+    import pyarrow as pa
+    champs = []
+    vide = expand(df.iloc[:0])
+    for col in columns:
+        dtype = vide[col].dtype
+        type_arrow = pa.string() if dtype == object else pa.from_numpy_dtype(dtype)
+        champs.append(pa.field(col, type_arrow))
+    return pa.schema(champs)
+
+
+def iter_parquet(df, rows, columns, chunk_rows: int = CHUNK_ROWS):
+    """Un groupe de lignes Parquet par bloc."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = parquet_schema(df, columns)
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for bloc in iter_chunks(df, rows, columns, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(bloc, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+# --- XLSX (SpreadsheetML minimal, écrit en flux dans l'archive zip) ---
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Annonces" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+# Caractères de contrôle interdits dans le XML
+_XML_INVALIDE = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+def _xml_text(serie: pd.Series) -> pd.Series:
+    return (
+        serie.astype(str).str.slice(0, XLSX_MAX_CELL)
+        .str.replace(_XML_INVALIDE, "", regex=True)
+        .str.replace("&", "&amp;", regex=False)
+        .str.replace("<", "&lt;", regex=False)
+        .str.replace(">", "&gt;", regex=False)
+    )
+
+
+def _xlsx_cells(serie: pd.Series) -> pd.Series:
+    """Cellules <c> d'une colonne (nombres, booléens ou texte en ligne ; vide si manquant)."""
+    manquant = serie.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(serie):
+        cellules = np.where(serie.to_numpy(), '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>')
+    elif pd.api.types.is_numeric_dtype(serie):
+        cellules = ("<c><v>" + serie.astype(str) + "</v></c>").to_numpy()
+    else:
+        cellules = ('<c t="inlineStr"><is><t xml:space="preserve">' + _xml_text(serie) + "</t></is></c>").to_numpy()
+    return pd.Series(np.where(manquant, "<c/>", cellules), index=serie.index)
+
+
+def iter_xlsx(df, rows, columns, chunk_rows: int = CHUNK_ROWS):
+    """Classeur d'une feuille : une ligne d'en-tête puis les annonces, en texte en ligne (sans table partagée)."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in XLSX_PARTS.items():
+            archive.writestr(nom, contenu)
+        yield sink.drain()
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as feuille:
+            entete = "".join(
+                f'<c t="inlineStr"><is><t>{c}</t></is></c>' for c in _xml_text(pd.Series(columns, dtype=object))
+            )
+            feuille.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                f"<row>{entete}</row>"
+            ).encode("utf-8"))
+            for bloc in iter_chunks(df, rows, columns, chunk_rows):
+                lignes = pd.Series("<row>", index=bloc.index)
+                for col in columns:
+                    lignes = lignes + _xlsx_cells(bloc[col])
+                feuille.write(("</row>".join(lignes) + "</row>").encode("utf-8"))
+                yield sink.drain()
+            feuille.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+EXPORTERS = {"csv": iter_csv, "parquet": iter_parquet, "xlsx": iter_xlsx}
+
+
+def iter_export(df: pd.DataFrame, rows: np.ndarray, columns: list, fmt: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Fichier d'export produit morceau par morceau.
+
+    Paramètres:
+    - df : DataFrame complet des annonces, éventuellement compact (non modifié).
+    - rows : positions des lignes à exporter, dans l'ordre.
+    - columns : colonnes à exporter.
+    - fmt : "csv", "parquet" ou "xlsx".
+
+    Retourne:
+    - générateur de bytes (morceaux successifs du fichier, éventuellement vides).
+
+    Lève:
+    - ValueError, avant tout envoi, si le format est inconnu ou indisponible
+      (Parquet sans pyarrow) ou si les colonnes sont invalides.
+    """
+    if fmt == "parquet" and fmt not in EXPORT_FORMATS:
+        raise ValueError("pyarrow n'est pas installé : export Parquet indisponible")
+    if fmt not in EXPORTERS:
+        raise ValueError(f"format d'export inconnu : {fmt}")
+    inconnues = [c for c in columns if c not in expand(df.iloc[:0]).columns]
+    if inconnues or not columns:
+        raise ValueError(f"colonnes inconnues : {', '.join(inconnues)}" if inconnues else "aucune colonne à exporter")
+    return EXPORTERS[fmt](df, rows, list(columns), chunk_rows)
+
+
+def write_export(path, df: pd.DataFrame, rows: np.ndarray, columns: list, fmt: str) -> int:
+    """Écrit l'export dans un fichier ; retourne sa taille en octets."""
+    taille = 0
+    with open(path, "wb") as f:
+        for morceau in iter_export(df, rows, columns, fmt):
+            f.write(morceau)
+            taille += len(morceau)
+    return taille
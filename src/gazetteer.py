@@ -0,0 +1,213 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from history import departement_from_code_postal
+from search import fold_series
+
+
+# =========================
+# Référentiel des communes (hors ligne)
+# =========================
+# Table code postal → commune (code INSEE, nom officiel, coordonnées du centre,
+# département, région), construite une fois à partir de l'export des communes
+# de geo.api.gouv.fr (data/communes.csv.gz, téléchargé puis commité par le
+# workflow s'il est absent). Le nettoyage lui-même ne fait aucun appel réseau :
+# sans la table, les annonces ne sont simplement pas géocodées.
+#
+# La jointure est vectorisée : les couples (ville, code postal) distincts des
+# annonces sont numérotés, chaque nom distinct n'est normalisé qu'une fois,
+# puis les couples sont cherchés dans des index de hachage sur des clés
+# entières (pd.Index.get_indexer), dans cet ordre :
+# 1. code postal + nom normalisé (sans accents ni casse, « St » → « saint ») ;
+# 2. code postal seul, s'il ne dessert qu'une commune (nom mal orthographié) ;
+# 3. département + nom normalisé, s'il est unique (code CEDEX ou erroné).
+# Les villes retrouvées prennent le nom officiel ; les autres, la graphie la
+# plus fréquente (mise en forme) parmi celles qui se normalisent pareil.
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "communes.csv.gz"
+GAZETTEER_COLUMNS = ["code_postal", "code_insee", "nom", "latitude", "longitude", "departement", "region"]
+GEO_COLUMNS = ["code_insee", "latitude", "longitude", "departement", "region"]
+SOURCE_URL = "https://geo.api.gouv.fr/communes?fields=nom,code,codesPostaux,centre,codeDepartement,region&format=json"
+# Mots gardés en minuscules dans un nom de commune, sauf en première position
+PARTICULES = r"Sur|Sous|Lès|Les|Lez|Le|La|L|De|Du|Des|D|En|Et|Aux|Au|À"
+
+
+def normalize_names(noms: pd.Series) -> pd.Series:
+    """Clé de comparaison des noms de ville (« St-Étienne » → « saint etienne »)."""
+    cles = fold_series(noms).str.strip()
+    return cles.str.replace(r"\bst\b", "saint", regex=True).str.replace(r"\bste\b", "sainte", regex=True)
+
+
+def format_names(noms: pd.Series) -> pd.Series:
+    """Mise en forme des noms saisis (« CHAMPIGNY-SUR-MARNE » → « Champigny-sur-Marne »)."""
+    noms = noms.astype("string").str.strip().str.replace(r"\s+", " ", regex=True).str.lower()
+    noms = noms.str.replace(r"(^|[\s\-'’])(\w)", lambda m: m.group(1) + m.group(2).upper(), regex=True)
+    return noms.str.replace(rf"(?<=[\s\-'’])({PARTICULES})(?=[\s\-'’])", lambda m: m.group(1).lower(), regex=True)
+
+
+def _key_index(cles: np.ndarray, positions: np.ndarray, keep) -> pd.Series:
+    """
+    Index de hachage clé entière → position dans la table.
+
+    Paramètres:
+    - keep : "first" garde la première ligne d'une clé répétée, False écarte les clés ambiguës.
+    """
+    index = pd.Series(positions, index=cles)
+    return index[~index.index.duplicated(keep="first") if keep == "first" else ~index.index.duplicated(keep=False)]
+
+
+def _get(index: pd.Series, cles: np.ndarray) -> np.ndarray:
+    """Positions des clés dans la table (-1 : absente)."""
+    trouvees = index.index.get_indexer(cles)
+    return np.where(trouvees >= 0, index.to_numpy()[trouvees], -1)
+
+
+class Gazetteer:
+    """
+    Référentiel des communes et ses index de jointure.
+
+    Paramètres:
+    - table : une ligne par couple (code postal, commune), colonnes GAZETTEER_COLUMNS.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table.reset_index(drop=True)
+        # Noms normalisés, codes postaux et départements numérotés : les index portent sur des entiers
+        cles = normalize_names(self.table["nom"])
+        self.names = pd.Index(cles.unique())
+        self.postcodes = pd.Index(self.table["code_postal"].unique())
+        self.departements = pd.Index(self.table["departement"].unique())
+        nom = self.names.get_indexer(cles).astype(np.int64)
+        code = self.postcodes.get_indexer(self.table["code_postal"]).astype(np.int64)
+        departement = self.departements.get_indexer(self.table["departement"]).astype(np.int64)
+        positions = np.arange(len(self.table))
+        self._by_postcode_name = _key_index(code * len(self.names) + nom, positions, keep="first")
+        self._by_postcode = _key_index(code, positions, keep=False)
+        # Une ligne par commune : un nom n'est ambigu que s'il désigne plusieurs communes du département
+        communes = ~self.table["code_insee"].duplicated().to_numpy()
+        self._by_departement_name = _key_index(
+            (departement * len(self.names) + nom)[communes], positions[communes], keep=False
+        )
+
+    @classmethod
+    def build(cls, communes: list) -> "Gazetteer":
+        """Construit le référentiel à partir de l'export JSON de geo.api.gouv.fr (voir SOURCE_URL)."""
+        lignes = []
+        for commune in communes:
+            lon, lat = (commune.get("centre") or {}).get("coordinates", (None, None))
+            region = (commune.get("region") or {}).get("nom")
+            for code_postal in commune.get("codesPostaux", []):
+                lignes.append((code_postal, commune["code"], commune["nom"], lat, lon, commune.get("codeDepartement"), region))
+        table = pd.DataFrame(lignes, columns=GAZETTEER_COLUMNS)
+        table = table.drop_duplicates(["code_postal", "code_insee"]).sort_values(["code_postal", "code_insee"])
+        return cls(table)
+
+    def save(self, path=GAZETTEER_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.table.to_csv(path, index=False, encoding="utf-8", float_format="%.5f")
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH) -> "Gazetteer | None":
+        """Référentiel livré avec le dépôt (None s'il n'a pas encore été construit)."""
+        if not Path(path).exists():
+            return None
+        return cls(pd.read_csv(path, dtype={"code_postal": str, "code_insee": str, "departement": str}))
+
+    def lookup(self, villes: pd.Series, codes_postaux: pd.Series) -> np.ndarray:
+        """
+        Cherche chaque couple (ville, code postal) dans le référentiel.
+
+        Retourne:
+        - positions dans `table` (-1 : commune non retrouvée).
+        """
+        # Normalisation et recherche des vocabulaires : une fois par valeur distincte
+        noms, distincts = pd.factorize(villes)
+        nom = np.append(self.names.get_indexer(normalize_names(pd.Series(distincts))), -1)[noms].astype(np.int64)
+        postaux, distincts = pd.factorize(codes_postaux)
+        distincts = pd.Series(distincts, dtype="string").str.zfill(5)
+        code = np.append(self.postcodes.get_indexer(distincts), -1)[postaux].astype(np.int64)
+        departements = self.departements.get_indexer(departement_from_code_postal(distincts))
+        departement = np.append(departements, -1)[postaux].astype(np.int64)
+
+        positions = np.where((code >= 0) & (nom >= 0), _get(self._by_postcode_name, code * len(self.names) + nom), -1)
+        reste = (positions < 0) & (code >= 0)
+        positions[reste] = _get(self._by_postcode, code[reste])
+        reste = (positions < 0) & (departement >= 0) & (nom >= 0)
+        positions[reste] = _get(self._by_departement_name, departement[reste] * len(self.names) + nom[reste])
+        return positions
+
+
+def geocode(df: pd.DataFrame, gazetteer: Gazetteer | None) -> pd.DataFrame:
+    """
+    Normalise les villes et ajoute les colonnes GEO_COLUMNS.
+
+    Paramètres:
+    - df : annonces nettoyées (colonnes ville et code_postal).
+    - gazetteer : référentiel des communes (None : noms normalisés, département
+      déduit du code postal, sans code INSEE ni coordonnées).
+
+    Retourne:
+    - df avec ville au nom officiel (ou à la graphie dominante) et GEO_COLUMNS.
+    """
+    codes_villes, villes = pd.factorize(df["ville"])
+    codes_postaux, postaux = pd.factorize(df["code_postal"].astype("string"))
+
+    # Un seul traitement par couple (ville, code postal) distinct
+    largeur = len(postaux) + 1
+    codes, couples = pd.factorize((codes_villes + 1).astype(np.int64) * largeur + codes_postaux + 1)
+    couple_ville, couple_code = couples // largeur - 1, couples % largeur - 1
+    villes = pd.Series(np.append(np.asarray(villes, dtype=object), None))
+    postaux = pd.Series(np.append(np.asarray(postaux, dtype=object), None), dtype="string").str.zfill(5)
+    couples_villes, couples_codes = villes.take(couple_ville).reset_index(drop=True), postaux.take(couple_code).reset_index(drop=True)
+    positions = np.full(len(couples), -1)
+    if gazetteer is not None:
+        positions = gazetteer.lookup(couples_villes, couples_codes)
+    trouves = positions >= 0
+
+    # Graphie dominante des villes non retrouvées, par nom normalisé (mises en forme seules)
+    restantes = ~trouves & (couple_ville >= 0)
+    graphies = pd.DataFrame({"ville": couple_ville[restantes], "n": np.bincount(codes, minlength=len(couples))[restantes]})
+    distinctes = villes.take(np.unique(graphies["ville"]))
+    graphies["cle"] = graphies["ville"].map(normalize_names(distinctes))
+    graphies["nom"] = graphies["ville"].map(format_names(distinctes))
+    totaux = graphies.groupby(["cle", "nom"])["n"].sum().reset_index()
+    dominante = totaux.sort_values("n", ascending=False).drop_duplicates("cle").set_index("cle")["nom"]
+    noms = pd.Series(pd.NA, index=range(len(couples)), dtype=object)
+    noms[restantes] = graphies["cle"].map(dominante).to_numpy()
+
+    departements = departement_from_code_postal(couples_codes.fillna("")).where(couples_codes.notna())
+    resultat = pd.DataFrame({"ville": noms, "departement": departements})
+    resultat = resultat.assign(**{col: pd.NA for col in GEO_COLUMNS if col != "departement"})
+    if gazetteer is not None and trouves.any():
+        table = gazetteer.table.iloc[positions[trouves]]
+        resultat.loc[trouves, "ville"] = table["nom"].to_numpy()
+        for col in GEO_COLUMNS:
+            resultat.loc[trouves, col] = table[col].to_numpy()
+
+    # Retour aux annonces
+    for col in ["latitude", "longitude"]:
+        resultat[col] = pd.to_numeric(resultat[col])
+    resultat = resultat.iloc[codes].set_index(df.index)
+    return df.assign(ville=resultat["ville"].astype(object), **{col: resultat[col] for col in GEO_COLUMNS})
+
+
+# =========================
+# Main
+# =========================
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python gazetteer.py <communes.json>")
+        print(f"  (export de {SOURCE_URL})")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        gazetteer = Gazetteer.build(json.load(f))
+    gazetteer.save()
+    print(f"✅ {len(gazetteer.table)} couples (code postal, commune) écrits dans '{GAZETTEER_PATH}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import pandas as pd
+import sys
+from datetime import date
+
+
+# =========================
+# Historique des annonces
+# =========================
+# L'historique est stocké en "run-length encoding" : une ligne par période
+# pendant laquelle le prix d'une annonce n'a pas changé (debut → fin).
+# Un instantané quotidien sans changement de prix ne fait que repousser la
+# date de fin de la dernière période, il ne coûte donc aucune ligne.
+# Une annonce absente d'un instantané clôt sa période : si elle revient plus
+# tard, même au même prix, elle ouvre une nouvelle période (pas de trou comblé).
+COLONNES_HISTORIQUE = ["id_annonce", "type", "ville", "code_postal", "surface", "prix", "debut", "fin"]
+COLONNES_AGREGATS = ["date", "niveau", "cle", "prix_m2_median", "nb_annonces"]
+
+
+def extract_id(liens: pd.Series) -> pd.Series:
+    """Extraire l'identifiant de l'annonce depuis son lien ("...immobilier-23453778-vente-...")."""
+    return liens.astype("string").str.extract(r"immobilier-(\d+)", expand=False)
+
+
+def departement_from_code_postal(codes: pd.Series) -> pd.Series:
+    """Déduire le département depuis le code postal (gère la Corse et l'outre-mer)."""
+    codes = codes.astype("string").str.zfill(5)
+    dep = codes.str[:2]
+    outre_mer = dep.isin(["97", "98"])
+    dep = dep.mask(outre_mer, codes.str[:3])
+    corse = dep == "20"
+    dep = dep.mask(corse & (codes < "20200"), "2A")
+    dep = dep.mask(corse & (codes >= "20200"), "2B")
+    return dep
+
+
+def load_history(path: str) -> pd.DataFrame:
+    """Charger l'historique existant (vide si le fichier n'existe pas encore)."""
+    try:
+        return pd.read_csv(path, dtype={"id_annonce": str, "code_postal": str, "debut": str, "fin": str})
+    except FileNotFoundError:
+        return pd.DataFrame(columns=COLONNES_HISTORIQUE)
+
+
+def update_history(historique: pd.DataFrame, snapshot: pd.DataFrame, jour: str, releve_prec: str = None) -> pd.DataFrame:
+    """
+    Intègre l'instantané du jour dans l'historique.
+
+    Paramètres:
+    - historique : périodes existantes (une ligne par période de prix constant).
+    - snapshot : DataFrame nettoyé du jour (issu de clean.py).
+    - jour : date de l'instantané au format ISO (YYYY-MM-DD).
+    - releve_prec : date du relevé précédent (par défaut, la dernière date de
+      début ou de fin de période antérieure à jour).
+
+    Retourne:
+    - L'historique mis à jour : les annonces au prix inchangé et présentes au
+      relevé précédent voient leur date de fin repoussée ; les nouvelles
+      annonces, les changements de prix et les retours après une absence
+      ouvrent une nouvelle période.
+    """
+    snap = snapshot.assign(id_annonce=extract_id(snapshot["lien"]))
+    snap = snap.dropna(subset=["id_annonce", "prix"]).drop_duplicates("id_annonce")
+    snap = snap[["id_annonce", "type", "ville", "code_postal", "surface", "prix"]]
+
+    historique = historique.reset_index(drop=True)
+    dernieres = (
+        historique.sort_values(["id_annonce", "debut"])
+        .drop_duplicates("id_annonce", keep="last")[["id_annonce", "prix", "debut", "fin"]]
+        .rename(columns={"prix": "prix_prec", "debut": "debut_prec", "fin": "fin_prec"})
+        .rename_axis("ligne")
+        .reset_index()
+    )
+    fusion = snap.merge(dernieres, on="id_annonce", how="left")
+
+    # Dernier relevé avant celui du jour : seules les périodes encore ouvertes à cette date
+    # (ou au jour même, ré-exécution) sont prolongées ; les autres sont closes par l'absence
+    if releve_prec is None:
+        dates = pd.concat([historique["debut"], historique["fin"]])
+        anterieures = dates[dates < jour]
+        releve_prec = anterieures.max() if not anterieures.empty else None
+    en_cours = fusion["fin_prec"].isin([jour, releve_prec])
+
+    # Prix inchangé et annonce présente au relevé précédent → on prolonge la période en cours
+    inchange = (fusion["prix"] == fusion["prix_prec"]) & en_cours
+    historique.loc[fusion.loc[inchange, "ligne"].astype(int), "fin"] = jour
+
+    # Nouveau prix le jour même de l'ouverture de la période → on corrige le prix
+    meme_jour = ~inchange & (fusion["debut_prec"] == jour)
+    historique.loc[fusion.loc[meme_jour, "ligne"].astype(int), "prix"] = fusion.loc[meme_jour, "prix"].values
+
+    # Nouveau prix à la ré-exécution d'un jour qui avait prolongé la période → elle s'arrête
+    # au relevé précédent, la nouvelle période commence aujourd'hui (pas de chevauchement)
+    prolongee = ~inchange & ~meme_jour & (fusion["fin_prec"] == jour)
+    historique.loc[fusion.loc[prolongee, "ligne"].astype(int), "fin"] = releve_prec
+
+    # Nouvelle annonce, changement de prix ou retour après une absence → nouvelle période
+    nouvelles = fusion.loc[~inchange & ~meme_jour, snap.columns].assign(debut=jour, fin=jour)
+
+    if historique.empty:
+        return nouvelles.reset_index(drop=True)[COLONNES_HISTORIQUE]
+    return pd.concat([historique, nouvelles], ignore_index=True)[COLONNES_HISTORIQUE]
+
+
+# =========================
+# Agrégats quotidiens
+# =========================
+def compute_daily_rollups(snapshot: pd.DataFrame, jour: str) -> pd.DataFrame:
+    """Calcule la médiane du prix au m² du jour par ville et par département."""
+    snap = snapshot.dropna(subset=["prix_m2"])
+    snap = snap.assign(departement=departement_from_code_postal(snap["code_postal"]))
+    agregats = []
+    for niveau in ["ville", "departement"]:
+        agg = (
+            snap.dropna(subset=[niveau])
+            .groupby(niveau)["prix_m2"]
+            .agg(prix_m2_median="median", nb_annonces="size")
+            .rename_axis("cle")
+            .reset_index()
+        )
+        agg.insert(0, "niveau", niveau)
+        agregats.append(agg)
+    rollups = pd.concat(agregats, ignore_index=True)
+    rollups.insert(0, "date", jour)
+    rollups["prix_m2_median"] = rollups["prix_m2_median"].round(2)
+    return rollups[COLONNES_AGREGATS]
+
+
+def load_rollups(path: str) -> pd.DataFrame:
+    """Charger les agrégats quotidiens existants (vides si le fichier n'existe pas encore)."""
+    try:
+        return pd.read_csv(path, dtype={"date": str, "cle": str})
+    except FileNotFoundError:
+        return pd.DataFrame(columns=COLONNES_AGREGATS)
+
+
+def update_rollups(rollups: pd.DataFrame, nouveaux: pd.DataFrame, jour: str) -> pd.DataFrame:
+    """Remplace les agrégats du jour (ré-exécution idempotente) et conserve les autres."""
+    rollups = rollups[rollups["date"] != jour]
+    if rollups.empty:
+        return nouveaux.sort_values(["date", "niveau", "cle"])
+    return pd.concat([rollups, nouveaux], ignore_index=True).sort_values(["date", "niveau", "cle"])
+
+
+# =========================
+# Pipeline d'historisation
+# =========================
+def main():
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python history.py <cleaned_csv_file> <history_csv_file> <rollups_csv_file> [YYYY-MM-DD]")
+        sys.exit(1)
+    input_file, history_file, rollups_file = sys.argv[1:4]
+    jour = sys.argv[4] if len(sys.argv) == 5 else date.today().isoformat()
+
+    snapshot = pd.read_csv(input_file, dtype={"code_postal": str})
+
+    # Les agrégats ont une date par relevé : le relevé précédent est connu exactement
+    rollups = load_rollups(rollups_file)
+    anterieures = rollups.loc[rollups["date"] < jour, "date"]
+    releve_prec = anterieures.max() if not anterieures.empty else None
+
+    historique = update_history(load_history(history_file), snapshot, jour, releve_prec)
+    historique.to_csv(history_file, index=False, encoding="utf-8")
+
+    rollups = update_rollups(rollups, compute_daily_rollups(snapshot, jour), jour)
+    rollups.to_csv(rollups_file, index=False, encoding="utf-8")
+
+    print(f"✅ Historique mis à jour ({jour}) : {len(historique)} périodes, {len(rollups)} agrégats.")
+
+
+if __name__ == "__main__":
+    main()
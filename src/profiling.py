@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+
+# =========================
+# Profilage des reruns du tableau de bord
+# =========================
+# Chaque rerun de app.main() est découpé en étapes chronométrées. Les mesures
+# sont conservées dans la session (onglet de debug) et émises en JSON dans le
+# log "analyse_marche.profiling" pour suivre les régressions.
+
+# Budgets de latence par étape (ms) : une étape qui les dépasse est signalée
+BUDGETS_MS = {
+    "apply_custom_css": 50,
+    "load_data": 1500,
+    "sidebar_filters": 100,
+    "query": 150,
+    "render_summary": 50,
+    "render_data_table": 250,
+    "render_data_table.html": 100,
+    "render_data_table.thumbnails": 500,
+    "render_visualizations": 1000,
+    "plotly_chart": 600,
+    "render_rankings": 150,
+    "render_history": 500,
+    "total": 2500,
+}
+HISTORY_SIZE = 50
+
+logger = logging.getLogger("analyse_marche.profiling")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RerunProfiler:
+    """Chronomètre les étapes d'un rerun et mesure l'empreinte mémoire des DataFrames."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.memory = {}
+
+    def add(self, name: str, elapsed_ms: float):
+        # Une étape appelée plusieurs fois (ex : plotly_chart) est cumulée
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def track_memory(self, name: str, df):
+        self.memory[name] = df if isinstance(df, int) else int(df.memory_usage(deep=True).sum())
+
+    def finish(self) -> dict:
+        self.timings["total"] = (time.perf_counter() - self.started) * 1000
+        return {
+            "event": "rerun",
+            "timings_ms": {nom: round(ms, 2) for nom, ms in self.timings.items()},
+            "memory_bytes": self.memory,
+            "over_budget": [nom for nom, ms in self.timings.items() if ms > BUDGETS_MS.get(nom, float("inf"))],
+        }
+
+
+def start_rerun():
+    """Démarre le profilage d'un nouveau rerun pour la session courante."""
+    st.session_state["profiler"] = RerunProfiler()
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre le bloc sous le nom `name` (sans effet si aucun rerun n'est profilé)."""
+    profiler = st.session_state.get("profiler")
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.add(name, (time.perf_counter() - debut) * 1000)
+
+
+def track_memory(name: str, df):
+    """Enregistre l'empreinte mémoire (deep) d'un DataFrame, ou une taille en octets, pour le rerun courant."""
+    profiler = st.session_state.get("profiler")
+    if profiler is not None:
+        profiler.track_memory(name, df)
+
+
+def finish_rerun() -> dict | None:
+    """Clôt le rerun courant : log structuré + ajout à l'historique de la session."""
+    profiler = st.session_state.pop("profiler", None)
+    if profiler is None:
+        return None
+    record = profiler.finish()
+    if "profiling_history" not in st.session_state:
+        st.session_state.profiling_history = deque(maxlen=HISTORY_SIZE)
+    st.session_state.profiling_history.append(record)
+    logger.log(logging.WARNING if record["over_budget"] else logging.INFO, json.dumps(record, ensure_ascii=False))
+    return record
+
+
+def render_debug_panel(cache_stats: dict = None):
+    """
+    Affiche les temps par étape (dernier rerun et historique), l'empreinte mémoire
+    et, s'il est fourni, l'état du cache des résultats (query.ResultCache.stats()).
+    """
+    st.subheader("🛠️ Performances")
+    if cache_stats is not None:
+        render_cache_stats(cache_stats)
+    history = list(st.session_state.get("profiling_history", []))
+    if not history:
+        st.info("Aucun rerun profilé pour le moment.")
+        return
+
+    dernier = history[-1]
+    etapes = pd.DataFrame({"Étape": list(dernier["timings_ms"]), "Durée (ms)": list(dernier["timings_ms"].values())})
+    etapes["Budget (ms)"] = etapes["Étape"].map(BUDGETS_MS)
+    etapes["Statut"] = etapes.apply(
+        lambda row: "🔴" if pd.notna(row["Budget (ms)"]) and row["Durée (ms)"] > row["Budget (ms)"] else "🟢", axis=1
+    )
+    st.markdown("**⏱️ Dernier rerun**")
+    st.dataframe(etapes, hide_index=True, use_container_width=True)
+
+    st.markdown(f"**📈 Historique ({len(history)} reruns)**")
+    historique = pd.DataFrame([r["timings_ms"] for r in history])
+    resume = historique.describe(percentiles=[0.5, 0.95]).T[["50%", "95%", "max"]]
+    resume.columns = ["p50 (ms)", "p95 (ms)", "max (ms)"]
+    st.dataframe(resume.round(1), use_container_width=True)
+
+    if dernier["memory_bytes"]:
+        st.markdown("**🧠 Empreinte mémoire**")
+        memoire = pd.DataFrame(
+            {"Données": list(dernier["memory_bytes"]), "Mo": [b / 1e6 for b in dernier["memory_bytes"].values()]}
+        )
+        st.dataframe(memoire.round(2), hide_index=True, use_container_width=True)
+
+
+def render_cache_stats(stats: dict):
+    """Affiche le taux de hit et l'occupation du cache des résultats de filtres."""
+    st.markdown("**🗃️ Cache des résultats (toutes sessions)**")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Taux de hit", f"{stats['taux_hit']:.0%}")
+    col2.metric("Hits / misses", f"{stats['hits']} / {stats['misses']}")
+    col3.metric("Entrées", stats["entrees"], help=f"{stats['evictions']} évictions")
+    col4.metric("Mémoire", f"{stats['memoire_octets'] / 1e6:.1f} Mo")
+    if "query_cache_hit" in st.session_state:
+        st.caption("Dernier rerun : " + ("✅ servi par le cache" if st.session_state.query_cache_hit else "🔄 calculé"))
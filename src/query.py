@@ -0,0 +1,199 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from dataset import DECIMALS, Dataset
+from search import search_terms
+
+
+# =========================
+# Requêtes du tableau de bord
+# =========================
+# Calculs purs (sans Streamlit) derrière les filtres, les métriques, les
+# classements et les graphiques. Les résultats sont mis en cache entre les
+# sessions : des filtres identiques (même grande ville, même type, sliders par
+# défaut...) ne sont calculés qu'une fois par version du jeu de données.
+
+DPE_LETTRES = ["A", "B", "C", "D", "E", "F", "G"]
+
+# Taille du cache des résultats (LRU) : nombre d'entrées et mémoire estimée
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_filters(dataset: Dataset, filtres: dict) -> dict:
+    """
+    Forme canonique des filtres : listes triées, intervalles en nombres.
+
+    Paramètres:
+    - filtres : villes, types, options, prix (min, max), surface (min, max), recherche.
+    """
+    return {
+        "version": dataset.version,
+        "villes": sorted(filtres.get("villes") or []),
+        "types": sorted(filtres.get("types") or []),
+        "options": sorted(filtres.get("options") or []),
+        "prix": list(map(float, filtres.get("prix") or dataset.prix_bounds)),
+        "surface": list(map(float, filtres.get("surface") or dataset.surface_bounds)),
+        "recherche": search_terms(filtres.get("recherche")),
+    }
+
+
+def filters_key(dataset: Dataset, filtres: dict) -> str:
+    """Clé de cache : empreinte SHA-1 de la forme canonique des filtres."""
+    canonique = json.dumps(normalize_filters(dataset, filtres), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(canonique.encode("utf-8")).hexdigest()
+
+
+def summary(df: pd.DataFrame) -> dict:
+    """Métriques principales (les colonnes absentes sont ignorées)."""
+    resultat = {"nb_annonces": len(df)}
+    if "prix_m2" in df:
+        resultat["prix_m2_moyen"] = _as_float64(df["prix_m2"]).mean()
+    if "surface" in df:
+        resultat["surface_moyenne"] = _as_float64(df["surface"]).mean()
+    if "ville" in df:
+        resultat["nb_villes"] = df["ville"].nunique()
+    return resultat
+
+
+def rankings(df: pd.DataFrame) -> dict:
+    """
+    Classements des villes.
+
+    Retourne:
+    - dict avec "prix" (prix moyen/m² croissant) et "surface" (surface moyenne décroissante).
+    """
+    resultat = {}
+    if "ville" in df and "prix_m2" in df:
+        classement = _city_means(df, "prix_m2").sort_values(by="prix_m2", ascending=True)
+        classement.columns = ["Ville", "Prix moyen/m² (€)"]
+        resultat["prix"] = classement
+    if "ville" in df and "surface" in df:
+        classement = _city_means(df, "surface").sort_values(by="surface", ascending=False)
+        classement.columns = ["Ville", "Surface moyenne (m²)"]
+        resultat["surface"] = classement
+    return resultat
+
+
+def _as_float64(serie: pd.Series) -> pd.Series:
+    """Valeurs du CSV en float64 (celles du jeu compact, en float32, sont arrondies comme par expand())."""
+    if serie.dtype == np.float32:
+        return serie.astype(np.float64).round(DECIMALS)
+    return serie
+
+
+def _city_means(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    """Moyenne de `col` par ville présente dans la sélection (colonnes ville, col)."""
+    moyennes = _as_float64(df[col]).groupby(df["ville"], observed=True).mean().reset_index()
+    return moyennes.astype({"ville": object})
+
+
+def chart_data(df: pd.DataFrame) -> dict:
+    """Agrégats des graphiques par catégorie (répartition par ville, DPE, GES)."""
+    resultat = {}
+    if "ville" in df:
+        villes = df["ville"].value_counts()
+        # Colonne catégorielle : les villes absentes de la sélection sont comptées à 0
+        villes = villes[villes > 0].reset_index().astype({"ville": object})
+        villes.columns = ["Ville", "Nombre d'annonces"]
+        resultat["villes"] = villes
+    for col in ("dpe", "ges"):
+        if col in df:
+            comptes = df[col].value_counts().reindex(DPE_LETTRES).fillna(0).reset_index()
+            comptes.columns = [col.upper(), "Nombre d'annonces"]
+            resultat[col] = comptes
+    return resultat
+
+
+@dataclass(frozen=True)
+class QueryResult:
+    """Résultat d'une combinaison de filtres (partagé entre sessions, à ne pas modifier)."""
+
+    rows: np.ndarray
+    summary: dict
+    rankings: dict
+    charts: dict
+
+    @property
+    def nbytes(self) -> int:
+        """Mémoire estimée de l'entrée de cache."""
+        tables = [*self.rankings.values(), *self.charts.values()]
+        return int(self.rows.nbytes) + sum(int(t.memory_usage(deep=True).sum()) for t in tables)
+
+
+def compute(dataset: Dataset, filtres: dict) -> QueryResult:
+    """Applique les filtres et calcule tous les agrégats du tableau de bord."""
+    rows = dataset.select(**filtres)
+    rows.flags.writeable = False
+    df = dataset.view(rows)
+    return QueryResult(rows=rows, summary=summary(df), rankings=rankings(df), charts=chart_data(df))
+
+
+class ResultCache:
+    """
+    Cache LRU des résultats de filtres, partagé par toutes les sessions.
+
+    Borné en nombre d'entrées et en mémoire estimée ; vidé dès qu'une
+    nouvelle version du jeu de données est interrogée.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, dataset: Dataset, filtres: dict) -> tuple:
+        """
+        Résultat des filtres, calculé au besoin.
+
+        Retourne:
+        - (QueryResult, True si le résultat venait du cache)
+        """
+        cle = filters_key(dataset, filtres)
+        with self.lock:
+            if dataset.version != self.version:
+                self.entries.clear()
+                self.bytes = 0
+                self.version = dataset.version
+            resultat = self.entries.get(cle)
+            if resultat is not None:
+                self.entries.move_to_end(cle)
+                self.hits += 1
+                return resultat, True
+            self.misses += 1
+
+        # Calcul hors verrou : les autres sessions ne sont pas bloquées
+        resultat = compute(dataset, filtres)
+        with self.lock:
+            if dataset.version == self.version and cle not in self.entries:
+                self.entries[cle] = resultat
+                self.bytes += resultat.nbytes
+                while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                    _, ancien = self.entries.popitem(last=False)
+                    self.bytes -= ancien.nbytes
+                    self.evictions += 1
+        return resultat, False
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entrees": len(self.entries),
+                "memoire_octets": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "taux_hit": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,286 @@
+import logging
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlparse
+
+from dataset import Dataset
+from search import SearchIndex, index_path
+
+
+# =========================
+# Exécution locale du pipeline (scraping → nettoyage)
+# =========================
+# Alternative au workflow main.yml : le crawl puis clean.py sont lancés en
+# sous-processus par un thread de fond, une exécution à la fois (file
+# d'attente). La progression est lue au fil de leur sortie :
+# - scraping : statistiques périodiques de Scrapy (LogStats, toutes les
+#   LOGSTATS_INTERVAL secondes) → pages, annonces, pages/s ;
+# - nettoyage : lignes de clean.py → annonces lues, lignes/s par étape.
+# En fin d'exécution, le nouveau jeu (Dataset et ses index) est construit dans
+# le thread de fond et rattaché à l'exécution (`job.dataset`) : seule la
+# session qui l'a lancée le voit. Il n'est servi à toutes les sessions
+# qu'après promotion explicite (`promote`) : les fichiers sont alors remplacés
+# atomiquement dans le dossier des données (os.replace), puis `dataset` est
+# remplacé d'une seule affectation : un rerun en cours garde l'ancien jeu, le
+# suivant voit le nouveau.
+
+SRC_DIR = Path(__file__).resolve().parent
+WEBSCRAPING_DIR = SRC_DIR / "webscraping"
+CSV_PATH = "annonces_propres.csv"
+WORK_DIR = ".pipeline"  # sous-dossier des exécutions, dans le dossier des données
+LOGSTATS_INTERVAL = 2  # secondes entre deux relevés de progression du crawl
+LOG_LINES = 200  # dernières lignes de sortie gardées par exécution
+JOBS_KEPT = 5  # dossiers d'exécutions terminées conservés
+
+LOGSTATS = re.compile(r"Crawled (\d+) pages \(at (\d+) pages/min\), scraped (\d+) items \(at (\d+) items/min\)")
+# Statistiques finales du crawl (les derniers relevés LogStats peuvent dater de quelques secondes)
+FINAL_STATS = re.compile(r"'(response_received_count|item_scraped_count)': (\d+)")
+CLEAN_READ = re.compile(r"(\d+) annonces lues")
+CLEAN_RATE = re.compile(r"(\d+) annonces nettoyées .*\((\d+) lignes/s\)")
+
+ACTIVE_STATUSES = ("en attente", "scraping", "nettoyage", "chargement")
+# Hôtes que le spider peut crawler (allowed_domains de french_immobilier), sous-domaines compris
+ALLOWED_DOMAINS = ("etreproprio.com",)
+
+logger = logging.getLogger("analyse_marche.runner")
+
+
+class JobCancelled(Exception):
+    """Exécution annulée depuis l'interface."""
+
+
+@dataclass
+class Job:
+    """Une exécution du pipeline et sa progression (mise à jour par le thread de fond)."""
+
+    id: int
+    max_pages: int = 0
+    base_url: str = None
+    settings: dict = field(default_factory=dict)
+    status: str = "en attente"  # en attente, scraping, nettoyage, chargement, terminé, échec, annulé
+    pages: int = 0
+    items: int = 0
+    pages_per_s: float = 0.0
+    items_per_s: float = 0.0
+    rows: int = 0
+    rows_per_s: float = 0.0
+    started: float = None
+    finished: float = None
+    error: str = None
+    cancelled: bool = False
+    dataset: Dataset = None  # jeu produit, servi à la session qui a lancé l'exécution
+    log: deque = field(default_factory=lambda: deque(maxlen=LOG_LINES))
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class PipelineRunner:
+    """
+    File d'exécutions locales du pipeline, traitées une à une par un thread de fond.
+
+    Paramètres:
+    - data_dir : dossier où installer annonces_propres.csv et son index.
+    - python : interpréteur des sous-processus (Scrapy et clean.py).
+    - on_swap : appelé (sans argument) après le remplacement du jeu de données.
+    - allowed_domains : domaines acceptés pour base_url (sous-domaines compris).
+    """
+
+    def __init__(self, data_dir, python: str = sys.executable, on_swap=None, allowed_domains=ALLOWED_DOMAINS):
+        self.data_dir = Path(data_dir)
+        self.work_dir = self.data_dir / WORK_DIR
+        self.python = python
+        self.on_swap = on_swap
+        self.allowed_domains = tuple(allowed_domains)
+        self.dataset = None  # dernier jeu promu pour toutes les sessions (None : aucun)
+        self.generation = 0
+        self.jobs = []
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.process = None
+        self.worker = None
+
+    def submit(self, max_pages: int = 0, base_url: str = None, settings: dict = None) -> Job:
+        """
+        Ajoute une exécution à la file.
+
+        Paramètres:
+        - max_pages : arrêt du crawl après ce nombre de pages (0 : crawl complet).
+        - base_url : copie locale du site à crawler (par défaut le site réel) ;
+          son hôte doit appartenir à allowed_domains.
+        - settings : réglages Scrapy supplémentaires (-s CLE=valeur).
+
+        Lève:
+        - ValueError si l'hôte de base_url n'est pas autorisé.
+        """
+        if base_url:
+            hote = urlparse(base_url).hostname or ""
+            if urlparse(base_url).scheme not in ("http", "https") or not any(
+                hote == domaine or hote.endswith("." + domaine) for domaine in self.allowed_domains
+            ):
+                raise ValueError(f"site non autorisé : {base_url} (domaines acceptés : {', '.join(self.allowed_domains)})")
+        with self.lock:
+            job = Job(len(self.jobs) + 1, max_pages, base_url or None, dict(settings or {}))
+            self.jobs.append(job)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._work, name="pipeline-runner", daemon=True)
+                self.worker.start()
+        self.queue.put(job)
+        return job
+
+    def cancel(self, job: Job):
+        """Annule une exécution en attente, ou arrête celle en cours (sous-processus interrompu)."""
+        with self.lock:
+            job.cancelled = True
+            if job.status == "en attente":
+                job.status = "annulé"
+            elif self.process is not None and job.active:
+                # Tant que le verrou est tenu, _execute ne peut pas remettre process à None
+                self.process.terminate()
+
+    def promote(self, job: Job):
+        """
+        Installe le jeu d'une exécution terminée pour toutes les sessions :
+        annonces_propres.csv et son index remplacent ceux du dossier des données.
+
+        Lève:
+        - RuntimeError si l'exécution n'a pas (ou plus) de jeu à installer.
+        """
+        job_dir = self.work_dir / f"job-{job.id}"
+        csv = job_dir / CSV_PATH
+        with self.lock:
+            if job.status != "terminé" or job.dataset is None or not csv.exists():
+                raise RuntimeError(f"l'exécution {job.id} n'a pas de jeu à installer")
+            for fichier in (index_path(csv), csv):
+                os.replace(fichier, self.data_dir / fichier.name)
+            self.dataset = job.dataset
+            self.generation += 1
+        if self.on_swap is not None:
+            self.on_swap()
+        logger.info("exécution %d : %d annonces installées (version %s)", job.id, len(job.dataset), job.dataset.version[:12])
+
+    @property
+    def busy(self) -> bool:
+        return any(job.active for job in self.jobs)
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job.cancelled:
+                continue
+            job.started = time.time()
+            try:
+                self._run(job)
+                job.status = "terminé"
+            except JobCancelled:
+                job.status = "annulé"
+            except Exception as e:  # l'exécution échoue, le thread continue avec la suivante
+                logger.exception("échec de l'exécution %d", job.id)
+                job.status, job.error = "échec", str(e)
+            finally:
+                job.finished = time.time()
+                self._prune()
+
+    def _run(self, job: Job):
+        job_dir = self.work_dir / f"job-{job.id}"
+        shutil.rmtree(job_dir, ignore_errors=True)
+        job_dir.mkdir(parents=True)
+
+        # 1️⃣ Scraping (items ajoutés au fil du crawl dans <job>/items.jsonl)
+        commande = [
+            self.python, "-m", "scrapy", "crawl", "french_immobilier",
+            "-s", f"CHECKPOINT_DIR={job_dir}",
+            "-s", f"TELEMETRY_FILE={job_dir / 'telemetrie'}",
+            "-s", f"LOGSTATS_INTERVAL={LOGSTATS_INTERVAL}",
+        ]
+        if job.max_pages:
+            commande += ["-s", f"CLOSESPIDER_PAGECOUNT={job.max_pages}"]
+        if job.base_url:
+            commande += ["-a", f"base_url={job.base_url}"]
+        for cle, valeur in job.settings.items():
+            commande += ["-s", f"{cle}={valeur}"]
+        self._execute(job, "scraping", commande, WEBSCRAPING_DIR, self._scrape_progress)
+        items = job_dir / "items.jsonl"
+        if not items.exists() or items.stat().st_size == 0:
+            raise RuntimeError("aucune annonce collectée")
+
+        # 2️⃣ Nettoyage (CSV et index de recherche écrits dans le dossier de l'exécution)
+        csv = job_dir / CSV_PATH
+        self._execute(job, "nettoyage", [self.python, str(SRC_DIR / "clean.py"), str(items), str(csv)],
+                      SRC_DIR, self._clean_progress)
+
+        # 3️⃣ Chargement hors du tableau de bord (installation pour tous : promote)
+        job.status = "chargement"
+        dataset = Dataset.from_csv(csv.read_bytes(), SearchIndex.load(index_path(csv)))
+        with self.lock:
+            # Annulée pendant le chargement : le jeu n'est pas proposé
+            if job.cancelled:
+                raise JobCancelled()
+            job.dataset = dataset
+        logger.info("exécution %d : %d annonces chargées (version %s)", job.id, len(dataset), dataset.version[:12])
+
+    def _execute(self, job: Job, etape: str, commande: list, cwd: Path, progression):
+        """Lance un sous-processus, journalise et analyse sa sortie ligne par ligne."""
+        with self.lock:
+            if job.cancelled:
+                raise JobCancelled()
+            job.status = etape
+            self.process = subprocess.Popen(
+                commande, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            )
+        with open(self.work_dir / f"job-{job.id}" / f"{etape}.log", "w", encoding="utf-8") as log:
+            for ligne in self.process.stdout:
+                log.write(ligne)
+                job.log.append(ligne.rstrip())
+                progression(job, ligne)
+        code = self.process.wait()
+        with self.lock:
+            self.process = None
+        if job.cancelled:
+            raise JobCancelled()
+        if code != 0:
+            raise RuntimeError(f"{etape} : le processus s'est terminé avec le code {code}")
+
+    @staticmethod
+    def _scrape_progress(job: Job, ligne: str):
+        stats = LOGSTATS.search(ligne)
+        if stats:
+            pages, pages_min, items, items_min = (int(x) for x in stats.groups())
+            job.pages, job.items = pages, items
+            job.pages_per_s, job.items_per_s = pages_min / 60, items_min / 60
+        final = FINAL_STATS.search(ligne)
+        if final:
+            setattr(job, "pages" if final.group(1) == "response_received_count" else "items", int(final.group(2)))
+
+    @staticmethod
+    def _clean_progress(job: Job, ligne: str):
+        lues = CLEAN_READ.search(ligne)
+        if lues:
+            job.rows = int(lues.group(1))
+        debit = CLEAN_RATE.search(ligne)
+        if debit:
+            job.rows, job.rows_per_s = int(debit.group(1)), float(debit.group(2))
+
+    def _prune(self):
+        """Supprime les dossiers des exécutions terminées les plus anciennes."""
+        termines = [job for job in self.jobs if not job.active]
+        for job in termines[:-JOBS_KEPT]:
+            job.dataset = None
+            shutil.rmtree(self.work_dir / f"job-{job.id}", ignore_errors=True)
@@ -0,0 +1,153 @@
+import unicodedata
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# Recherche plein texte (titre et agence)
+# =========================
+# Index inversé construit au nettoyage (clean.py) et enregistré à côté du CSV :
+# - jetons sans accents ni majuscules → positions des annonces qui les
+#   contiennent (listes triées, stockées bout à bout avec leurs offsets) ;
+# - trigrammes → jetons qui les contiennent, pour trouver un mot partiel
+#   (« mer » → mer, merignac...) sans parcourir tout le vocabulaire.
+# Une recherche de plusieurs mots retient les annonces qui les contiennent
+# tous (logique ET), puis se combine aux autres filtres de Dataset.select().
+
+SEARCH_COLUMNS = ["titre", "agence"]
+MIN_TERM_LENGTH = 2  # les termes plus courts (« à », « t »...) sont ignorés
+
+
+def fold(texte: str) -> str:
+    """Minuscules sans accents, ponctuation remplacée par des espaces (« Vue-Mer à Sète » → « vue mer a sete »)."""
+    texte = unicodedata.normalize("NFKD", texte).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in texte).split())
+
+
+def fold_series(serie: pd.Series) -> pd.Series:
+    """fold() vectorisé sur une colonne de texte (valeurs manquantes → chaîne vide)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Une seule transformation par modalité
+        modalites = fold_series(pd.Series(serie.cat.categories, dtype=object)).to_numpy()
+        return pd.Series(np.append(modalites, "")[serie.cat.codes.to_numpy()], index=serie.index)
+    return (
+        serie.fillna("").astype(str)
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+    )
+
+
+def search_terms(recherche: str) -> list:
+    """Termes retenus d'une recherche, dédoublonnés et triés (forme canonique pour le cache)."""
+    return sorted({terme for terme in fold(recherche or "").split() if len(terme) >= MIN_TERM_LENGTH})
+
+
+def index_path(csv_path) -> Path:
+    """Fichier d'index associé à un CSV (annonces_propres.csv → annonces_propres.search.npz)."""
+    return Path(csv_path).with_suffix(".search.npz")
+
+
+def _csr(cles: np.ndarray, valeurs: np.ndarray, nb_cles: int) -> tuple:
+    """Regroupe des couples (clé, valeur) triés par clé en (offsets, valeurs)."""
+    return np.searchsorted(cles, np.arange(nb_cles + 1)).astype(np.int64), valeurs
+
+
+class SearchIndex:
+    """
+    Index inversé des annonces d'un CSV.
+
+    Paramètres:
+    - version : version du CSV indexé (Dataset.version).
+    - nb_rows : nombre d'annonces.
+    - vocab : jetons triés ; offsets/postings : positions des annonces par jeton.
+    - trigrams : trigrammes triés ; trigram_offsets/trigram_tokens : jetons par trigramme.
+    """
+
+    def __init__(self, version, nb_rows, vocab, offsets, postings, trigrams, trigram_offsets, trigram_tokens):
+        self.version = str(version)
+        self.nb_rows = int(nb_rows)
+        self.vocab = vocab
+        self.offsets = offsets
+        self.postings = postings
+        self.trigrams = trigrams
+        self.trigram_offsets = trigram_offsets
+        self.trigram_tokens = trigram_tokens
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, version: str = "") -> "SearchIndex":
+        """Construit l'index des colonnes SEARCH_COLUMNS présentes dans df."""
+        n = len(df)
+        textes = pd.Series("", index=pd.RangeIndex(n))
+        for col in SEARCH_COLUMNS:
+            if col in df.columns:
+                textes = textes + " " + fold_series(df[col]).to_numpy()
+        jetons = textes.str.split().explode().dropna()
+        jetons = jetons[jetons.str.len() > 0]
+        codes, vocab = pd.factorize(jetons, sort=True)
+        vocab = np.asarray(vocab, dtype=str)
+
+        # Couples (jeton, annonce) uniques, triés par jeton puis par annonce
+        couples = np.unique(codes.astype(np.int64) * max(n, 1) + jetons.index.to_numpy(dtype=np.int64))
+        offsets, postings = _csr(couples // max(n, 1), (couples % max(n, 1)).astype(np.int32), len(vocab))
+
+        # Trigrammes du vocabulaire (jetons d'au moins 3 caractères)
+        paires = {(jeton[i:i + 3], token_id) for token_id, jeton in enumerate(vocab) for i in range(len(jeton) - 2)}
+        paires = sorted(paires)
+        trigrams = np.array(sorted({t for t, _ in paires}), dtype=str)
+        tri_ids = np.searchsorted(trigrams, np.array([t for t, _ in paires], dtype=str)) if paires else np.array([], dtype=np.int64)
+        trigram_offsets, trigram_tokens = _csr(tri_ids, np.array([i for _, i in paires], dtype=np.int32), len(trigrams))
+        return cls(version, n, vocab, offsets, postings, trigrams, trigram_offsets, trigram_tokens)
+
+    # --- Persistance ---
+    def save(self, path):
+        np.savez_compressed(
+            path, version=np.array(self.version), nb_rows=np.array(self.nb_rows),
+            vocab=self.vocab, offsets=self.offsets, postings=self.postings,
+            trigrams=self.trigrams, trigram_offsets=self.trigram_offsets, trigram_tokens=self.trigram_tokens,
+        )
+
+    @classmethod
+    def load(cls, source) -> "SearchIndex":
+        """Charge un index enregistré par save() (chemin ou contenu brut du fichier)."""
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        with np.load(source, allow_pickle=False) as f:
+            return cls(**{cle: f[cle] for cle in f.files})
+
+    # --- Recherche ---
+    def _tokens(self, terme: str) -> np.ndarray:
+        """Identifiants des jetons contenant `terme`."""
+        if len(terme) < 3:
+            # Terme trop court pour les trigrammes : jetons qui commencent par lui
+            debut, fin = np.searchsorted(self.vocab, [terme, terme + "\U0010ffff"])
+            return np.arange(debut, fin)
+        candidats = None
+        for i in range(len(terme) - 2):
+            j = np.searchsorted(self.trigrams, terme[i:i + 3])
+            if j == len(self.trigrams) or self.trigrams[j] != terme[i:i + 3]:
+                return np.array([], dtype=np.int32)
+            jetons = self.trigram_tokens[self.trigram_offsets[j]:self.trigram_offsets[j + 1]]
+            candidats = jetons if candidats is None else np.intersect1d(candidats, jetons, assume_unique=True)
+        if len(terme) > 3:
+            # Les trigrammes sont tous présents mais pas forcément dans l'ordre : vérification
+            candidats = candidats[[terme in self.vocab[t] for t in candidats]]
+        return candidats
+
+    def mask(self, recherche: str) -> np.ndarray:
+        """
+        Annonces correspondant à la recherche.
+
+        Retourne:
+        - masque booléen (une case par annonce), tout à True si la recherche ne contient aucun terme.
+        """
+        resultat = np.ones(self.nb_rows, dtype=bool)
+        for terme in search_terms(recherche):
+            trouves = np.zeros(self.nb_rows, dtype=bool)
+            for token_id in self._tokens(terme):
+                trouves[self.postings[self.offsets[token_id]:self.offsets[token_id + 1]]] = True
+            resultat &= trouves
+        return resultat
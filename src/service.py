@@ -0,0 +1,394 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import find_spec
+from os import getenv
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from dotenv import load_dotenv
+
+from dataset import OPTION_COLUMNS, Dataset, expand
+from export import EXPORT_FORMATS, iter_export
+from query import ResultCache
+from search import SearchIndex, index_path
+
+# Réponses Arrow seulement si pyarrow est installé (importé à la première réponse Arrow)
+ARROW_AVAILABLE = find_spec("pyarrow") is not None
+
+
+# =========================
+# Service HTTP de consultation des annonces
+# =========================
+# Charge annonces_propres.csv une seule fois et expose, en lecture seule, les
+# mêmes filtres que la barre latérale du tableau de bord (sidebar_filters) et
+# les mêmes agrégats (métriques, classements, répartitions) :
+#
+#   GET /meta         villes, types, options et bornes des filtres
+#   GET /annonces     annonces filtrées, paginées par curseur (keyset)
+#   GET /resume       métriques principales
+#   GET /classements  top/bottom des villes par prix/m² et surface moyenne
+#   GET /repartition  nombre d'annonces par ville, DPE et GES
+#   GET /export       sélection complète en CSV, Parquet ou XLSX (flux, format=, colonne=)
+#
+# Filtres (paramètres répétables) : ville, type, option (parking, jardin...),
+# prix_min, prix_max, surface_min, surface_max, q (recherche plein texte). Les réponses portent un ETag
+# (version du CSV + requête) : If-None-Match renvoie 304 sans recalcul. Elles
+# sont compressées en gzip si le client l'accepte ; /annonces peut aussi être
+# servi en Arrow IPC (format=arrow ou Accept: application/vnd.apache.arrow.stream).
+# /export est envoyé en Transfer-Encoding: chunked au fil de sa production.
+#
+# Usage (depuis src/) :
+#   python service.py --data-dir .. --port 8000
+load_dotenv()
+GITHUB_TOKEN = getenv("GITHUB_TOKEN")
+CSV_URL = "https://raw.githubusercontent.com/cedric-mc/analyse-marche/main/annonces_propres.csv"
+CSV_PATH = "annonces_propres.csv"
+SEARCH_INDEX_URL = CSV_URL.replace(CSV_PATH, index_path(CSV_PATH).name)
+
+PAGE_SIZE = 50
+PAGE_SIZE_MAX = 1000
+RANKING_SIZE = 10
+GZIP_MIN_BYTES = 1024  # en dessous, la compression ne fait pas gagner grand-chose
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+# Colonnes exclues des annonces : l'image principale est un data URI encombrant
+EXCLUDED_COLUMNS = ["image_principale"]
+OPTION_LABELS = {col: libelle for libelle, col in OPTION_COLUMNS.items()}
+
+logger = logging.getLogger("analyse_marche.service")
+
+
+class BadRequest(ValueError):
+    """Paramètre de requête invalide (réponse 400)."""
+
+
+def load_dataset(data_dir: str = None) -> Dataset:
+    """
+    Charge les annonces depuis un dossier local ou, à défaut, depuis GitHub.
+
+    Retourne:
+    - Dataset versionné par l'empreinte du CSV.
+    """
+    if data_dir:
+        index = index_path(Path(data_dir) / CSV_PATH)
+        return Dataset.from_csv(
+            (Path(data_dir) / CSV_PATH).read_bytes(), SearchIndex.load(index) if index.exists() else None
+        )
+    import requests  # seulement sans DATA_DIR : le tableau de bord importe ce module au démarrage
+
+    headers = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
+    response = requests.get(CSV_URL, headers=headers, timeout=60)
+    response.raise_for_status()
+    index = requests.get(SEARCH_INDEX_URL, headers=headers, timeout=60)
+    return Dataset.from_csv(response.content, SearchIndex.load(index.content) if index.status_code == 200 else None)
+
+
+def _number(params: dict, nom: str):
+    valeur = params.get(nom, [None])[-1]
+    if valeur in (None, ""):
+        return None
+    try:
+        return float(valeur)
+    except ValueError:
+        raise BadRequest(f"{nom} doit être un nombre") from None
+
+
+def _range(params: dict, nom: str, bornes: tuple):
+    minimum, maximum = _number(params, f"{nom}_min"), _number(params, f"{nom}_max")
+    if minimum is None and maximum is None:
+        return None
+    return (bornes[0] if minimum is None else minimum, bornes[1] if maximum is None else maximum)
+
+
+def parse_filters(dataset: Dataset, params: dict) -> dict:
+    """Traduit les paramètres de requête en filtres de Dataset.select()."""
+    options = []
+    for option in params.get("option", []):
+        libelle = OPTION_LABELS.get(option, option)
+        if libelle not in OPTION_COLUMNS:
+            raise BadRequest(f"option inconnue : {option}")
+        options.append(libelle)
+    return {
+        "villes": params.get("ville", []),
+        "types": params.get("type", []),
+        "options": options,
+        "prix": _range(params, "prix", dataset.prix_bounds),
+        "surface": _range(params, "surface", dataset.surface_bounds),
+        "recherche": " ".join(params.get("q", [])),
+    }
+
+
+def filters_params(filtres: dict) -> list:
+    """Inverse de parse_filters() : filtres de sidebar_filters() → paramètres de requête (liste de paires)."""
+    params = [("ville", v) for v in filtres.get("villes", [])]
+    params += [("type", t) for t in filtres.get("types", [])]
+    params += [("option", OPTION_COLUMNS[o]) for o in filtres.get("options", [])]
+    for nom in ("prix", "surface"):
+        if filtres.get(nom) is not None:
+            params += [(f"{nom}_min", filtres[nom][0]), (f"{nom}_max", filtres[nom][1])]
+    if filtres.get("recherche"):
+        params.append(("q", filtres["recherche"]))
+    return params
+
+
+def encode_cursor(dataset: Dataset, position: int) -> str:
+    """Curseur opaque : dernière position renvoyée, rattachée à la version du jeu."""
+    return base64.urlsafe_b64encode(f"{dataset.version}:{position}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(dataset: Dataset, curseur: str) -> int:
+    try:
+        version, position = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4)).decode().split(":")
+        position = int(position)
+    except ValueError:
+        raise BadRequest("curseur invalide") from None
+    if version != dataset.version:
+        raise BadRequest("curseur périmé : le jeu de données a été mis à jour")
+    return position
+
+
+class QueryService:
+    """Requêtes du service, indépendantes du transport HTTP."""
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+        self.cache = ResultCache()
+        self.columns = [c for c in dataset.columns if c not in EXCLUDED_COLUMNS]
+
+    def meta(self, params: dict) -> dict:
+        return {
+            "version": self.dataset.version,
+            "nb_annonces": len(self.dataset),
+            "villes": self.dataset.villes,
+            "types": self.dataset.types,
+            "options": [col for col in OPTION_COLUMNS.values() if col in self.dataset.options],
+            "prix": list(self.dataset.prix_bounds),
+            "surface": list(self.dataset.surface_bounds),
+        }
+
+    def _result(self, params: dict):
+        resultat, _ = self.cache.get(self.dataset, parse_filters(self.dataset, params))
+        return resultat
+
+    def annonces(self, params: dict) -> tuple:
+        """
+        Page d'annonces filtrées, dans l'ordre du CSV.
+
+        Paramètres:
+        - params : filtres, `limit` (taille de page) et `after` (curseur de la page précédente).
+
+        Retourne:
+        - (DataFrame de la page, nombre total d'annonces retenues, curseur suivant ou None)
+        """
+        try:
+            limite = int(params.get("limit", [PAGE_SIZE])[-1])
+        except ValueError:
+            raise BadRequest("limit doit être un entier") from None
+        if not 1 <= limite <= PAGE_SIZE_MAX:
+            raise BadRequest(f"limit doit être compris entre 1 et {PAGE_SIZE_MAX}")
+        rows = self._result(params).rows
+        # Keyset : reprise après la dernière position vue (recherche dichotomique, sans OFFSET)
+        debut = 0
+        if params.get("after"):
+            debut = int(np.searchsorted(rows, decode_cursor(self.dataset, params["after"][-1]), side="right"))
+        page = rows[debut:debut + limite]
+        suivant = encode_cursor(self.dataset, int(page[-1])) if debut + limite < len(rows) else None
+        return expand(self.dataset.df.iloc[page])[self.columns], len(rows), suivant
+
+    def resume(self, params: dict) -> dict:
+        return {key: _plain(valeur) for key, valeur in self._result(params).summary.items()}
+
+    def classements(self, params: dict) -> dict:
+        """Top et bottom RANKING_SIZE des villes, comme l'onglet Classements."""
+        rankings = self._result(params).rankings
+        resultat = {}
+        if "prix" in rankings:
+            classement = rankings["prix"]
+            resultat["prix_m2"] = {
+                "moins_cheres": _records(classement.head(RANKING_SIZE)),
+                "plus_cheres": _records(classement.tail(RANKING_SIZE).iloc[::-1]),
+            }
+        if "surface" in rankings:
+            classement = rankings["surface"]
+            resultat["surface"] = {
+                "plus_grandes": _records(classement.head(RANKING_SIZE)),
+                "plus_petites": _records(classement.tail(RANKING_SIZE).iloc[::-1]),
+            }
+        return resultat
+
+    def repartition(self, params: dict) -> dict:
+        return {nom: _records(table) for nom, table in self._result(params).charts.items()}
+
+    def export(self, params: dict) -> tuple:
+        """
+        Toute la sélection filtrée, dans le format demandé.
+
+        Paramètres:
+        - params : filtres, `format` (csv, parquet ou xlsx) et `colonne` (répétable, par défaut toutes sauf l'image).
+
+        Retourne:
+        - (générateur de morceaux du fichier, type MIME, nom du fichier)
+        """
+        fmt = params.get("format", ["csv"])[-1]
+        if fmt == "parquet" and fmt not in EXPORT_FORMATS:
+            raise BadRequest("pyarrow n'est pas installé : export Parquet indisponible")
+        if fmt not in EXPORT_FORMATS:
+            raise BadRequest(f"format d'export inconnu : {fmt} ({', '.join(EXPORT_FORMATS)})")
+        colonnes = params.get("colonne") or self.columns
+        inconnues = [c for c in colonnes if c not in self.dataset.columns]
+        if inconnues:
+            raise BadRequest(f"colonnes inconnues : {', '.join(inconnues)}")
+        type_mime, extension = EXPORT_FORMATS[fmt]
+        morceaux = iter_export(self.dataset.df, self._result(params).rows, colonnes, fmt)
+        return morceaux, type_mime, f"annonces{extension}"
+
+
+def _plain(valeur):
+    """Valeur numpy → type JSON (NaN → None)."""
+    if isinstance(valeur, (np.integer, np.floating)):
+        valeur = valeur.item()
+    return None if isinstance(valeur, float) and valeur != valeur else valeur
+
+
+def _records(table) -> list:
+    return [{col: _plain(v) for col, v in zip(table.columns, ligne)} for ligne in table.itertuples(index=False)]
+
+
+def _to_arrow(df) -> bytes:
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# =========================
+# Transport HTTP
+# =========================
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Gestionnaire HTTP/1.1 (connexions persistantes) ; `service` est fixé par make_server()."""
+
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps sont écrits séparément : sans TCP_NODELAY, Nagle et l'ACK retardé ajoutent ~40 ms
+    disable_nagle_algorithm = True
+    service: QueryService = None
+    routes = {"/meta", "/annonces", "/resume", "/classements", "/repartition", "/export"}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, b"ok", "text/plain")
+        if url.path not in self.routes:
+            return self._send_json(404, {"erreur": f"route inconnue : {url.path}"})
+
+        params = parse_qs(url.query)
+        arrow = url.path == "/annonces" and (
+            params.get("format", [""])[-1] == "arrow" or ARROW_MIME in self.headers.get("Accept", "")
+        )
+        if arrow and not ARROW_AVAILABLE:
+            return self._send_json(406, {"erreur": "pyarrow n'est pas installé : format Arrow indisponible"})
+
+        # ETag : même version du jeu + mêmes paramètres (ordre indifférent) → même réponse
+        canonique = json.dumps([self.service.dataset.version, url.path, arrow, sorted(params.items())])
+        etag = '"%s"' % hashlib.sha1(canonique.encode("utf-8")).hexdigest()
+        if etag in self.headers.get("If-None-Match", ""):
+            return self._send(304, b"", None, {"ETag": etag})
+
+        try:
+            if url.path == "/annonces":
+                page, total, suivant = self.service.annonces(params)
+                entetes = {"ETag": etag, "X-Total-Count": str(total)}
+                if suivant:
+                    entetes["X-Next-Cursor"] = suivant
+                if arrow:
+                    return self._send(200, _to_arrow(page), ARROW_MIME, entetes)
+                corps = '{"version":%s,"total":%d,"suivant":%s,"annonces":%s}' % (
+                    json.dumps(self.service.dataset.version), total, json.dumps(suivant),
+                    page.to_json(orient="records", force_ascii=False),
+                )
+                return self._send(200, corps.encode("utf-8"), "application/json; charset=utf-8", entetes)
+            if url.path == "/export":
+                morceaux, type_mime, fichier = self.service.export(params)
+                return self._send_stream(morceaux, type_mime, {
+                    "ETag": etag, "Content-Disposition": f'attachment; filename="{fichier}"',
+                })
+            donnees = getattr(self.service, url.path.strip("/"))(params)
+        except BadRequest as e:
+            return self._send_json(400, {"erreur": str(e)})
+        self._send_json(200, donnees, {"ETag": etag})
+
+    def _send_json(self, code: int, donnees: dict, entetes: dict = None):
+        corps = json.dumps(donnees, ensure_ascii=False).encode("utf-8")
+        self._send(code, corps, "application/json; charset=utf-8", entetes)
+
+    def _send(self, code: int, corps: bytes, type_mime: str, entetes: dict = None):
+        self.send_response(code)
+        if type_mime:
+            self.send_header("Content-Type", type_mime)
+        if len(corps) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            corps = gzip.compress(corps, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        self.send_header("Cache-Control", "no-cache")  # réutilisable après revalidation par ETag
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _send_stream(self, morceaux, type_mime: str, entetes: dict):
+        """Corps envoyé morceau par morceau (Transfer-Encoding: chunked) : taille inconnue à l'avance."""
+        self.send_response(200)
+        self.send_header("Content-Type", type_mime)
+        self.send_header("Cache-Control", "no-cache")
+        for nom, valeur in entetes.items():
+            self.send_header(nom, valeur)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for morceau in morceaux:
+                if morceau:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(morceau), morceau))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Téléchargement interrompu par le client : la production s'arrête avec la connexion
+            morceaux.close()
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def make_server(dataset: Dataset, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    handler = type("Handler", (ServiceHandler,), {"service": QueryService(dataset)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP en lecture seule des annonces nettoyées.")
+    parser.add_argument("--data-dir", default=getenv("DATA_DIR"),
+                        help="dossier contenant annonces_propres.csv (par défaut : CSV publié sur GitHub)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    dataset = load_dataset(args.data_dir)
+    server = make_server(dataset, args.host, args.port)
+    logger.info("%d annonces (version %s) servies sur http://%s:%d", len(dataset), dataset.version[:12], args.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
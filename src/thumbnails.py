@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from pathlib import Path
+
+
+# =========================
+# Cache local des miniatures de la galerie
+# =========================
+# Les photos des annonces sont téléchargées une seule fois (pool de threads
+# borné), réduites à THUMBNAIL_WIDTH pixels de large en WebP et enregistrées
+# sous le nom de l'empreinte de leur contenu (deux URL de la même image ne
+# prennent qu'un fichier). Un index SQLite associe chaque URL à son fichier et
+# à sa date de dernier accès : au-delà de max_bytes, les fichiers les moins
+# récemment affichés sont supprimés. Le dossier est servi par Streamlit
+# (server.enableStaticServing) : le navigateur ne contacte plus le site source.
+
+THUMBNAIL_WIDTH = 60
+THUMBNAIL_QUALITY = 75
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 10  # secondes par image
+INDEX_FILE = "index.sqlite3"
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;  -- une date d'accès perdue en cas de crash est sans conséquence
+CREATE TABLE IF NOT EXISTS thumbnails (
+    url TEXT PRIMARY KEY,
+    digest TEXT,          -- NULL : image introuvable (404) ou illisible, pas de nouvel essai
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnails_digest ON thumbnails (digest);
+"""
+
+logger = logging.getLogger("analyse_marche.thumbnails")
+
+
+def make_thumbnail(contenu: bytes, width: int = THUMBNAIL_WIDTH) -> bytes:
+    """
+    Réduit une image à `width` pixels de large (proportions conservées) et l'encode en WebP.
+
+    Lève:
+    - OSError ou ValueError si l'image est illisible (ou trop grande pour être décodée).
+    """
+    from PIL import Image  # importé à la première miniature, pas au démarrage du tableau de bord
+    try:
+        with Image.open(BytesIO(contenu)) as image:
+            image.draft("RGB", (width, width * 4))  # décodage JPEG directement à une taille réduite
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            sortie = BytesIO()
+            image.save(sortie, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+            return sortie.getvalue()
+    except Image.DecompressionBombError as e:
+        raise ValueError(str(e)) from e
+
+
+class ThumbnailCache:
+    """
+    Miniatures WebP adressées par leur contenu, avec éviction LRU sur le volume total.
+
+    Paramètres:
+    - directory : dossier des fichiers .webp et de l'index.
+    - max_bytes : volume maximal des miniatures sur disque.
+    - workers : téléchargements simultanés au plus.
+    """
+
+    def __init__(self, directory, max_bytes: int = CACHE_MAX_BYTES, workers: int = FETCH_WORKERS,
+                 timeout: float = FETCH_TIMEOUT, width: int = THUMBNAIL_WIDTH):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.width = width
+        self.db = sqlite3.connect(self.directory / INDEX_FILE, check_same_thread=False, isolation_level=None)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self.pending = {}  # url → Future des téléchargements en cours (pas de doublon)
+        self.session = None  # requests.Session créée au premier téléchargement (import différé)
+        self.bytes = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM thumbnails "
+            "WHERE digest IS NOT NULL GROUP BY digest)"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def lookup(self, urls: list) -> dict:
+        """
+        Miniatures déjà en cache (sans accès réseau) ; met à jour leur date d'accès.
+
+        Retourne:
+        - dict url → nom du fichier .webp, ou None si l'image est connue comme introuvable.
+        """
+        trouves = self._known(urls)
+        # Compteurs partagés par les sessions et le pool de téléchargement : sous verrou
+        with self.lock:
+            self.hits += len(trouves)
+            self.misses += len(set(urls) - trouves.keys())
+        return trouves
+
+    def _known(self, urls: list) -> dict:
+        if not urls:
+            return {}
+        marqueurs = ",".join("?" * len(urls))
+        with self.lock:
+            lignes = self.db.execute(f"SELECT url, digest FROM thumbnails WHERE url IN ({marqueurs})", list(urls)).fetchall()
+            self.db.execute(f"UPDATE thumbnails SET last_access = ? WHERE url IN ({marqueurs})", [time.time(), *urls])
+        return {url: f"{digest}.webp" if digest else None for url, digest in lignes}
+
+    def fetch(self, urls: list) -> list:
+        """Lance le téléchargement des URL absentes du cache (préchargement) ; retourne les Futures correspondants."""
+        return self._submit(urls, self._known(urls))
+
+    def _submit(self, urls: list, connues: dict) -> list:
+        futures = []
+        with self.lock:
+            for url in dict.fromkeys(urls):
+                if url in connues:
+                    continue
+                if url not in self.pending:
+                    self.pending[url] = self.executor.submit(self._download, url)
+                futures.append(self.pending[url])
+        return futures
+
+    def get(self, urls: list, timeout: float = 0) -> dict:
+        """
+        Miniatures des URL, en attendant au plus `timeout` secondes celles qu'il faut télécharger.
+
+        Retourne:
+        - dict url → nom du fichier .webp pour les miniatures disponibles.
+        """
+        connues = self.lookup(urls)
+        futures = self._submit(urls, connues)
+        if futures and timeout > 0:
+            wait(futures, timeout=timeout)
+            connues = self._known(urls)
+        return {url: fichier for url, fichier in connues.items() if fichier}
+
+    def _download(self, url: str):
+        import requests  # hors du démarrage du tableau de bord : seulement quand une miniature manque
+
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+        digest, taille, erreur = None, 0, False
+        try:
+            reponse = self.session.get(url, timeout=self.timeout)
+            if reponse.status_code not in (404, 410):
+                reponse.raise_for_status()
+        except requests.RequestException as e:
+            # Erreur passagère (délai, 5xx...) : rien n'est mémorisé, l'image sera redemandée
+            logger.info("téléchargement impossible pour %s : %s", url, e)
+            with self.lock:
+                self.errors += 1
+                self.pending.pop(url, None)
+            return
+        try:
+            if reponse.status_code in (404, 410):
+                raise FileNotFoundError(f"HTTP {reponse.status_code}")
+            miniature = make_thumbnail(reponse.content, self.width)
+            digest = hashlib.sha256(miniature).hexdigest()[:32]
+            taille = len(miniature)
+            chemin = self.directory / f"{digest}.webp"
+            if not chemin.exists():
+                # Écriture atomique : jamais de fichier partiel servi au navigateur
+                temporaire = chemin.with_suffix(f".{threading.get_ident()}.tmp")
+                temporaire.write_bytes(miniature)
+                os.replace(temporaire, chemin)
+        except (OSError, ValueError) as e:
+            # Image introuvable ou illisible : mémorisée pour ne pas la redemander à chaque page
+            digest, taille, erreur = None, 0, True
+            logger.info("miniature impossible pour %s : %s", url, e)
+        with self.lock:
+            self.errors += erreur
+            if digest and not self.db.execute("SELECT 1 FROM thumbnails WHERE digest = ?", (digest,)).fetchone():
+                self.bytes += taille
+            self.db.execute(
+                "INSERT OR REPLACE INTO thumbnails (url, digest, size, last_access) VALUES (?, ?, ?, ?)",
+                (url, digest, taille, time.time()),
+            )
+            self.pending.pop(url, None)
+            if self.bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Supprime les fichiers les moins récemment affichés au-delà de max_bytes (verrou tenu)."""
+        fichiers = self.db.execute(
+            "SELECT digest, MAX(size), MAX(last_access) AS acces FROM thumbnails "
+            "WHERE digest IS NOT NULL GROUP BY digest ORDER BY acces"
+        ).fetchall()
+        self.bytes = sum(taille for _, taille, _ in fichiers)
+        for digest, taille, _ in fichiers:
+            if self.bytes <= self.max_bytes:
+                break
+            (self.directory / f"{digest}.webp").unlink(missing_ok=True)
+            self.db.execute("DELETE FROM thumbnails WHERE digest = ?", (digest,))
+            self.bytes -= taille
+
+    def stats(self) -> dict:
+        with self.lock:
+            nb_fichiers = self.db.execute("SELECT COUNT(DISTINCT digest) FROM thumbnails").fetchone()[0]
+            return {
+                "fichiers": nb_fichiers,
+                "octets": self.bytes,
+                "en_cours": len(self.pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "erreurs": self.errors,
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.db.close()
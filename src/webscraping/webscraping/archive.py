@@ -0,0 +1,161 @@
+# Archivage WARC des réponses du crawl
+#
+# Chaque réponse téléchargée est écrite dans une archive WARC compressée
+# (un membre gzip par enregistrement, donc lisible par offset) et référencée
+# dans un index JSON Lines avec le callback et les métadonnées de la requête.
+# `python -m webscraping.replay` rejoue ensuite ces réponses hors ligne.
+#
+# Activation : -s ARCHIVE_DIR=../../archive
+
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http.response.text import TextResponse
+
+INDEX_FILE = "index.jsonl"
+
+# Clés de meta posées par Scrapy lui-même : inutiles au rejeu
+SCRAPY_META_KEYS = {
+    "depth", "download_latency", "download_slot", "download_timeout", "retry_times",
+    "redirect_times", "redirect_ttl", "redirect_urls", "redirect_reasons", "handle_httpstatus_list",
+    "handle_httpstatus_all", "dont_redirect", "dont_retry", "dont_filter",
+}
+
+
+def callback_name(request) -> str:
+    """Nom du callback d'une requête (le callback par défaut est `parse`)."""
+    return getattr(request.callback, "__name__", None) or "parse"
+
+
+def replayable_meta(meta: dict) -> dict:
+    """Métadonnées de la requête utiles au rejeu (clés du spider, sérialisables en JSON)."""
+    resultat = {}
+    for cle, valeur in meta.items():
+        if cle in SCRAPY_META_KEYS or cle.startswith("_"):
+            continue
+        try:
+            json.dumps(valeur)
+        except TypeError:
+            continue
+        resultat[cle] = valeur
+    return resultat
+
+
+def build_record(url: str, status: int, headers: list, body: bytes) -> bytes:
+    """Construit un enregistrement WARC/1.0 de type "response" (avant compression)."""
+    raison = {200: "OK", 301: "Moved Permanently", 302: "Found", 404: "Not Found"}.get(status, "")
+    http = f"HTTP/1.1 {status} {raison}\r\n".encode()
+    http += b"".join(f"{nom}: {valeur}\r\n".encode("latin-1", "replace") for nom, valeur in headers)
+    http += b"\r\n" + body
+    entete = (
+        "WARC/1.0\r\n"
+        "WARC-Type: response\r\n"
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        "Content-Type: application/http; msgtype=response\r\n"
+        f"Content-Length: {len(http)}\r\n"
+        "\r\n"
+    ).encode()
+    return entete + http + b"\r\n\r\n"
+
+
+def parse_record(record: bytes) -> tuple:
+    """
+    Décode un enregistrement WARC "response".
+
+    Retourne:
+    - (url, status, headers, body)
+    """
+    entete_warc, _, reste = record.partition(b"\r\n\r\n")
+    url = None
+    for ligne in entete_warc.split(b"\r\n"):
+        if ligne.startswith(b"WARC-Target-URI:"):
+            url = ligne.split(b":", 1)[1].strip().decode()
+    entete_http, _, body = reste.partition(b"\r\n\r\n")
+    lignes = entete_http.split(b"\r\n")
+    status = int(lignes[0].split()[1])
+    headers = [tuple(part.strip() for part in ligne.decode("latin-1").split(":", 1)) for ligne in lignes[1:] if b":" in ligne]
+    if body.endswith(b"\r\n\r\n"):
+        body = body[:-4]
+    return url, status, headers, body
+
+
+def read_record(archive_dir: Path, entry: dict) -> tuple:
+    """Lit un enregistrement à partir de son entrée d'index (accès direct par offset)."""
+    with open(archive_dir / entry["file"], "rb") as f:
+        f.seek(entry["offset"])
+        return parse_record(gzip.decompress(f.read(entry["length"])))
+
+
+def read_index(archive_dir: Path) -> list:
+    """Charge l'index de l'archive (une entrée par réponse)."""
+    with open(archive_dir / INDEX_FILE, encoding="utf-8") as f:
+        return [json.loads(ligne) for ligne in f if ligne.strip()]
+
+
+class WarcArchiveMiddleware:
+    """
+    Middleware de téléchargement qui archive chaque réponse en WARC compressé.
+
+    Il est placé après HttpCompressionMiddleware (590) pour archiver le corps
+    décompressé, tel que les callbacks le reçoivent.
+    """
+
+    def __init__(self, archive_dir, max_file_size):
+        self.archive_dir = Path(archive_dir)
+        self.max_file_size = max_file_size
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.index = open(self.archive_dir / INDEX_FILE, "a", encoding="utf-8")
+        numeros = [int(p.name.split("-")[1].split(".")[0]) for p in self.archive_dir.glob("crawl-*.warc.gz")]
+        self.file_number = max(numeros, default=-1) + 1
+        self._open_file()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        archive_dir = crawler.settings.get("ARCHIVE_DIR")
+        if not archive_dir:
+            raise NotConfigured("ARCHIVE_DIR non défini")
+        s = cls(archive_dir, crawler.settings.getint("ARCHIVE_MAX_FILE_SIZE"))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _open_file(self):
+        self.file_name = f"crawl-{self.file_number:05d}.warc.gz"
+        self.file = open(self.archive_dir / self.file_name, "ab")
+
+    def process_response(self, request, response, spider):
+        record = gzip.compress(
+            build_record(response.url, response.status, list(response.headers.to_unicode_dict().items()), response.body),
+            compresslevel=6,
+        )
+        offset = self.file.tell()
+        self.file.write(record)
+        self.file.flush()
+        entry = {
+            "url": response.url,
+            "status": response.status,
+            "file": self.file_name,
+            "offset": offset,
+            "length": len(record),
+            "callback": callback_name(request),
+            "meta": replayable_meta(request.meta),
+            "encoding": response.encoding if isinstance(response, TextResponse) else None,
+        }
+        self.index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.index.flush()
+        if self.file.tell() >= self.max_file_size:
+            self.file.close()
+            self.file_number += 1
+            self._open_file()
+        return response
+
+    def spider_closed(self, spider):
+        self.file.close()
+        self.index.close()
+        spider.logger.info("Archive WARC écrite dans %s", self.archive_dir)
@@ -0,0 +1,198 @@
+# Reprise d'un crawl interrompu
+#
+# Le middleware tient un journal SQLite des requêtes (empreinte, URL, callback,
+# meta, état pending/done) et écrit les items en JSON Lines, en ajout seul.
+# À chaque point de contrôle, les items en attente sont écrits et synchronisés
+# sur disque (fsync) AVANT la transaction qui marque leurs réponses "done" et
+# enregistre les requêtes filles : un arrêt brutal (kill -9, runner perdu) ne
+# perd donc au pire que le travail effectué depuis le dernier point de contrôle.
+# Relancé sur le même dossier, le crawl repart des requêtes "pending" au lieu
+# des start_urls ; les items déjà écrits sont ignorés (dédupliqués par lien).
+#
+# Activation : -s CHECKPOINT_DIR=../../checkpoint  (items dans <CHECKPOINT_DIR>/items.jsonl)
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+
+from webscraping.archive import callback_name, replayable_meta
+
+JOURNAL_FILE = "journal.sqlite3"
+ITEMS_FILE = "items.jsonl"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    callback TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending'
+);
+"""
+
+
+def item_key(item: dict) -> str:
+    """Clé de déduplication d'un item (le lien de l'annonce, à défaut l'item entier)."""
+    return item.get("lien") or json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def load_item_keys(path: Path) -> set:
+    """
+    Clés des items déjà écrits. Une dernière ligne incomplète (arrêt pendant
+    l'écriture, avant le fsync) est tronquée.
+    """
+    cles = set()
+    if not path.exists():
+        return cles
+    with open(path, "rb+") as f:
+        fin_valide = 0
+        for ligne in f:
+            try:
+                cles.add(item_key(json.loads(ligne)))
+            except ValueError:
+                break
+            fin_valide += len(ligne)
+        f.truncate(fin_valide)
+    return cles
+
+
+class CheckpointMiddleware:
+    """Middleware de spider qui journalise requêtes et items pour reprendre un crawl interrompu."""
+
+    def __init__(self, checkpoint_dir, interval, crawler):
+        self.dir = Path(checkpoint_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.crawler = crawler
+        self.conn = sqlite3.connect(self.dir / JOURNAL_FILE, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.seen = {fp for (fp,) in self.conn.execute("SELECT fingerprint FROM requests")}
+        self.item_keys = load_item_keys(self.dir / ITEMS_FILE)
+        self.items_file = open(self.dir / ITEMS_FILE, "ab")
+        # Tampons vidés à chaque point de contrôle
+        self.pending_requests = []
+        self.done = []
+        self.items = []
+        self.last_checkpoint = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        checkpoint_dir = crawler.settings.get("CHECKPOINT_DIR")
+        if not checkpoint_dir:
+            raise NotConfigured("CHECKPOINT_DIR non défini")
+        m = cls(checkpoint_dir, crawler.settings.getfloat("CHECKPOINT_INTERVAL"), crawler)
+        crawler.signals.connect(m.spider_closed, signal=signals.spider_closed)
+        return m
+
+    def fingerprint(self, request) -> str:
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
+
+    def journal(self, request) -> bool:
+        """Ajoute une requête au journal ; False si elle y figure déjà (déjà vue, avant ou après reprise)."""
+        fp = self.fingerprint(request)
+        if fp in self.seen:
+            return False
+        self.seen.add(fp)
+        # L'empreinte suit la requête (et ses redirections) jusqu'à sa réponse
+        request.meta["checkpoint_fp"] = fp
+        # Meta et priorité sont lues au point de contrôle : les middlewares placés après
+        # celui-ci (CrawlSchedulingMiddleware : priorité, ville d'expansion) les ont alors fixées
+        self.pending_requests.append((fp, request))
+        return True
+
+    async def process_start(self, start):
+        pending = self.conn.execute(
+            "SELECT fingerprint, url, callback, meta, priority FROM requests WHERE status = 'pending'"
+        ).fetchall()
+        spider = self.crawler.spider
+        if self.seen:
+            spider.logger.info(
+                "Reprise depuis %s : %d requêtes en attente, %d items déjà écrits",
+                self.dir, len(pending), len(self.item_keys),
+            )
+            for fp, url, callback, meta, priority in pending:
+                yield Request(
+                    url,
+                    callback=getattr(spider, callback),
+                    meta={**json.loads(meta), "checkpoint_fp": fp},
+                    priority=priority,
+                )
+            return
+        async for element in start:
+            if isinstance(element, Request) and not self.journal(element):
+                continue
+            yield element
+
+    def _keep(self, element) -> bool:
+        """Journalise une sortie du spider ; False si elle a déjà été traitée avant la reprise."""
+        if isinstance(element, Request):
+            return self.journal(element)
+        if is_item(element):
+            item = ItemAdapter(element).asdict()
+            cle = item_key(item)
+            if cle in self.item_keys:
+                return False  # déjà écrit avant l'interruption
+            self.item_keys.add(cle)
+            self.items.append(item)
+        return True
+
+    def process_spider_output(self, response, result, spider):
+        for element in result:
+            if self._keep(element):
+                yield element
+        self._response_done(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for element in result:
+            if self._keep(element):
+                yield element
+        self._response_done(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        # Réponse rejetée (ex : HttpError sur une 404) : inutile de la retenter à la reprise
+        self._response_done(response)
+
+    def _response_done(self, response):
+        fp = response.meta.get("checkpoint_fp")
+        if fp is not None:
+            self.done.append(fp)
+        if time.monotonic() - self.last_checkpoint >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Écrit les items (fsync) puis valide le journal en une transaction."""
+        if self.items:
+            self.items_file.write(
+                "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in self.items).encode("utf-8")
+            )
+            self.items_file.flush()
+            os.fsync(self.items_file.fileno())
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO requests (fingerprint, url, callback, meta, priority) VALUES (?, ?, ?, ?, ?)",
+            [
+                (fp, request.url, callback_name(request), json.dumps(replayable_meta(request.meta)), request.priority)
+                for fp, request in self.pending_requests
+            ],
+        )
+        self.conn.executemany("UPDATE requests SET status = 'done' WHERE fingerprint = ?", [(fp,) for fp in self.done])
+        self.conn.execute("COMMIT")
+        self.crawler.stats.inc_value("checkpoint/count")
+        self.pending_requests, self.done, self.items = [], [], []
+        self.last_checkpoint = time.monotonic()
+
+    def spider_closed(self, spider, reason):
+        self.checkpoint()
+        restantes = self.conn.execute("SELECT COUNT(*) FROM requests WHERE status = 'pending'").fetchone()[0]
+        spider.logger.info("Point de contrôle final (%s) : %d requêtes encore en attente", reason, restantes)
+        self.items_file.close()
+        self.conn.close()
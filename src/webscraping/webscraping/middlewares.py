@@ -3,10 +3,16 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
 
 # useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+from itemadapter import ItemAdapter, is_item
 
 
 class WebscrapingSpiderMiddleware:
@@ -98,3 +104,157 @@ class WebscrapingDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class Histogram:
+    """Histogramme cumulatif à seaux fixes (format Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, borne in enumerate(self.buckets):
+            if value <= borne:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)},
+            "sum": round(self.sum, 6),
+            "count": self.count,
+        }
+
+    def to_prometheus(self, name, labels):
+        lignes = []
+        for borne, compte in zip(self.buckets, self.counts):
+            le = "+Inf" if borne == float("inf") else repr(borne)
+            lignes.append(f'{name}_bucket{{{labels},le="{le}"}} {compte}')
+        lignes.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lignes.append(f"{name}_count{{{labels}}} {self.count}")
+        return lignes
+
+
+class TelemetrySpiderMiddleware:
+    """
+    Télémétrie du crawl, par callback (parse, parse_departement, parse_ville,
+    parse_liste_annonces, parse_annonce) :
+    - latence de téléchargement et taille des réponses (histogrammes) ;
+    - temps CPU passé dans le callback ;
+    - requêtes et items produits, champs obligatoires manquants ;
+    - rejets signalés par le spider (stats "rejets/<raison>").
+
+    Les mesures sont exportées à la fermeture du spider dans
+    `<TELEMETRY_FILE>.json` et `<TELEMETRY_FILE>.prom` (format texte Prometheus).
+    """
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+    CPU_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+    def __init__(self, stats, output_file, required_fields):
+        self.stats = stats
+        self.output_file = output_file
+        self.required_fields = required_fields
+        self.callbacks = defaultdict(self._new_metrics)
+        self.started = time.time()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        output_file = crawler.settings.get("TELEMETRY_FILE")
+        if not output_file:
+            raise NotConfigured("TELEMETRY_FILE non défini")
+        s = cls(crawler.stats, output_file, crawler.settings.getlist("TELEMETRY_REQUIRED_FIELDS"))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _new_metrics(self):
+        return {
+            "download_latency_seconds": Histogram(self.LATENCY_BUCKETS),
+            "response_bytes": Histogram(self.SIZE_BUCKETS),
+            "parse_cpu_seconds": Histogram(self.CPU_BUCKETS),
+            "responses": 0,
+            "requests": 0,
+            "items": 0,
+            "missing_fields": defaultdict(int),
+        }
+
+    def process_spider_output(self, response, result, spider):
+        callback = response.request.callback if response.request else None
+        metrics = self.callbacks[getattr(callback, "__name__", "parse")]
+        metrics["responses"] += 1
+        metrics["response_bytes"].observe(len(response.body))
+        if "download_latency" in response.meta:
+            metrics["download_latency_seconds"].observe(response.meta["download_latency"])
+
+        # Les callbacks sont des générateurs : le temps CPU est consommé à chaque next()
+        cpu = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                debut = time.process_time()
+                try:
+                    element = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    cpu += time.process_time() - debut
+                if isinstance(element, Request):
+                    metrics["requests"] += 1
+                elif is_item(element):
+                    metrics["items"] += 1
+                    adapter = ItemAdapter(element)
+                    for field in self.required_fields:
+                        if not adapter.get(field):
+                            metrics["missing_fields"][field] += 1
+                yield element
+        finally:
+            metrics["parse_cpu_seconds"].observe(cpu)
+
+    def spider_closed(self, spider, reason):
+        rejets = {
+            key.split("/", 1)[1]: value
+            for key, value in (self.stats.get_stats() or {}).items()
+            if key.startswith("rejets/")
+        }
+        rapport = {
+            "spider": spider.name,
+            "reason": reason,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "callbacks": {
+                nom: {
+                    cle: (valeur.to_dict() if isinstance(valeur, Histogram) else valeur)
+                    for cle, valeur in metrics.items()
+                }
+                for nom, metrics in sorted(self.callbacks.items())
+            },
+            "rejets": rejets,
+        }
+        base = Path(self.output_file)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        base.with_suffix(".json").write_text(json.dumps(rapport, indent=2, ensure_ascii=False), encoding="utf-8")
+        base.with_suffix(".prom").write_text(self._to_prometheus(rejets), encoding="utf-8")
+        spider.logger.info("Télémétrie exportée : %s.{json,prom}", base)
+
+    def _to_prometheus(self, rejets):
+        lignes = []
+        for name in ("download_latency_seconds", "response_bytes", "parse_cpu_seconds"):
+            lignes.append(f"# TYPE scrapy_{name} histogram")
+            for callback, metrics in sorted(self.callbacks.items()):
+                lignes += metrics[name].to_prometheus(f"scrapy_{name}", f'callback="{callback}"')
+        for name in ("responses", "requests", "items"):
+            lignes.append(f"# TYPE scrapy_{name}_total counter")
+            for callback, metrics in sorted(self.callbacks.items()):
+                lignes.append(f'scrapy_{name}_total{{callback="{callback}"}} {metrics[name]}')
+        lignes.append("# TYPE scrapy_missing_fields_total counter")
+        for callback, metrics in sorted(self.callbacks.items()):
+            for field, count in sorted(metrics["missing_fields"].items()):
+                lignes.append(f'scrapy_missing_fields_total{{callback="{callback}",field="{field}"}} {count}')
+        lignes.append("# TYPE scrapy_rejects_total counter")
+        for raison, count in sorted(rejets.items()):
+            lignes.append(f'scrapy_rejects_total{{reason="{raison}"}} {count}')
+        return "\n".join(lignes) + "\n"
@@ -0,0 +1,80 @@
+# Rejeu hors ligne d'une archive WARC
+#
+# Ré-extrait les items d'un crawl archivé (voir archive.py) en passant chaque
+# réponse dans le même callback du spider qu'au moment du crawl, sans réseau
+# et en parallèle sur tous les cœurs. Seules les pages détail (parse_annonce)
+# produisent des items : les requêtes générées par les autres callbacks sont
+# ignorées, leurs réponses étant déjà dans l'archive.
+#
+# Usage (depuis src/webscraping) :
+#   python -m webscraping.replay ../../archive -O ../../annonces.json [--workers 8]
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request
+from scrapy.http import HtmlResponse
+
+from webscraping.archive import read_index, read_record
+from webscraping.spiders.french_immobilier import FrenchImmobilierSpider
+
+
+def replay_entries(archive_dir: str, entries: list, callbacks: list) -> list:
+    """Rejoue une partie de l'index dans un processus et retourne les items extraits."""
+    archive_dir = Path(archive_dir)
+    spider = FrenchImmobilierSpider()
+    items = []
+    for entry in entries:
+        if not 200 <= entry["status"] < 300 or entry["callback"] not in callbacks:
+            continue
+        url, status, headers, body = read_record(archive_dir, entry)
+        callback = getattr(spider, entry["callback"])
+        request = Request(url, callback=callback, meta=entry["meta"])
+        response = HtmlResponse(
+            url, status=status, headers=headers, body=body, encoding=entry.get("encoding") or "utf-8", request=request
+        )
+        for resultat in callback(response) or ():
+            if is_item(resultat):
+                items.append(ItemAdapter(resultat).asdict())
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ré-extrait les items d'une archive WARC sans réseau.")
+    parser.add_argument("archive_dir")
+    parser.add_argument("-O", "--output", required=True, help="fichier de sortie (.json ou .jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--callbacks", nargs="+", default=["parse_annonce"],
+                        help="callbacks à rejouer (par défaut : pages détail)")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    index = read_index(Path(args.archive_dir))
+    # Dernière réponse archivée par URL (une archive peut couvrir plusieurs crawls)
+    index = list({entry["url"]: entry for entry in index}.values())
+    taille = max(1, len(index) // (args.workers * 4) + 1)
+    lots = [index[i:i + taille] for i in range(0, len(index), taille)]
+
+    items = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for resultat in pool.map(replay_entries, [args.archive_dir] * len(lots), lots, [args.callbacks] * len(lots)):
+            items.extend(resultat)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        if args.output.endswith(".jsonl"):
+            f.writelines(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+        else:
+            json.dump(items, f, ensure_ascii=False)
+
+    duree = time.perf_counter() - debut
+    print(f"✅ {len(index)} réponses rejouées, {len(items)} items extraits en {duree:.1f} s "
+          f"({len(index) / duree:,.0f} réponses/s) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
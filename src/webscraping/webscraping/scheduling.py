@@ -0,0 +1,168 @@
+# Ordonnancement du crawl en profondeur d'abord
+#
+# Le crawl se déploie type → département → ville → liste → annonce. En largeur
+# d'abord, la file du scheduler accumule toutes les pages détail avant que les
+# premiers items sortent. Ce middleware :
+# - donne à chaque requête la priorité de son callback (CALLBACK_PRIORITIES) :
+#   les pages les plus profondes passent en premier et la file se vide au fil
+#   de l'eau ;
+# - limite le nombre de villes en cours d'expansion (VILLE_EXPANSION_MAX) : les
+#   requêtes parse_ville sont mises de côté et libérées une à une lorsqu'une
+#   ville a terminé ses pages de liste et ses annonces.
+#
+# Chaque requête rattachée à une ville occupe une place (jeton "_ville_slot",
+# recopié sur les nouvelles tentatives et les redirections) jusqu'à sa fin :
+# réponse traitée par le spider, requête écartée par le dupefilter
+# (request_dropped), ou échec définitif du téléchargement (hors domaine,
+# robots.txt, erreur réseau après les nouvelles tentatives), signalé par
+# VilleSlotReleaseMiddleware.
+#
+# Avec JOBDIR, les requêtes en attente du scheduler sont en plus sérialisées
+# sur disque plutôt qu'en mémoire.
+
+from collections import deque
+from itertools import count
+
+from scrapy import Request, signals
+from scrapy.exceptions import DontCloseSpider
+
+from webscraping.archive import callback_name
+
+VILLE_CALLBACK = "parse_ville"
+
+# Signal : le téléchargement d'une requête a définitivement échoué (sans réponse pour le spider)
+request_failed = object()
+
+
+class CrawlSchedulingMiddleware:
+    """Middleware de spider : priorités par callback et plafond de villes en cours d'expansion."""
+
+    def __init__(self, crawler, priorities, max_villes):
+        self.crawler = crawler
+        self.priorities = priorities
+        self.max_villes = max_villes
+        self.stash = deque()  # requêtes parse_ville pas encore libérées
+        self.pending = {}  # ville en cours → nombre de ses requêtes planifiées et pas encore traitées
+        self.slots = {}  # jeton d'une requête planifiée → sa ville
+        self.tokens = count()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        m = cls(crawler, crawler.settings.getdict("CALLBACK_PRIORITIES"), crawler.settings.getint("VILLE_EXPANSION_MAX"))
+        crawler.signals.connect(m.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(m.request_finished, signal=signals.request_dropped)
+        crawler.signals.connect(m.request_finished, signal=request_failed)
+        return m
+
+    def _schedule(self, request, ville=None):
+        """
+        Prépare une requête sortante ; `ville` est la ville dont elle descend.
+
+        Retourne:
+        - la requête à transmettre au scheduler, ou None si elle est mise de côté
+        """
+        request.priority = self.priorities.get(callback_name(request), request.priority)
+        if self.max_villes <= 0:
+            return request
+        if callback_name(request) == VILLE_CALLBACK and ville is None:
+            self.stash.append(request)
+            return None
+        if ville is not None:
+            request.meta["ville_expansion"] = ville
+            self._take_slot(request, ville)
+        return request
+
+    def _take_slot(self, request, ville):
+        jeton = next(self.tokens)
+        request.meta["_ville_slot"] = jeton
+        self.slots[jeton] = ville
+        self.pending[ville] = self.pending.get(ville, 0) + 1
+
+    def _free_slot(self, meta):
+        """Libère la place d'une requête terminée (une seule fois, quelle que soit la voie)."""
+        ville = self.slots.pop(meta.get("_ville_slot"), None)
+        if ville in self.pending:
+            self.pending[ville] -= 1
+            if self.pending[ville] <= 0:
+                del self.pending[ville]  # liste et annonces de la ville traitées : place libérée
+
+    def _release(self):
+        """Libère des villes mises de côté tant que le plafond n'est pas atteint."""
+        while self.stash and len(self.pending) < self.max_villes:
+            request = self.stash.popleft()
+            request.meta["ville_expansion"] = request.url
+            self._take_slot(request, request.url)
+            self.crawler.engine.crawl(request)
+
+    async def process_start(self, start):
+        async for element in start:
+            if isinstance(element, Request):
+                # À la reprise d'un crawl (CHECKPOINT_DIR), le journal a gardé la ville de chaque requête
+                # (meta écrite au point de contrôle, après ce middleware) : elle rouvre sa ville, hors plafond
+                element = self._schedule(element, element.meta.get("ville_expansion"))
+                if element is None:
+                    continue
+            yield element
+        self._release()
+
+    def process_spider_output(self, response, result, spider):
+        ville = response.meta.get("ville_expansion")
+        for element in result:
+            if isinstance(element, Request):
+                element = self._schedule(element, ville)
+                if element is None:
+                    continue
+            yield element
+        self._response_done(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        ville = response.meta.get("ville_expansion")
+        async for element in result:
+            if isinstance(element, Request):
+                element = self._schedule(element, ville)
+                if element is None:
+                    continue
+            yield element
+        self._response_done(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        self._response_done(response)
+
+    def _response_done(self, response):
+        self._free_slot(response.meta)
+        self._release()
+        self.crawler.stats.max_value("scheduling/villes_en_attente_max", len(self.stash))
+
+    def request_finished(self, request, spider):
+        """Requête écartée (dupefilter) ou téléchargement en échec : sa place est rendue."""
+        if request.meta.get("_ville_slot") in self.slots:
+            self._free_slot(request.meta)
+            self.crawler.stats.inc_value("scheduling/places_liberees_sans_reponse")
+            self._release()
+
+    def spider_idle(self, spider):
+        # Filet de sécurité : plus rien en cours, aucune place ne doit rester prise
+        if self.stash:
+            self.pending.clear()
+            self._release()
+            raise DontCloseSpider
+
+
+class VilleSlotReleaseMiddleware:
+    """
+    Middleware de téléchargement placé en bas de la chaîne : process_exception n'y
+    arrive que pour les échecs que personne n'a rattrapés (RetryMiddleware a
+    renoncé, OffsiteMiddleware ou RobotsTxtMiddleware ont écarté la requête).
+    Il signale l'échec à CrawlSchedulingMiddleware, qui rend la place de la ville.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_exception(self, request, exception, spider):
+        if "_ville_slot" in request.meta:
+            self.crawler.signals.send_catch_log(signal=request_failed, request=request, spider=spider)
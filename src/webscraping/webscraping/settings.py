@@ -40,15 +40,54 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "webscraping.middlewares.WebscrapingSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # Closest to the spider (after DepthMiddleware, 900): parse CPU time covers the callback only
+    "webscraping.middlewares.TelemetrySpiderMiddleware": 950,
+    "webscraping.checkpoint.CheckpointMiddleware": 560,
+    # After the checkpoint journal, which serializes meta and priority at checkpoint time,
+    # once this middleware has set them
+    "webscraping.scheduling.CrawlSchedulingMiddleware": 555,
+}
+
+# Depth-first crawl: deeper callbacks first, so detail pages drain before new villes are expanded
+CALLBACK_PRIORITIES = {
+    "parse_departement": 10,
+    "parse_ville": 20,
+    "parse_liste_annonces": 30,
+    "parse_annonce": 40,
+}
+# Maximum number of villes whose listing and detail pages are being crawled at once (0: no limit)
+VILLE_EXPANSION_MAX = 32
+
+# Crawl telemetry (per-callback latency, sizes, CPU time, items and rejects),
+# exported at spider close to <TELEMETRY_FILE>.json and <TELEMETRY_FILE>.prom.
+# Disabled by default: set with -s TELEMETRY_FILE=... (main.yml, runner.py and shards.py do).
+TELEMETRY_FILE = ""
+TELEMETRY_REQUIRED_FIELDS = ["titre", "type", "prix", "surface", "localisation"]
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "webscraping.middlewares.WebscrapingDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "webscraping.scheduling.VilleSlotReleaseMiddleware": 40,  # last to see unhandled download errors
+    "webscraping.shared_state.SharedStateMiddleware": 120,  # after RobotsTxtMiddleware (100)
+    "webscraping.archive.WarcArchiveMiddleware": 585,  # after HttpCompressionMiddleware (590)
+}
+
+# WARC archive of every response, replayable offline with `python -m webscraping.replay`.
+# Leave empty to disable.
+ARCHIVE_DIR = ""
+ARCHIVE_MAX_FILE_SIZE = 1024 * 1024 * 1024  # start a new crawl-NNNNN.warc.gz file after 1 GiB
+
+# Sharded crawl (`python -m webscraping.shards`): SQLite database shared by the shards for
+# URL dedup, progress and the per-host delay, which then applies to all shards together.
+# Leave empty for a single-process crawl.
+SHARED_STATE_DB = ""
+SHARED_DOWNLOAD_DELAY = DOWNLOAD_DELAY
+
+# Resumable crawl: request journal + append-only items (<CHECKPOINT_DIR>/items.jsonl).
+# Re-running with the same directory continues an interrupted crawl. Leave empty to disable.
+CHECKPOINT_DIR = ""
+CHECKPOINT_INTERVAL = 30  # seconds between two checkpoints (items fsynced, journal committed)
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
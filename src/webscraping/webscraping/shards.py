@@ -0,0 +1,140 @@
+# Crawl partitionné en shards
+#
+# Lance N processus `scrapy crawl french_immobilier -a shard=i/N` : chacun ne
+# suit que sa part des départements (crc32 du département modulo N). Les shards
+# partagent une base SQLite (voir shared_state.py) pour la déduplication des
+# URLs, le suivi de progression et le délai par hôte, qui reste donc celui d'un
+# crawl unique. Leurs sorties JSON Lines sont fusionnées (dédupliquées par lien)
+# en un seul fichier, à nettoyer ensuite avec clean.py.
+#
+# Les réglages désignant un fichier ou un dossier (télémétrie, archive WARC,
+# journal de reprise CHECKPOINT_DIR, file disque JOBDIR) sont suffixés par
+# shard : chaque shard reprend ses propres requêtes. Avec CHECKPOINT_DIR, la
+# sortie d'un shard est son <CHECKPOINT_DIR>-N/items.jsonl, complétée à chaque
+# relance, et non le fichier -O, réécrit à chaque lancement.
+#
+# Usage (depuis src/webscraping) :
+#   python -m webscraping.shards -n 4 -O ../../annonces.json [-a base_url=...] [-s CLE=valeur ...]
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from webscraping.checkpoint import ITEMS_FILE
+from webscraping.shared_state import read_progress
+
+# Réglages dont la valeur désigne un fichier ou un dossier : suffixés par shard
+PER_SHARD_SETTINGS = ("TELEMETRY_FILE", "ARCHIVE_DIR", "CHECKPOINT_DIR", "JOBDIR")
+POLL_INTERVAL = 5.0
+
+
+def shard_command(shard: int, nb_shards: int, output: Path, state: Path, work_dir: Path, extra: list) -> list:
+    """Ligne de commande `scrapy crawl` d'un shard."""
+    commande = [
+        sys.executable, "-m", "scrapy", "crawl", "french_immobilier",
+        "-a", f"shard={shard}/{nb_shards}",
+        "-O", str(output),
+        "-s", f"SHARED_STATE_DB={state}",
+        "-s", f"TELEMETRY_FILE={work_dir / 'telemetrie'}-{shard}",
+    ]
+    args = iter(extra)
+    for arg in args:
+        if arg == "-s":
+            cle, _, valeur = next(args).partition("=")
+            if cle in PER_SHARD_SETTINGS and valeur:
+                valeur = f"{valeur}-{shard}"
+            commande += ["-s", f"{cle}={valeur}"]
+        else:
+            commande.append(arg)
+    # Le délai s'applique globalement via la base partagée, pas dans chaque shard
+    return commande + ["-s", "DOWNLOAD_DELAY=0"]
+
+
+def setting_value(extra: list, cle: str) -> str:
+    """Valeur d'un réglage `-s CLE=valeur` transmis aux shards (None s'il est absent ou vide)."""
+    valeur = None
+    for arg, suivant in zip(extra, extra[1:]):
+        if arg == "-s" and suivant.partition("=")[0] == cle:
+            valeur = suivant.partition("=")[2] or None
+    return valeur
+
+
+def merge_outputs(fichiers: list, output: Path) -> tuple:
+    """
+    Fusionne les sorties JSON Lines des shards en un tableau JSON.
+
+    Retourne:
+    - (nombre d'items lus, nombre d'items écrits après déduplication par lien)
+    """
+    items, liens, lus = [], set(), 0
+    for fichier in fichiers:
+        if not fichier.exists():
+            continue
+        with open(fichier, encoding="utf-8") as f:
+            for ligne in f:
+                if not ligne.strip():
+                    continue
+                lus += 1
+                item = json.loads(ligne)
+                if item.get("lien") in liens:
+                    continue
+                liens.add(item.get("lien"))
+                items.append(item)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+    return lus, len(items)
+
+
+def print_progress(state: Path):
+    for p in read_progress(str(state)):
+        print(f"  shard {p['shard']:<6}{p['status']:<10}{p['requests']:>7} requêtes "
+              f"{p['duplicates']:>6} doublons {p['items']:>7} items")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl partitionné par département. Les arguments inconnus (-a, -s) sont transmis à chaque shard."
+    )
+    parser.add_argument("-n", "--shards", type=int, default=4)
+    parser.add_argument("-O", "--output", required=True, help="fichier JSON fusionné")
+    parser.add_argument("--work-dir", help="sorties, logs et état des shards (par défaut <output>.shards)")
+    args, extra = parser.parse_known_args()
+
+    output = Path(args.output).resolve()
+    work_dir = Path(args.work_dir or f"{output}.shards").resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state = work_dir / "crawl_state.sqlite3"
+    for fichier in work_dir.glob("crawl_state.sqlite3*"):
+        fichier.unlink()  # nouvel état à chaque crawl
+
+    checkpoint_dir = setting_value(extra, "CHECKPOINT_DIR")
+    debut = time.perf_counter()
+    sorties, processus = [], []
+    for shard in range(args.shards):
+        sortie = work_dir / f"shard-{shard}.jsonl"
+        # Reprise : les items des lancements précédents sont dans le journal du shard
+        sorties.append(Path(f"{checkpoint_dir}-{shard}") / ITEMS_FILE if checkpoint_dir else sortie)
+        with open(work_dir / f"shard-{shard}.log", "w", encoding="utf-8") as log:
+            processus.append(subprocess.Popen(
+                shard_command(shard, args.shards, sortie, state, work_dir, extra), stdout=log, stderr=subprocess.STDOUT
+            ))
+    print(f"🚀 {args.shards} shards lancés (logs dans {work_dir})")
+
+    while any(p.poll() is None for p in processus):
+        time.sleep(POLL_INTERVAL)
+        print(f"⏳ {time.perf_counter() - debut:.0f} s")
+        print_progress(state)
+
+    echecs = [i for i, p in enumerate(processus) if p.returncode != 0]
+    lus, ecrits = merge_outputs(sorties, output)
+    print(f"✅ {ecrits} annonces ({lus - ecrits} doublons entre shards) en {time.perf_counter() - debut:.1f} s → {output}")
+    if echecs:
+        print(f"❌ Shards en échec : {echecs} (voir shard-N.log)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# État partagé entre les shards d'un crawl
+#
+# Plusieurs processus `scrapy crawl` (un par shard, voir shards.py) partagent
+# une base SQLite en mode WAL :
+# - `seen` : URLs déjà planifiées par un shard, pour ne jamais télécharger deux
+#   fois la même page (une ville ou une annonce listée dans deux départements) ;
+# - `politeness` : prochain créneau libre par hôte, pour que le délai entre deux
+#   requêtes vers un même site soit respecté globalement et non par shard ;
+# - `progress` : compteurs par shard, lus par le lanceur pour suivre le crawl.
+#
+# Activation : -s SHARED_STATE_DB=../../crawl_state.sqlite3
+
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY, shard TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS politeness (host TEXT PRIMARY KEY, next_slot REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS progress (
+    shard TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    responses INTEGER NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+"""
+
+# Intervalle minimal (s) entre deux écritures des compteurs de progression
+PROGRESS_INTERVAL = 2.0
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Ouvre la base partagée (WAL : lectures concurrentes, un seul écrivain à la fois)."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def read_progress(path: str) -> list:
+    """Compteurs de chaque shard, triés par nom de shard."""
+    conn = connect(path)
+    try:
+        conn.row_factory = sqlite3.Row
+        return [dict(ligne) for ligne in conn.execute("SELECT * FROM progress ORDER BY shard")]
+    finally:
+        conn.close()
+
+
+class SharedState:
+    """Accès à la base partagée pour un shard."""
+
+    def __init__(self, path: str, shard: str):
+        self.conn = connect(path)
+        self.shard = shard
+
+    def claim(self, url: str) -> bool:
+        """Réserve une URL pour ce shard ; False si un shard l'a déjà planifiée."""
+        cursor = self.conn.execute("INSERT OR IGNORE INTO seen (url, shard) VALUES (?, ?)", (url, self.shard))
+        return cursor.rowcount == 1
+
+    def reserve_slot(self, host: str, delay: float) -> float:
+        """
+        Réserve le prochain créneau d'envoi vers `host`, tous shards confondus.
+
+        Retourne:
+        - le nombre de secondes à attendre avant d'envoyer la requête
+        """
+        maintenant = time.time()
+        # BEGIN IMMEDIATE : lecture et mise à jour du créneau sous le même verrou d'écriture
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            ligne = self.conn.execute("SELECT next_slot FROM politeness WHERE host = ?", (host,)).fetchone()
+            creneau = max(maintenant, ligne[0] if ligne else 0.0)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO politeness (host, next_slot) VALUES (?, ?)", (host, creneau + delay)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return creneau - maintenant
+
+    def save_progress(self, status: str, counters: dict):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO progress (shard, status, requests, duplicates, responses, items, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.shard, status, counters["requests"], counters["duplicates"], counters["responses"],
+             counters["items"], time.time()),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+class SharedStateMiddleware:
+    """
+    Middleware de téléchargement qui coordonne les shards via l'état partagé.
+
+    Les requêtes `dont_filter` (pages d'entrée, nouvelles tentatives) ne sont
+    pas dédupliquées : chaque shard doit lire les pages d'entrée pour
+    connaître sa part des départements. Il en va de même du robots.txt, que
+    RobotsTxtMiddleware télécharge dans chaque shard : un shard privé de sa
+    réponse crawlerait sans en tenir compte.
+    """
+
+    def __init__(self, state, delay, stats):
+        self.state = state
+        self.delay = delay
+        self.stats = stats
+        self.counters = {"requests": 0, "duplicates": 0, "responses": 0, "items": 0}
+        self.last_save = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("SHARED_STATE_DB")
+        if not path:
+            raise NotConfigured("SHARED_STATE_DB non défini")
+        delay = crawler.settings.getfloat("SHARED_DOWNLOAD_DELAY", crawler.settings.getfloat("DOWNLOAD_DELAY"))
+        m = cls(SharedState(path, crawler.spider.shard_name), delay, crawler.stats)
+        crawler.signals.connect(m.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(m.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(m.spider_closed, signal=signals.spider_closed)
+        return m
+
+    def spider_opened(self, spider):
+        self.state.save_progress("running", self.counters)
+
+    def process_request(self, request, spider):
+        robots = request.meta.get("dont_obey_robotstxt") or urlparse(request.url).path == "/robots.txt"
+        if not request.dont_filter and not robots and not request.meta.get("shared_state_claimed"):
+            if not self.state.claim(request.url):
+                self.counters["duplicates"] += 1
+                self.stats.inc_value("partage/doublons")
+                raise IgnoreRequest(f"déjà planifiée par un autre shard : {request.url}")
+            # Une redirection ou une nouvelle tentative garde sa réservation
+            request.meta["shared_state_claimed"] = True
+        self.counters["requests"] += 1
+        attente = self.state.reserve_slot(urlparse(request.url).netloc, self.delay)
+        if attente > 0:
+            self.stats.inc_value("partage/attente_politesse_s", attente)
+            return deferLater(reactor, attente, lambda: None)
+        return None
+
+    def process_response(self, request, response, spider):
+        self.counters["responses"] += 1
+        self._save_progress()
+        return response
+
+    def item_scraped(self, item, response, spider):
+        self.counters["items"] += 1
+
+    def _save_progress(self):
+        if time.monotonic() - self.last_save >= PROGRESS_INTERVAL:
+            self.state.save_progress("running", self.counters)
+            self.last_save = time.monotonic()
+
+    def spider_closed(self, spider, reason):
+        self.state.save_progress(reason, self.counters)
+        self.state.close()
@@ -1,4 +1,6 @@
 from time import sleep
+from urllib.parse import urlparse
+import zlib
 import scrapy
 import os
 import json
@@ -6,17 +8,38 @@ import json
 
 class FrenchImmobilierSpider(scrapy.Spider):
     name = "french_immobilier"
+    base_url = "https://www.etreproprio.com"
     allowed_domains = ["etreproprio.com"]
     start_urls = [
         "https://www.etreproprio.com/maison-a-vendre",
         "https://www.etreproprio.com/appartement-a-vendre",
     ]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, base_url=None, shard=None, **kwargs):
         super().__init__(*args, **kwargs)
         filters_env = os.getenv("SCRAPING_FILTERS", "{}")
         self.filters = json.loads(filters_env)
         self.log(f"Filtres appliqués : {self.filters}")
+        # -a base_url=http://127.0.0.1:8000 : crawl d'une copie locale du site
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+            self.allowed_domains = [urlparse(self.base_url).hostname]
+            self.start_urls = [self.base_url + "/maison-a-vendre", self.base_url + "/appartement-a-vendre"]
+        # -a shard=2/4 : ce processus ne suit que le 3e quart des départements (voir shards.py)
+        self.shard_name = shard or "0/1"
+        self.shard, self.nb_shards = (int(x) for x in self.shard_name.split("/"))
+        if not 0 <= self.shard < self.nb_shards:
+            raise ValueError(f"shard invalide : {self.shard_name} (attendu i/N avec 0 <= i < N)")
+
+    def reject(self, raison):
+        """Comptabilise une annonce écartée (visible dans les stats et la télémétrie)."""
+        if getattr(self, "crawler", None) is not None:  # pas de crawler lors d'un rejeu hors ligne
+            self.crawler.stats.inc_value(f"rejets/{raison}")
+
+    def in_shard(self, lien):
+        """Vrai si le département `lien` revient à ce shard (même shard pour maisons et appartements)."""
+        departement = lien.rstrip("/").rsplit("/", 1)[-1]
+        return zlib.crc32(departement.encode()) % self.nb_shards == self.shard
 
     # ===============================
     # 1️⃣ Page type → département
@@ -27,8 +50,9 @@ class FrenchImmobilierSpider(scrapy.Spider):
         departements = response.css("section.ep-cla-key-sec a::attr(href)").getall()
         for lien in departements:
             if lien.startswith("/"):
-                lien = "https://www.etreproprio.com" + lien
-            yield scrapy.Request(lien, callback=self.parse_departement)
+                lien = self.base_url + lien
+            if self.in_shard(lien):
+                yield scrapy.Request(lien, callback=self.parse_departement)
 
     # ===============================
     # 2️⃣ Page département → villes
@@ -38,7 +62,7 @@ class FrenchImmobilierSpider(scrapy.Spider):
         villes = response.css("div.ep-cla-dir-top-cities a::attr(href)").getall()
         for lien in villes:
             if lien.startswith("/"):
-                lien = "https://www.etreproprio.com" + lien
+                lien = self.base_url + lien
             yield scrapy.Request(lien, callback=self.parse_ville)
 
     # ===============================
@@ -49,7 +73,7 @@ class FrenchImmobilierSpider(scrapy.Spider):
         annonces = response.css("div.ep-cla-key-list a::attr(href)").getall()
         for lien in annonces:
             if lien.startswith("/"):
-                lien = "https://www.etreproprio.com" + lien
+                lien = self.base_url + lien
             yield scrapy.Request(lien, callback=self.parse_liste_annonces)
 
     # ===============================
@@ -60,7 +84,7 @@ class FrenchImmobilierSpider(scrapy.Spider):
 
         for annonce in response.css("div.ep-search-list-wrapper a::attr(href)").getall():
             if "immobilier-" in annonce:
-                full_link = annonce if annonce.startswith("http") else "https://www.etreproprio.com" + annonce
+                full_link = annonce if annonce.startswith("http") else self.base_url + annonce
                 image_principale = response.css("img::attr(src)").get()
                 yield scrapy.Request(
                     full_link,
@@ -99,9 +123,9 @@ class FrenchImmobilierSpider(scrapy.Spider):
         # --- 💡 Filtres
         f = self.filters
         if f.get("type") and all(t.lower() not in (type_bien or "").lower() for t in f["type"]):
-            return
+            return self.reject("filtre_type")
         if f.get("ville") and not any(v.lower() in (localisation or "").lower() for v in f["ville"]):
-            return
+            return self.reject("filtre_ville")
         if f.get("prix_min") or f.get("prix_max"):
             import re
 
@@ -109,7 +133,7 @@ class FrenchImmobilierSpider(scrapy.Spider):
             if prix_num:
                 prix_val = int(prix_num)
                 if prix_val < f.get("prix_min", 0) or prix_val > f.get("prix_max", 10**9):
-                    return
+                    return self.reject("filtre_prix")
         if f.get("surface_min") or f.get("surface_max"):
             import re
 
@@ -117,7 +141,7 @@ class FrenchImmobilierSpider(scrapy.Spider):
             if surf_num:
                 surf_val = int(surf_num)
                 if surf_val < f.get("surface_min", 0) or surf_val > f.get("surface_max", 10**6):
-                    return
+                    return self.reject("filtre_surface")
 
         # --- Résultat final
         yield {